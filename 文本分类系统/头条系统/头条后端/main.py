@@ -1,11 +1,17 @@
 # main.py
 #终端启动 uvicorn main:app --reload
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Literal
+import asyncio
+import time
+from types import SimpleNamespace
 import pickle
 import os
+import hashlib
 import jieba
 import numpy as np
 import fasttext
@@ -14,6 +20,50 @@ import fasttext
 MODEL_DIR = r"D:\111huiyu\model"
 STOPWORDS_PATH = r"D:\111huiyu\慧与\课上代码\头条满分\data\stopwords.txt"
 
+# ------------------ 批量推理配置 ------------------
+MAX_BATCH_TEXTS = 1000   # /predict_batch 单次请求最多的文本条数
+BERT_BATCH_SIZE = 32     # BERT 每个 mini-batch 的文本条数
+BERT_MAX_LENGTH = 128    # BERT 截断长度
+
+# ------------------ 推理执行层配置 ------------------
+# 模型推理在线程池中执行，不阻塞事件循环（torch / sklearn / fastText 的计算部分都在 C/C++ 中）
+# preprocess 为 /predict_batch 的批量分词；bert_batch 为 /predict_batch 的 BERT 调用，
+# 与 /predict 的 bert 名额分开，大批量回填期间交互请求仍能拿到 BERT
+BATCH_TIMEOUT = 600.0    # /predict_batch 中每个模型的超时（秒）
+MODEL_CONCURRENCY = {"random_forest": 2, "fasttext": 4, "bert": 1, "bert_batch": 1, "preprocess": 1}   # 同时执行的调用数上限
+MODEL_TIMEOUTS = {"random_forest": 2.0, "fasttext": 1.0, "bert": 5.0, "bert_batch": BATCH_TIMEOUT,
+                  "preprocess": 1.0}  # 单条预测的超时（秒），超时返回 unknown
+MODEL_WORKERS = sum(MODEL_CONCURRENCY.values())  # 线程池大小
+
+# ------------------ BERT 动态批处理配置 ------------------
+# /predict 的 BERT 调用先进入队列，凑满 BERT_MAX_BATCH 条或等待 BERT_MAX_WAIT_MS 后合并为一次前向计算
+BERT_BATCHING = True
+BERT_MAX_BATCH = 16
+BERT_MAX_WAIT_MS = 5
+BERT_MAX_QUEUE = 256     # 队列上限，排满时新请求直接返回 unknown（级联模式退回 fastText / RF 的结论）
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)  # /metrics 中批大小直方图的桶
+
+# ------------------ 级联预测配置 ------------------
+# /predict 默认模式："cascade" 先用 fastText，再用 TF-IDF+RF，必要时才调用 BERT；"all" 三个模型都返回（调试用）
+PREDICT_MODE = "cascade"
+CASCADE_FASTTEXT_THRESHOLD = 0.9   # fastText 置信度不低于该值时直接返回
+CASCADE_RF_THRESHOLD = 0.6         # RF 与 fastText 结论一致且 RF 置信度不低于该值时返回，否则交给 BERT
+
+# ------------------ BERT CPU 推理配置 ------------------
+# "fp32" 原始模型；"quantized" 线性层动态 int8 量化；"onnx" 导出 ONNX 后用 onnxruntime 推理（未安装时退回 quantized）
+# 默认 fp32；quantized / onnx 需显式开启，并在启动时通过下面的一致性检查
+BERT_BACKEND = os.environ.get("BERT_BACKEND", "fp32")
+# torch / onnxruntime 的算子内线程数；0 表示按本进程可用的 CPU 核数 / uvicorn worker 数自动计算
+BERT_NUM_THREADS = int(os.environ.get("BERT_NUM_THREADS", 0))
+BERT_MODEL_PATH = os.path.join(MODEL_DIR, "bert_model")
+BERT_ONNX_PATH = os.path.join(MODEL_DIR, "bert_model.onnx")
+BERT_ONNX_FINGERPRINT = BERT_ONNX_PATH + ".fingerprint"  # 导出时 checkpoint 的指纹，变化后重新导出
+# 非 fp32 后端启动时与 fp32 模型做一致性检查（一致率低于阈值或缺少留出集时退回 fp32）；也可以运行 python main.py parity
+BERT_PARITY_CHECK = os.environ.get("BERT_PARITY_CHECK", "1") == "1"
+BERT_PARITY_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "dev.txt")
+BERT_PARITY_SAMPLES = 1000
+BERT_PARITY_MIN_AGREEMENT = 0.99
+
 # ------------------ 加载停用词 ------------------
 def load_stopwords(filepath: str) -> set:
     try:
@@ -30,6 +80,10 @@ def preprocess_text(text: str) -> str:
     words = jieba.lcut(text)
     return ' '.join(w for w in words if w not in stopwords and len(w.strip()) > 1)
 
+def preprocess_texts(texts: List[str]) -> List[str]:
+    """批量分词。jieba 没有批量接口，逐条分词；批量推理的收益来自下面模型的批量调用。"""
+    return [preprocess_text(t) for t in texts]
+
 # ------------------ 分类标签 ------------------
 CATEGORIES = {
     0: "finance",      1: "realty",     2: "stocks",
@@ -38,6 +92,154 @@ CATEGORIES = {
     9: "entertainment"
 }
 
+UNKNOWN_RESULT = {"category": "unknown", "confidence": 0.0}
+
+
+def label_to_category(label) -> str:
+    """把 RF 输出的标签（int、numpy 整数、数字字符串或类别名）映射为类别名。"""
+    if isinstance(label, str) and label in CATEGORIES.values():
+        return label
+    try:
+        return CATEGORIES.get(int(label), "unknown")
+    except (TypeError, ValueError):
+        return "unknown"
+
+# ------------------ BERT CPU 推理 ------------------
+def bert_thread_budget() -> int:
+    """本 worker 的线程预算：可用核数（考虑 CPU 亲和性）除以 uvicorn worker 数。"""
+    if BERT_NUM_THREADS > 0:
+        return BERT_NUM_THREADS
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    return max(1, cores // max(1, workers))
+
+
+class OnnxBertModel:
+    """onnxruntime 推理会话的包装，调用方式与 BertForSequenceClassification 相同（返回带 logits 的对象）。"""
+
+    def __init__(self, path: str, num_threads: int):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        import torch
+        feed = {name: inputs[name].numpy() for name in self.input_names if name in inputs}
+        logits = self.session.run(["logits"], feed)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    def eval(self):
+        return self
+
+
+def bert_checkpoint_fingerprint(checkpoint_dir: str) -> str:
+    """checkpoint 目录下各文件的相对路径、大小和修改时间的哈希；替换或重新训练模型后随之变化。"""
+    entries = []
+    for root, _, files in os.walk(checkpoint_dir):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            rel = os.path.relpath(os.path.join(root, name), checkpoint_dir)
+            entries.append(f"{rel}|{stat.st_size}|{stat.st_mtime_ns}")
+    return hashlib.sha1("\n".join(sorted(entries)).encode("utf-8")).hexdigest()
+
+
+def export_bert_onnx(model, tokenizer, path: str):
+    """把 BERT 导出为 ONNX（batch 和序列长度为动态维度）。先写临时文件再替换，其他 worker 不会读到半写的文件。"""
+    import torch
+    sample = tokenizer(["导出示例"], return_tensors="pt")
+    # 按 forward 的参数顺序传入位置参数
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic_axes["logits"] = {0: "batch"}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in names), tmp_path, input_names=names,
+                          output_names=["logits"], dynamic_axes=dynamic_axes, opset_version=14)
+    os.replace(tmp_path, path)
+    print(f"✅ BERT 已导出为 ONNX: {path}")
+
+
+def build_cpu_bert(model, tokenizer, backend: str, num_threads: int, checkpoint_dir: str = BERT_MODEL_PATH):
+    """
+    根据 backend 构造 CPU 推理模型。
+
+    Args:
+        model: fp32 的 BertForSequenceClassification（eval 模式）。
+        backend: "fp32"、"quantized" 或 "onnx"。
+        num_threads: 算子内线程数。
+        checkpoint_dir: model 的 checkpoint 目录；ONNX 文件不存在或与其指纹不一致时重新导出。
+
+    导出、加载或量化失败时退回 fp32 模型，不会让 BERT 整体不可用。
+    """
+    if backend == "onnx":
+        try:
+            import onnxruntime  # noqa: F401  未安装时不必导出
+            fingerprint = bert_checkpoint_fingerprint(checkpoint_dir)
+            exported = None
+            if os.path.exists(BERT_ONNX_PATH) and os.path.exists(BERT_ONNX_FINGERPRINT):
+                with open(BERT_ONNX_FINGERPRINT, 'r', encoding='utf-8') as f:
+                    exported = f.read().strip()
+            if exported != fingerprint:
+                if exported is not None:
+                    print("🔄 BERT checkpoint 已变化，重新导出 ONNX")
+                export_bert_onnx(model, tokenizer, BERT_ONNX_PATH)
+                with open(BERT_ONNX_FINGERPRINT, 'w', encoding='utf-8') as f:
+                    f.write(fingerprint)
+            return OnnxBertModel(BERT_ONNX_PATH, num_threads)
+        except ImportError:
+            print("⚠️ 未安装 onnxruntime，BERT 改用动态 int8 量化")
+            backend = "quantized"
+        except Exception as e:
+            print(f"⚠️ BERT ONNX 导出/加载失败，退回 fp32 模型: {e}")
+            return model
+    if backend == "quantized":
+        try:
+            import torch
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            print(f"⚠️ BERT 动态量化失败，退回 fp32 模型: {e}")
+    return model
+
+
+def bert_parity_check(reference, candidate, tokenizer, data_path: str = BERT_PARITY_DATA,
+                      n_samples: int = BERT_PARITY_SAMPLES, batch_size: int = BERT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    在留出集上比较 CPU 推理模型与 fp32 模型：预测一致率、各自准确率、最大概率差和耗时。
+
+    data_path 为 "句子\t标签" 格式（首行为表头）。
+    """
+    import torch
+    with open(data_path, 'r', encoding='utf-8') as f:
+        rows = [line.rstrip('\n').split('\t') for line in f][1:n_samples + 1]
+    texts = [r[0] for r in rows]
+    labels = torch.tensor([int(r[1]) for r in rows])
+
+    def run(model):
+        probs, start = [], time.perf_counter()
+        with torch.no_grad():
+            for i in range(0, len(texts), batch_size):
+                inputs = tokenizer(texts[i:i + batch_size], return_tensors="pt", truncation=True,
+                                   padding=True, max_length=BERT_MAX_LENGTH)
+                probs.append(torch.nn.functional.softmax(model(**inputs).logits, dim=-1))
+        return torch.cat(probs), time.perf_counter() - start
+
+    ref_probs, ref_seconds = run(reference)
+    cand_probs, cand_seconds = run(candidate)
+    ref_pred, cand_pred = ref_probs.argmax(dim=1), cand_probs.argmax(dim=1)
+    return {
+        "samples": len(texts),
+        "agreement": float((ref_pred == cand_pred).float().mean()),
+        "fp32_accuracy": float((ref_pred == labels).float().mean()),
+        "cpu_accuracy": float((cand_pred == labels).float().mean()),
+        "max_prob_diff": float((ref_probs - cand_probs).abs().max()),
+        "fp32_ms_per_text": 1000 * ref_seconds / len(texts),
+        "cpu_ms_per_text": 1000 * cand_seconds / len(texts),
+    }
+
 # ------------------ 模型服务 ------------------
 class ModelService:
     def __init__(self):
@@ -48,6 +250,13 @@ class ModelService:
 
     def load_models(self):
         """加载所有模型"""
+        # 0. jieba 词典（默认在首次分词时才加载，耗时 1 秒以上，会让第一个 fastText 请求超时）
+        try:
+            jieba.initialize()
+            print("✅ jieba 词典加载成功")
+        except Exception as e:
+            print(f"❌ jieba 词典加载失败: {e}")
+
         # 1. 随机森林
         try:
             rf_path = os.path.join(MODEL_DIR, "rf_model.pkl")
@@ -71,17 +280,36 @@ class ModelService:
         except Exception as e:
             print(f"❌ fastText 加载失败: {e}")
 
-        # 3. BERT
+        # 3. BERT（CPU 推理模式：Rust 实现的快速分词器 + int8 量化 / ONNX + 固定线程数）
         try:
-            from transformers import BertForSequenceClassification, BertTokenizer
-            bert_path = os.path.join(MODEL_DIR, "bert_model")
+            import torch
+            from transformers import BertForSequenceClassification, BertTokenizerFast
+            bert_path = BERT_MODEL_PATH
             if not os.path.exists(bert_path):
                 print(f"❌ BERT 模型目录不存在: {bert_path}")
             else:
-                self.bert_model = BertForSequenceClassification.from_pretrained(bert_path)
-                self.bert_tokenizer = BertTokenizer.from_pretrained(bert_path)
-                self.bert_model.eval()  # 推理模式
-                print("✅ BERT 模型加载成功")
+                num_threads = bert_thread_budget()
+                torch.set_num_threads(num_threads)
+                fp32_model = BertForSequenceClassification.from_pretrained(bert_path)
+                fp32_model.eval()  # 推理模式
+                self.bert_tokenizer = BertTokenizerFast.from_pretrained(bert_path)
+                self.bert_model = build_cpu_bert(fp32_model, self.bert_tokenizer, BERT_BACKEND, num_threads, bert_path)
+                if BERT_PARITY_CHECK and self.bert_model is not fp32_model and not os.path.exists(BERT_PARITY_DATA):
+                    print(f"⚠️ 一致性检查数据不存在: {BERT_PARITY_DATA}，无法验证 {BERT_BACKEND}，退回 fp32 模型")
+                    self.bert_model = fp32_model
+                elif BERT_PARITY_CHECK and self.bert_model is not fp32_model:
+                    try:
+                        report = bert_parity_check(fp32_model, self.bert_model, self.bert_tokenizer)
+                    except Exception as e:
+                        report = {"agreement": 0.0}
+                        print(f"⚠️ BERT 一致性检查失败: {e}")
+                    print(f"📊 BERT 一致性检查: {report}")
+                    if report["agreement"] < BERT_PARITY_MIN_AGREEMENT:
+                        print(f"⚠️ 与 fp32 的一致率 {report['agreement']:.4f} 低于 "
+                              f"{BERT_PARITY_MIN_AGREEMENT}，退回 fp32 模型")
+                        self.bert_model = fp32_model
+                backend = "fp32" if self.bert_model is fp32_model else BERT_BACKEND
+                print(f"✅ BERT 模型加载成功 (backend={backend}, threads={num_threads})")
         except Exception as e:
             print(f"❌ BERT 加载失败: {e}")
 
@@ -92,7 +320,7 @@ class ModelService:
             cleaned = preprocess_text(text)
             pred = self.rf_model.predict([cleaned])[0]
             prob = self.rf_model.predict_proba([cleaned])[0].max()
-            return {"category": CATEGORIES.get(pred, "unknown"), "confidence": float(prob)}
+            return {"category": label_to_category(pred), "confidence": float(prob)}
         except Exception as e:
             print(f"|RF 预测失败: {e}")
             return {"category": "unknown", "confidence": 0.0}
@@ -110,8 +338,6 @@ class ModelService:
             if not cleaned:
                 return {"category": "unknown", "confidence": 0.0}
 
-            print(f"fastText 输入: '{cleaned}'")
-
             pred_label, pred_prob = self.ft_model.predict(cleaned)
 
             # ✅ 确保 label_str 是 str
@@ -125,9 +351,6 @@ class ModelService:
             # ✅ 关键修复：裁剪置信度到 [0.0, 1.0]
             conf = max(0.0, min(1.0, conf))
 
-            print(f"原始 pred_prob 类型: {type(pred_prob[0])}, 值: {pred_prob[0]}")
-            print(f"裁剪后 conf 类型: {type(conf)}, 值: {conf}")
-
             # 解析标签
             if label_str.startswith('__label__'):
                 try:
@@ -139,9 +362,7 @@ class ModelService:
 
             category = CATEGORIES.get(label, "unknown")
 
-            result = {"category": category, "confidence": conf}
-            print(f"fastText 输出: {result}")
-            return result
+            return {"category": category, "confidence": conf}
 
         except Exception as e:
             print(f"❌ fastText 预测失败: {e}")
@@ -159,7 +380,7 @@ class ModelService:
                 return_tensors="pt",
                 truncation=True,
                 padding=True,
-                max_length=128
+                max_length=BERT_MAX_LENGTH
             )
             with torch.no_grad():
                 outputs = self.bert_model(**inputs)
@@ -171,14 +392,285 @@ class ModelService:
             print(f"BERT 预测失败: {e}")
             return {"category": "unknown", "confidence": 0.0}
 
+    # ------------------ 批量推理 ------------------
+    # 输入为 preprocess_texts 的结果（BERT 使用原文），输出与输入一一对应
+
+    def predict_rf_batch(self, cleaned_texts: List[str]) -> List[Dict[str, Any]]:
+        if not self.rf_model or not cleaned_texts:
+            return [dict(UNKNOWN_RESULT) for _ in cleaned_texts]
+        try:
+            # 只调用一次 predict_proba：类别取概率最大的一列，与 predict 的结果一致
+            probs = self.rf_model.predict_proba(cleaned_texts)
+            best = probs.argmax(axis=1)
+            labels = self.rf_model.classes_[best]
+            confs = probs[np.arange(len(best)), best]
+            return [{"category": label_to_category(label), "confidence": float(conf)}
+                    for label, conf in zip(labels, confs)]
+        except Exception as e:
+            print(f"❌ RF 批量预测失败: {e}")
+            return [dict(UNKNOWN_RESULT) for _ in cleaned_texts]
+
+    def predict_fasttext_batch(self, cleaned_texts: List[str]) -> List[Dict[str, Any]]:
+        results = [dict(UNKNOWN_RESULT) for _ in cleaned_texts]
+        if not self.ft_model:
+            return results
+        # 分词后为空的文本直接返回 unknown，其余文本一次性传给 fastText
+        index = [i for i, t in enumerate(cleaned_texts) if t.strip()]
+        if not index:
+            return results
+        try:
+            pred_labels, pred_probs = self.ft_model.predict([cleaned_texts[i].strip() for i in index])
+            for i, labels, probs in zip(index, pred_labels, pred_probs):
+                label_str = str(labels[0]) if len(labels) > 0 else ""
+                conf = max(0.0, min(1.0, float(probs[0]))) if len(probs) > 0 else 0.0
+                try:
+                    label = int(label_str.replace('__label__', '')) if label_str.startswith('__label__') else -1
+                except ValueError:
+                    label = -1
+                results[i] = {"category": CATEGORIES.get(label, "unknown"), "confidence": conf}
+        except Exception as e:
+            print(f"❌ fastText 批量预测失败: {e}")
+        return results
+
+    def predict_bert_batch(self, texts: List[str], batch_size: int = BERT_BATCH_SIZE) -> List[Dict[str, Any]]:
+        results = [dict(UNKNOWN_RESULT) for _ in texts]
+        if not self.bert_model or not self.bert_tokenizer or not texts:
+            return results
+        try:
+            import torch
+            # 按长度排序后再切 mini-batch，同一批内长度相近，padding 最少
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            with torch.no_grad():
+                for start in range(0, len(order), batch_size):
+                    chunk = order[start:start + batch_size]
+                    inputs = self.bert_tokenizer(
+                        [texts[i] for i in chunk],
+                        return_tensors="pt",
+                        truncation=True,
+                        padding=True,
+                        max_length=BERT_MAX_LENGTH
+                    )
+                    probs = torch.nn.functional.softmax(self.bert_model(**inputs).logits, dim=-1)
+                    confs, preds = torch.max(probs, dim=1)
+                    for i, label, conf in zip(chunk, preds.tolist(), confs.tolist()):
+                        results[i] = {"category": CATEGORIES.get(label, "unknown"), "confidence": conf}
+        except Exception as e:
+            print(f"❌ BERT 批量预测失败: {e}")
+        return results
+
+
+# ------------------ 推理执行层 ------------------
+class InferenceExecutor:
+    """
+    在有界线程池中执行模型调用，每个模型有独立的并发上限和超时。
+
+    超时只是不再等待结果（线程中的计算无法中断），该模型的并发名额在计算真正结束后才释放，
+    因此卡住的 BERT 调用不会让并发数超过上限，也不会占满 RF / fastText 的名额。
+    """
+
+    def __init__(self, concurrency: Dict[str, int], timeouts: Dict[str, float], max_workers: int):
+        self.concurrency = concurrency
+        self.timeouts = timeouts
+        self.max_workers = max_workers
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.inflight = {name: 0 for name in concurrency}
+        self.timeout_count = {name: 0 for name in concurrency}
+
+    def start(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="model")
+        self.semaphores = {name: asyncio.Semaphore(n) for name, n in self.concurrency.items()}
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def _call(self, name: str, func: Callable, *args):
+        semaphore = self.semaphores[name]
+        await semaphore.acquire()
+        self.inflight[name] += 1
+
+        def _release(_):
+            self.inflight[name] -= 1
+            semaphore.release()
+
+        future = asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        future.add_done_callback(_release)
+        # shield: 超时取消的是等待，而不是线程池中的计算（名额随计算结束释放）
+        return await asyncio.shield(future)
+
+    async def run(self, name: str, func: Callable, *args, timeout: Optional[float] = None, default=None):
+        """
+        在线程池中执行 func(*args)。
+
+        Args:
+            name: 模型名，对应 MODEL_CONCURRENCY / MODEL_TIMEOUTS 中的键。
+            timeout: 超时（秒），默认使用该模型的配置；包括排队等待名额的时间。
+            default: 超时时返回的结果。
+        """
+        timeout = self.timeouts[name] if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(self._call(name, func, *args), timeout)
+        except asyncio.TimeoutError:
+            self.timeout_count[name] += 1
+            print(f"⏱️ {name} 推理超时 ({timeout}s)，返回默认结果")
+            return default
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: {"inflight": self.inflight[name], "limit": self.concurrency[name],
+                       "timeouts": self.timeout_count[name]} for name in self.concurrency}
+
+
+# ------------------ BERT 动态批处理 ------------------
+class BertBatcher:
+    """
+    BERT 请求的进程内批处理队列。
+
+    后台任务从队列取出第一条请求后，继续收集请求直到凑满 max_batch 条或等待超过 max_wait_ms，
+    然后通过推理执行层做一次前向计算（predict_bert_batch，torch.no_grad），再把结果分发给各请求。
+    前向计算期间到达的请求在队列中积累，负载越高批次越大。
+    队列有上限；已超时的请求被取消，不再参与计算。
+    """
+
+    def __init__(self, service: "ModelService", executor: "InferenceExecutor",
+                 max_batch: int = BERT_MAX_BATCH, max_wait_ms: float = BERT_MAX_WAIT_MS,
+                 max_queue: int = BERT_MAX_QUEUE):
+        self.service = service
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # 监控指标
+        self.batch_size_counts = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self.batch_size_counts[float("inf")] = 0
+        self.batches = 0
+        self.requests = 0
+        self.queue_wait_sum = 0.0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def predict(self, text: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """提交一条文本并等待结果。队列已满时立即返回 unknown；超时返回 unknown 并取消该请求。"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((text, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            print(f"⚠️ BERT 队列已满 ({self.max_queue})，返回默认结果")
+            return UNKNOWN_RESULT
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()  # 尚未开始计算的请求会在组批时被跳过
+            self.executor.timeout_count["bert"] += 1
+            print(f"⏱️ bert 推理超时 ({timeout}s)，返回默认结果")
+            return UNKNOWN_RESULT
+
+    def _take(self, batch: list, item):
+        """把队列中的请求加入批次，已取消（调用方已超时）的请求直接丢弃。"""
+        if item[1].done():
+            self.cancelled += 1
+        else:
+            batch.append(item)
+
+    async def _collect(self) -> list:
+        batch = []
+        while not batch:
+            self._take(batch, await self.queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                self._take(batch, await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # 等待期间已在队列中的请求一并带上
+        while len(batch) < self.max_batch and not self.queue.empty():
+            self._take(batch, self.queue.get_nowait())
+        return batch
+
+    async def _loop(self):
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _, _ in batch]
+            started = time.perf_counter()
+            self._record(len(batch), sum(started - queued for _, _, queued in batch))
+            try:
+                results = await self.executor.run("bert", self.service.predict_bert_batch, texts, len(texts),
+                                                  timeout=BATCH_TIMEOUT)
+            except Exception as e:
+                print(f"❌ BERT 批处理失败: {e}")
+                results = None
+            results = results or [UNKNOWN_RESULT] * len(batch)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record(self, size: int, queue_wait: float):
+        self.batches += 1
+        self.requests += size
+        self.queue_wait_sum += queue_wait
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), float("inf"))
+        self.batch_size_counts[bucket] += 1
+
+    def metrics(self) -> List[str]:
+        """Prometheus 文本格式的指标行。"""
+        lines = [
+            "# TYPE bert_queue_depth gauge",
+            f"bert_queue_depth {self.depth()}",
+            "# TYPE bert_batch_size histogram",
+        ]
+        cumulative = 0
+        for bucket, count in self.batch_size_counts.items():
+            cumulative += count
+            le = "+Inf" if bucket == float("inf") else str(bucket)
+            lines.append(f'bert_batch_size_bucket{{le="{le}"}} {cumulative}')
+        lines += [
+            f"bert_batch_size_sum {self.requests}",
+            f"bert_batch_size_count {self.batches}",
+            "# TYPE bert_queue_wait_seconds_total counter",
+            f"bert_queue_wait_seconds_total {self.queue_wait_sum:.6f}",
+            "# TYPE bert_rejected_total counter",
+            f"bert_rejected_total {self.rejected}",
+            "# TYPE bert_cancelled_total counter",
+            f"bert_cancelled_total {self.cancelled}",
+        ]
+        return lines
+
 
 # ------------------ FastAPI 应用 ------------------
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 服务启动中...")
     model_service.load_models()
+    executor.start()
+    if BERT_BATCHING:
+        bert_batcher.start()
     print("✅ 所有模型加载完成")
     yield
+    await bert_batcher.stop()
+    executor.shutdown()
     print("🛑 服务关闭")
 
 app = FastAPI(title="多模型文本分类 API", lifespan=lifespan)
@@ -192,12 +684,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化模型服务
+# 初始化模型服务和推理执行层
 model_service = ModelService()
+executor = InferenceExecutor(MODEL_CONCURRENCY, MODEL_TIMEOUTS, MODEL_WORKERS)
+bert_batcher = BertBatcher(model_service, executor)
 
 # 请求体
 class TextRequest(BaseModel):
     text: str
+    mode: Optional[Literal["cascade", "all"]] = None  # 默认为 PREDICT_MODE
 
 # 响应体（每个模型的预测结果）
 class ModelResult(BaseModel):
@@ -205,31 +700,119 @@ class ModelResult(BaseModel):
     confidence: float
 
 # 综合响应
+# 级联模式下未调用的模型为 None；category / confidence / tier 为最终结论及给出结论的模型（all 模式为 None）
 class MultiModelResponse(BaseModel):
     text: str
-    random_forest: ModelResult
-    fasttext: ModelResult
-    bert: ModelResult
+    random_forest: Optional[ModelResult] = None
+    fasttext: Optional[ModelResult] = None
+    bert: Optional[ModelResult] = None
+    category: Optional[str] = None
+    confidence: Optional[float] = None
+    tier: Optional[str] = None
+
+# 批量请求体
+class BatchTextRequest(BaseModel):
+    texts: List[str]
+
+# 批量响应体（与 texts 顺序一致）
+class BatchResponse(BaseModel):
+    count: int
+    results: List[MultiModelResponse]
 
 # ------------------ API 接口 ------------------
 
-@app.post("/predict", response_model=MultiModelResponse)
+async def predict_bert(text: str) -> Dict[str, Any]:
+    """单条 BERT 预测：开启动态批处理时进入批处理队列，否则直接提交到推理执行层。"""
+    if BERT_BATCHING and model_service.bert_model is not None:
+        return await bert_batcher.predict(text, timeout=MODEL_TIMEOUTS["bert"])
+    return await executor.run("bert", model_service.predict_bert, text, default=UNKNOWN_RESULT)
+
+async def predict_cascade(text: str) -> MultiModelResponse:
+    """
+    级联预测：fastText 置信度足够高时直接返回；否则调用 RF，两者结论一致且 RF 置信度足够高时返回；
+    其余情况交给 BERT。BERT 不可用或超时时，返回 fastText / RF 中置信度较高的结果。
+    """
+    ft = await executor.run("fasttext", model_service.predict_fasttext, text, default=UNKNOWN_RESULT)
+    if ft["category"] != "unknown" and ft["confidence"] >= CASCADE_FASTTEXT_THRESHOLD:
+        return _cascade_answer(text, "fasttext", fasttext=ft)
+
+    rf = await executor.run("random_forest", model_service.predict_rf, text, default=UNKNOWN_RESULT)
+    if (rf["category"] != "unknown" and rf["category"] == ft["category"]
+            and rf["confidence"] >= CASCADE_RF_THRESHOLD):
+        return _cascade_answer(text, "random_forest", fasttext=ft, random_forest=rf)
+
+    bert = await predict_bert(text)
+    if bert["category"] != "unknown":
+        return _cascade_answer(text, "bert", fasttext=ft, random_forest=rf, bert=bert)
+    tier = "fasttext" if ft["confidence"] >= rf["confidence"] else "random_forest"
+    return _cascade_answer(text, tier, fasttext=ft, random_forest=rf, bert=bert)
+
+
+def _cascade_answer(text: str, tier: str, **results) -> MultiModelResponse:
+    cascade_tiers[tier] += 1
+    answer = results[tier]
+    return MultiModelResponse(text=text, category=answer["category"], confidence=answer["confidence"],
+                              tier=tier, **results)
+
+
+# 级联模式下各层给出结论的次数（/metrics）
+cascade_tiers = {"fasttext": 0, "random_forest": 0, "bert": 0}
+
+
+@app.post("/predict", response_model=MultiModelResponse, response_model_exclude_none=True)
 async def predict(request: TextRequest):
     text = request.text.strip()
     if not text:
         raise HTTPException(status_code=400, detail="文本不能为空")
 
     try:
-        result = MultiModelResponse(
-            text=text,
-            random_forest=model_service.predict_rf(text),
-            fasttext=model_service.predict_fasttext(text),
-            bert=model_service.predict_bert(text)
+        if (request.mode or PREDICT_MODE) == "cascade":
+            return await predict_cascade(text)
+        # all 模式：三个模型并行执行，延迟取决于最慢的模型而不是三者之和
+        rf, ft, bert = await asyncio.gather(
+            executor.run("random_forest", model_service.predict_rf, text, default=UNKNOWN_RESULT),
+            executor.run("fasttext", model_service.predict_fasttext, text, default=UNKNOWN_RESULT),
+            predict_bert(text),
         )
+        result = MultiModelResponse(text=text, random_forest=rf, fasttext=ft, bert=bert)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"预测失败: {str(e)}")
 
+@app.post("/predict_batch", response_model=BatchResponse, response_model_exclude_none=True)
+@app.post("/predict/batch", response_model=BatchResponse, response_model_exclude_none=True, include_in_schema=False)
+async def predict_batch(request: BatchTextRequest):
+    texts = [t.strip() for t in request.texts]
+    if not texts:
+        raise HTTPException(status_code=400, detail="texts 不能为空")
+    if len(texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(status_code=413, detail=f"单次最多 {MAX_BATCH_TEXTS} 条文本，收到 {len(texts)} 条")
+    empty = [i for i, t in enumerate(texts) if not t]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"以下位置的文本为空: {empty[:20]}")
+
+    try:
+        unknown = [UNKNOWN_RESULT] * len(texts)
+        cleaned = await executor.run("preprocess", preprocess_texts, texts, timeout=BATCH_TIMEOUT)
+        if cleaned is None:
+            raise HTTPException(status_code=504, detail="分词超时")
+        rf, ft, bert = await asyncio.gather(
+            executor.run("random_forest", model_service.predict_rf_batch, cleaned,
+                         timeout=BATCH_TIMEOUT, default=unknown),
+            executor.run("fasttext", model_service.predict_fasttext_batch, cleaned,
+                         timeout=BATCH_TIMEOUT, default=unknown),
+            executor.run("bert_batch", model_service.predict_bert_batch, texts, default=unknown),
+        )
+        results = [
+            MultiModelResponse(text=text, random_forest=r, fasttext=f, bert=b)
+            for text, r, f, b in zip(texts, rf, ft, bert)
+        ]
+        return BatchResponse(count=len(results), results=results)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量预测失败: {str(e)}")
+
 @app.get("/health")
 async def health():
     return {
@@ -239,5 +822,36 @@ async def health():
             "fasttext": model_service.ft_model is not None,
             "bert": model_service.bert_model is not None
         },
+        "executor": executor.stats(),
         "message": "服务正常运行"
-    }
\ No newline at end of file
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 格式的监控指标：BERT 队列深度、批大小直方图、各模型的在途调用数和超时次数、级联各层的结论数。"""
+    lines = bert_batcher.metrics()
+    stats = executor.stats()
+    lines.append("# TYPE model_inflight gauge")
+    lines += [f'model_inflight{{model="{name}"}} {stat["inflight"]}' for name, stat in stats.items()]
+    lines.append("# TYPE model_timeouts_total counter")
+    lines += [f'model_timeouts_total{{model="{name}"}} {stat["timeouts"]}' for name, stat in stats.items()]
+    lines.append("# TYPE cascade_answers_total counter")
+    lines += [f'cascade_answers_total{{tier="{tier}"}} {count}' for tier, count in cascade_tiers.items()]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    # python main.py parity：在 data/dev.txt 上比较 BERT_BACKEND 与 fp32 模型的预测一致率和耗时
+    import sys
+    if sys.argv[1:] == ["parity"]:
+        import torch
+        from transformers import BertForSequenceClassification, BertTokenizerFast
+        torch.set_num_threads(bert_thread_budget())
+        bert_path = BERT_MODEL_PATH
+        tokenizer = BertTokenizerFast.from_pretrained(bert_path)
+        reference = BertForSequenceClassification.from_pretrained(bert_path).eval()
+        candidate = build_cpu_bert(reference, tokenizer, BERT_BACKEND, bert_thread_budget(), bert_path)
+        report = bert_parity_check(reference, candidate, tokenizer)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        sys.exit(0 if report["agreement"] >= BERT_PARITY_MIN_AGREEMENT else 1)
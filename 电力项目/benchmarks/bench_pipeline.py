@@ -0,0 +1,198 @@
+# benchmarks/bench_pipeline.py
+# 分阶段基准测试。在项目根目录运行:
+#   python -m benchmarks.bench_pipeline --scales 10 100 --meters 1 50
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import PROJECT_ROOT, TIME_COL, TARGET_COL, TIME_FORMAT, FEATURE_CHUNK_ROWS
+from benchmarks.synthetic import generate_load, scaled_hours
+
+try:
+    import resource  # 仅 Unix 可用，用于记录进程级 RSS 峰值
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["load_data", "preprocess_data", "preprocess_chunked", "train_model", "make_predictions", "plot_predictions"]
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "results", "benchmarks")
+
+
+def _measure(stage: str, func, rows: int, track_memory: bool = True):
+    """执行一个阶段并记录耗时、CPU 时间、Python 堆内存峰值和进程 RSS 峰值。"""
+    gc.collect()
+    if track_memory:
+        tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        result = func()
+        error = None
+    except Exception as e:  # 记录失败的阶段（例如内存不足），而不是中断整个基准
+        result, error = None, f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    peak = None
+    if track_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    record = {
+        "stage": stage,
+        "rows": int(rows),
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "rows_per_s": round(rows / wall, 1) if wall > 0 else None,
+        "peak_mb": round(peak / 1024 ** 2, 2) if peak is not None else None,
+        # ru_maxrss 是进程启动以来的峰值 (Linux 单位为 KB)，可以看出哪个阶段把峰值推高
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+    }
+    if error:
+        record["error"] = error
+        logger.error(f"[{stage}] 失败: {error}")
+    else:
+        logger.info(f"[{stage}] {rows} 行: {wall:.3f}s, 峰值 {record['peak_mb']} MB")
+    return result, record
+
+
+def run_scenario(scale: float, n_meters: int, stages, workdir: str, train_rows: int = None,
+                 track_memory: bool = True) -> list:
+    """运行一个 (放大倍数, 电表数) 场景的全部阶段。"""
+    from data.loader import load_data
+    from data.processor import preprocess_data
+    from src.models.train import train_model
+    from src.models.predict import make_predictions
+
+    n_hours = scaled_hours(scale, n_meters)
+    df = generate_load(n_hours, n_meters, time_col=TIME_COL, target_col=TARGET_COL)
+    # 每个电表最后 5% 的时间作为测试集
+    split_time = df[TIME_COL].iloc[int(n_hours * 0.95)]
+    train_raw, test_raw = df[df[TIME_COL] < split_time], df[df[TIME_COL] >= split_time]
+
+    # 以 config 中的时间格式写出 CSV，模拟真实输入
+    train_path = os.path.join(workdir, "train.csv")
+    test_path = os.path.join(workdir, "test.csv")
+    for frame, path in ((train_raw, train_path), (test_raw, test_path)):
+        out = frame.copy()
+        out[TIME_COL] = out[TIME_COL].dt.strftime(TIME_FORMAT)
+        out.to_csv(path, index=False)
+    del df, train_raw, test_raw
+
+    records = []
+    context = {}
+
+    def add(stage, func, rows):
+        result, record = _measure(stage, func, rows, track_memory)
+        record.update(scale=scale, n_meters=n_meters)
+        records.append(record)
+        return result
+
+    loaded = add("load_data", lambda: load_data(train_path, test_path, TIME_COL, TIME_FORMAT),
+                 n_hours * n_meters)
+    if loaded is None:
+        return records
+    context["train_df"], context["test_df"] = loaded
+    rows = len(context["train_df"]) + len(context["test_df"])
+
+    if "preprocess_data" in stages:
+        processed = add("preprocess_data",
+                        lambda: preprocess_data(context["train_df"], context["test_df"], TIME_COL, TARGET_COL,
+                                                series_col="meter_id" if n_meters > 1 else None),
+                        rows)
+        if processed is None:
+            return records
+        context["processed_train"], context["processed_test"] = processed
+        feature_cols = [c for c in context["processed_train"].columns
+                        if c not in (TIME_COL, TARGET_COL, "meter_id")]
+
+        if "train_model" in stages:
+            train = context["processed_train"]
+            if train_rows and len(train) > train_rows:
+                train = train.tail(train_rows)
+            context["model"] = add("train_model",
+                                   lambda: train_model(train[feature_cols], train[TARGET_COL]),
+                                   len(train))
+
+        if "make_predictions" in stages and context.get("model") is not None:
+            X_test = context["processed_test"][feature_cols]
+            context["predictions"] = add("make_predictions",
+                                         lambda: make_predictions(context["model"], X_test), len(X_test))
+
+    if "preprocess_chunked" in stages and n_meters == 1:
+        from data.chunked import iter_csv_chunks, preprocess_chunked
+        add("preprocess_chunked",
+            lambda: preprocess_chunked(iter_csv_chunks(train_path, TIME_COL, TIME_FORMAT, FEATURE_CHUNK_ROWS),
+                                       TIME_COL, TARGET_COL, os.path.join(workdir, "features.parquet")),
+            len(context["train_df"]))
+
+    # 多电表时 test_df 的时间列有重复，无法与预测值按时间对齐绘图，只测单序列
+    if "plot_predictions" in stages and n_meters == 1 and context.get("predictions") is not None:
+        from src.visualization.plotter import plot_predictions
+        test_df = context["test_df"]
+        y_true = test_df.set_index(TIME_COL)[TARGET_COL]
+        y_pred = pd.Series(context["predictions"], index=test_df[TIME_COL])
+        plot_path = os.path.join(workdir, "plot.png")
+        add("plot_predictions", lambda: plot_predictions(y_true, y_pred, save_path=plot_path), len(y_true))
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="电力项目分阶段基准测试（合成数据）")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100],
+                        help="相对内置 train.csv 行数的放大倍数，如 10 100 1000")
+    parser.add_argument("--meters", type=int, nargs="+", default=[1], help="电表数量")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES, help="要测试的阶段")
+    parser.add_argument("--train-rows", type=int, default=None,
+                        help="训练阶段最多使用的行数（大规模时限制训练耗时）")
+    parser.add_argument("--no-memory", action="store_true", help="不跟踪内存（tracemalloc 会带来额外开销）")
+    parser.add_argument("--output", default=None, help="结果 JSON 路径，默认写入 results/benchmarks/")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # 各阶段内部的 INFO 日志会干扰计时输出
+    for name in ("data", "src"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    import matplotlib
+    matplotlib.use("Agg")
+
+    records = []
+    for n_meters in args.meters:
+        for scale in args.scales:
+            logger.info(f"=== 场景: scale={scale}x, meters={n_meters} ===")
+            with tempfile.TemporaryDirectory() as workdir:
+                records.extend(run_scenario(scale, n_meters, args.stages, workdir,
+                                            args.train_rows, not args.no_memory))
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "records": records,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(pd.DataFrame(records).to_string(index=False))
+    logger.info(f"基准结果已保存至: {output}")
+
+
+if __name__ == "__main__":
+    main()
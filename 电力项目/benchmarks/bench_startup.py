@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+# 启动耗时回归检查（基于 python -X importtime）。在项目根目录运行:
+#   python -m benchmarks.bench_startup
+# 超出预算或导入了不应导入的重量级库时以非零状态码退出，可直接放进 CI / 定时任务前的检查。
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from config import PROJECT_ROOT
+
+# 各入口不允许导入的重量级库
+FORBIDDEN = {
+    "cli": ["pandas", "numpy", "sklearn", "xgboost", "matplotlib", "seaborn"],
+    # predict 子命令的完整导入链：允许 pandas/numpy，但不应导入训练和绘图相关的库
+    "predict": ["sklearn", "xgboost", "matplotlib", "seaborn"],
+}
+# 各入口的导入代码
+IMPORTS = {
+    "cli": "import cli",
+    "predict": ("import cli, data.loader, data.feature_store, src.models.registry, "
+                "src.models.fast_predict, src.utils.telemetry, data.resample"),
+}
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(code: str) -> dict:
+    """在子进程中执行导入代码，返回 {顶层模块名: 累计导入耗时（秒）}。"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) == 1:  # 缩进为 1 的是直接导入的顶层模块
+            modules[match.group(4)] = int(match.group(2)) / 1e6
+    imported = {m.group(4).split('.')[0] for m in map(_IMPORTTIME_RE.match, proc.stderr.splitlines()) if m}
+    return {"top_level": modules, "imported": imported}
+
+
+def wall_time(code: str, repeat: int) -> float:
+    """子进程从启动到完成导入的耗时中位数（秒）。"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时回归检查")
+    parser.add_argument("--budget-cli", type=float, default=0.3, help="cli.py 启动预算（秒）")
+    parser.add_argument("--budget-predict", type=float, default=1.0, help="predict 子命令导入预算（秒）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    budgets = {"cli": args.budget_cli, "predict": args.budget_predict}
+
+    failures = []
+    for name, code in IMPORTS.items():
+        profile = import_profile(code)
+        seconds = wall_time(code, args.repeat)
+        slowest = sorted(profile["top_level"].items(), key=lambda kv: -kv[1])[:5]
+        print(f"[{name}] 启动耗时 {seconds:.3f}s (预算 {budgets[name]:.2f}s)；最慢的导入: "
+              + ", ".join(f"{m} {t:.3f}s" for m, t in slowest))
+        leaked = sorted(set(FORBIDDEN[name]) & profile["imported"])
+        if leaked:
+            failures.append(f"[{name}] 导入了不应导入的库: {leaked}")
+        if seconds > budgets[name]:
+            failures.append(f"[{name}] 启动耗时 {seconds:.3f}s 超出预算 {budgets[name]:.2f}s")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ 启动耗时检查通过")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
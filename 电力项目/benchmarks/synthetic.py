@@ -0,0 +1,58 @@
+# benchmarks/synthetic.py
+import numpy as np
+import pandas as pd
+
+# 内置 train.csv 的行数，作为放大倍数的基准
+BASE_ROWS = 16754
+
+
+def generate_load(n_hours: int, n_meters: int = 1, start: str = "2013-09-02",
+                  time_col: str = "time", target_col: str = "power_load",
+                  meter_col: str = "meter_id", seed: int = 42) -> pd.DataFrame:
+    """
+    生成带日周期、周周期、年周期、趋势和噪声的合成小时负荷数据（全向量化）。
+
+    Args:
+        n_hours (int): 每个电表的小时数。
+        n_meters (int): 电表数量；大于 1 时输出长表并包含 meter_col 列。
+        start (str): 起始时间。
+        time_col (str): 时间列名。
+        target_col (str): 负荷列名。
+        meter_col (str): 电表编号列名。
+        seed (int): 随机种子。
+
+    Returns:
+        pd.DataFrame: 按 (电表, 时间) 排序的合成数据。
+    """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=n_hours, freq="h")
+    t = np.arange(n_hours, dtype=np.float64)
+
+    # 每个电表的基准负荷、各周期幅度和相位不同
+    base = rng.uniform(400, 1200, size=(n_meters, 1))
+    daily_amp = base * rng.uniform(0.15, 0.35, size=(n_meters, 1))
+    weekly_amp = base * rng.uniform(0.05, 0.15, size=(n_meters, 1))
+    yearly_amp = base * rng.uniform(0.05, 0.2, size=(n_meters, 1))
+    phase = rng.uniform(0, 2 * np.pi, size=(n_meters, 1))
+    trend = base * rng.uniform(-0.02, 0.05, size=(n_meters, 1)) / (24 * 365)
+
+    load = (base
+            + daily_amp * np.sin(2 * np.pi * t / 24 + phase)
+            + weekly_amp * np.sin(2 * np.pi * t / (24 * 7))
+            + yearly_amp * np.sin(2 * np.pi * t / (24 * 365.25) + phase / 2)
+            + trend * t
+            + rng.normal(0, 1, size=(n_meters, n_hours)) * base * 0.03)
+    load = np.maximum(load, 0).astype(np.float32)
+
+    df = pd.DataFrame({
+        time_col: np.tile(times.to_numpy(), n_meters),
+        target_col: load.ravel(),
+    })
+    if n_meters > 1:
+        df.insert(0, meter_col, np.repeat(np.arange(n_meters, dtype=np.int32), n_hours))
+    return df
+
+
+def scaled_hours(scale: float, n_meters: int = 1) -> int:
+    """放大倍数对应的每个电表的小时数（总行数约为 BASE_ROWS × scale）。"""
+    return max(48, int(BASE_ROWS * scale / n_meters))
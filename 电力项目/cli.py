@@ -0,0 +1,243 @@
+# cli.py
+# 命令行入口。在项目根目录运行:
+#   python cli.py train                 训练、评估并发布模型（等同于 python main.py）
+#   python cli.py train --series-col meter_id --clusters 8   多电表：按负荷形态聚类，每簇一个模型
+#   python cli.py train --chunked       外存特征工程 (特征矩阵分块写盘)，适合多年的逐小时数据
+#   python cli.py predict               用当前模型为测试集打分，写出 CSV（定时任务使用）
+#   python cli.py backtest              滚动起点回测
+#   python cli.py retrain               用水位线之后的新数据增量更新模型（必要时全量重训）
+#   python cli.py tune                  XGBoost 超参数搜索，结果写入 xgb_params.json（train 会读取）
+#   python cli.py plot <predictions>    绘制预测结果与真实值的对比图
+#
+# 顶层只导入标准库和 config；pandas / xgboost / sklearn / matplotlib 等重量级库
+# 只在需要它们的子命令中导入，predict 子命令不会导入 sklearn、xgboost 和 matplotlib。
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+from config import (TRAIN_FILE, TEST_FILE, MODEL_FILE, REGISTRY_DIR, TIME_COL, TARGET_COL, TIME_FORMAT,
+                    CACHE_DIR, FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES, TELEMETRY_FILE,
+                    RESAMPLE_FREQ, RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL,
+                    MODEL_TYPE, BACKTEST_TRAIN_WINDOW, BACKTEST_HORIZON, BACKTEST_STEP,
+                    XGB_PARAMS_FILE, TEST_SIZE, INCREMENTAL_ROUNDS, FULL_REFIT_DAYS,
+                    SERIES_COL, FLEET_CLUSTERS, RESULTS_DIR, CHUNKED_FEATURES)
+
+logger = logging.getLogger("cli")
+
+
+def _load_features(train_path: str, test_path: str):
+    from data.loader import load_data
+    from data.feature_store import FeatureStore, preprocess_data_cached
+    from data.resample import resample_train_test
+
+    train_df, test_df = load_data(train_path, test_path, TIME_COL, TIME_FORMAT, CACHE_DIR)
+    train_df, test_df, _ = resample_train_test(train_df, test_df, TIME_COL, TARGET_COL, RESAMPLE_FREQ,
+                                               RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL)
+    processed_train_df, processed_test_df = preprocess_data_cached(
+        train_df, test_df, TIME_COL, TARGET_COL, FeatureStore(FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES))
+    return train_df, test_df, processed_train_df, processed_test_df
+
+
+def cmd_train(args):
+    if args.series_col:
+        from main import train_fleet
+        train_fleet(args.train, args.input, args.series_col, args.clusters)
+        return
+    from main import main
+    main(args.train, args.input, chunked=args.chunked)
+
+
+def cmd_predict(args):
+    import pandas as pd
+    from src.utils.telemetry import Telemetry
+
+    telemetry = Telemetry(TELEMETRY_FILE)
+    with telemetry.stage("load_model") as record:
+        from src.models.registry import ModelRegistry
+        registry = ModelRegistry(REGISTRY_DIR)
+        if registry.current_version() or args.model_version:
+            predictor = registry.load_predictor(args.model_version)
+            record["model_version"] = predictor.model.registry_version_
+        else:
+            # 仓库为空时退回 best_model.pkl（反序列化需要导入模型所属的库）
+            from src.models.fast_predict import FastPredictor
+            from src.models.predict import load_model
+            predictor = FastPredictor(load_model(MODEL_FILE))
+
+    with telemetry.stage("load_data") as record:
+        _, test_df, _, processed_test_df = _load_features(args.train, args.input)
+        record["rows"] = len(test_df)
+
+    with telemetry.stage("make_predictions", rows=len(processed_test_df)):
+        predictions = predictor.predict_frame(processed_test_df)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"predictions_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    result = pd.DataFrame({TIME_COL: processed_test_df[TIME_COL].to_numpy(), "predicted_load": predictions})
+    result.to_csv(output, index=False)
+    logger.info(f"✅ 预测结果已保存至: {output} ({len(result)} 行, 后端 {predictor.backend})")
+    telemetry.log_summary()
+
+
+def cmd_backtest(args):
+    from data.loader import load_data
+    from data.feature_store import FeatureStore
+    from data.resample import resample_train_test
+    from src.evaluation.backtest import prepare_full_series, walk_forward_backtest
+
+    train_df, test_df = load_data(args.train, args.input, TIME_COL, TIME_FORMAT, CACHE_DIR)
+    train_df, test_df, _ = resample_train_test(train_df, test_df, TIME_COL, TARGET_COL, RESAMPLE_FREQ,
+                                               RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL)
+    processed_df = prepare_full_series(train_df, test_df, TIME_COL, TARGET_COL,
+                                       FeatureStore(FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES))
+    feature_cols = [col for col in processed_df.columns if col not in [TIME_COL, TARGET_COL]]
+    fold_df, summary = walk_forward_backtest(processed_df, feature_cols, TARGET_COL, TIME_COL,
+                                             args.train_window, args.horizon, args.step,
+                                             model_type=args.model_type, max_workers=args.workers,
+                                             recursive=args.recursive, freq=RESAMPLE_FREQ)
+    output = args.output or os.path.join(RESULTS_DIR, f"backtest_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    fold_df.to_csv(output, index=False)
+    logger.info(f"✅ 回测结果已保存至: {output}")
+
+
+def cmd_retrain(args):
+    from data.loader import load_data
+    from data.feature_store import FeatureStore
+    from data.resample import resample_train_test
+    from src.evaluation.backtest import prepare_full_series
+    from src.models.predict import load_model
+    from src.models.registry import ModelRegistry
+    from src.models.train import incremental_retrain, get_watermark
+    from src.models.tuning import load_params
+
+    model = load_model(args.model)
+    logger.info(f"当前模型水位线: {get_watermark(model)}")
+    train_df, test_df = load_data(args.train, args.input, TIME_COL, TIME_FORMAT, CACHE_DIR)
+    train_df, test_df, _ = resample_train_test(train_df, test_df, TIME_COL, TARGET_COL, RESAMPLE_FREQ,
+                                               RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL)
+    processed_df = prepare_full_series(train_df, test_df, TIME_COL, TARGET_COL,
+                                       FeatureStore(FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES))
+    feature_cols = list(getattr(model, "feature_names_in_",
+                                [col for col in processed_df.columns if col not in [TIME_COL, TARGET_COL]]))
+
+    params = load_params(XGB_PARAMS_FILE) if args.model_type == "XGBoost" else None
+    new_model = incremental_retrain(model, processed_df, feature_cols, TIME_COL, TARGET_COL,
+                                    full_refit=args.full, full_refit_days=FULL_REFIT_DAYS,
+                                    n_new_rounds=INCREMENTAL_ROUNDS, mode=args.mode,
+                                    model_type=args.model_type, params=params, model_path=args.model)
+    if new_model is model:
+        return
+    # 发布到模型仓库，服务进程通过 /reload 或定时检查切换到新版本
+    train_times = processed_df.loc[processed_df[TIME_COL] <= get_watermark(new_model), TIME_COL]
+    version = ModelRegistry(REGISTRY_DIR).publish(new_model, feature_cols, train_start=train_times.min(),
+                                                  train_end=train_times.max())
+    logger.info(f"✅ 模型已更新并发布为版本 {version}")
+
+
+def cmd_tune(args):
+    from src.models.tuning import hyperband_search, split_holdout
+
+    _, _, processed_train_df, _ = _load_features(args.train, args.input)
+    feature_cols = [col for col in processed_train_df.columns if col not in [TIME_COL, TARGET_COL]]
+    X, y = processed_train_df[feature_cols], processed_train_df[TARGET_COL]
+    # 按时间划分：训练 | 早停 | 选优，与 main.py 的训练/验证划分比例一致
+    n_train = int(len(X) * (1 - TEST_SIZE))
+    X_val, y_val, X_select, y_select = split_holdout(X.iloc[n_train:], y.iloc[n_train:])
+    best_params, trials = hyperband_search(X.iloc[:n_train], y.iloc[:n_train], X_val, y_val,
+                                           min_rounds=args.min_rounds, max_rounds=args.max_rounds,
+                                           eta=args.eta, metric=args.metric, max_workers=args.workers,
+                                           params_path=args.output, X_select=X_select, y_select=y_select)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    trials_path = os.path.join(RESULTS_DIR, f"tuning_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    trials.to_csv(trials_path, index=False)
+    logger.info(f"✅ 最优参数已保存至: {args.output}，全部试验记录: {trials_path}")
+
+
+def cmd_plot(args):
+    import pandas as pd
+    from data.loader import read_csv_cached
+    from src.visualization.plotter import plot_predictions
+
+    predictions = pd.read_csv(args.predictions, parse_dates=[TIME_COL]).set_index(TIME_COL)["predicted_load"]
+    actual = read_csv_cached(args.actual, TIME_COL, TIME_FORMAT, CACHE_DIR).set_index(TIME_COL)[TARGET_COL]
+    output = args.output or os.path.splitext(args.predictions)[0] + ".png"
+    plot_predictions(actual, predictions, save_path=output, fast=not args.full)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="电力负荷预测命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train = subparsers.add_parser("train", help="训练、评估并发布模型")
+    train.add_argument("--series-col", default=SERIES_COL,
+                       help="多电表数据的序列编号列；指定后训练多序列模型 (保存为 fleet_model.pkl)")
+    train.add_argument("--clusters", type=int, default=FLEET_CLUSTERS,
+                       help="按日负荷形态聚类的簇数，默认所有序列共用一个全局模型")
+    train.add_argument("--input", default=TEST_FILE, help="测试数据 (CSV)")
+    train.add_argument("--train", default=TRAIN_FILE, help="训练数据 (CSV)")
+    train.add_argument("--chunked", action=argparse.BooleanOptionalAction, default=CHUNKED_FEATURES,
+                       help="外存特征工程：按块写出 float32 特征矩阵再分批读回训练（仅单序列）")
+    train.set_defaults(func=cmd_train)
+
+    predict = subparsers.add_parser("predict", help="用当前模型为测试集打分")
+    predict.add_argument("--input", default=TEST_FILE, help="待预测的数据 (CSV)")
+    predict.add_argument("--train", default=TRAIN_FILE, help="历史数据 (用于滞后/滑动特征)")
+    predict.add_argument("--model-version", default=None, help="模型仓库中的版本号，默认为当前版本")
+    predict.add_argument("--output", default=None, help="输出 CSV 路径，默认写入 results/")
+    predict.set_defaults(func=cmd_predict)
+
+    backtest = subparsers.add_parser("backtest", help="滚动起点回测")
+    backtest.add_argument("--input", default=TEST_FILE)
+    backtest.add_argument("--train", default=TRAIN_FILE)
+    backtest.add_argument("--model-type", default=MODEL_TYPE if MODEL_TYPE != "tournament" else "XGBoost")
+    backtest.add_argument("--train-window", type=int, default=BACKTEST_TRAIN_WINDOW)
+    backtest.add_argument("--horizon", type=int, default=BACKTEST_HORIZON)
+    backtest.add_argument("--step", type=int, default=BACKTEST_STEP)
+    backtest.add_argument("--workers", type=int, default=None, help="并行进程数")
+    backtest.add_argument("--recursive", action="store_true",
+                          help="N 步递归预测：每折从起点递归预测 horizon 步，预测值回填到滞后和滑动特征")
+    backtest.add_argument("--output", default=None)
+    backtest.set_defaults(func=cmd_backtest)
+
+    retrain = subparsers.add_parser("retrain", help="用水位线之后的新数据增量更新模型")
+    retrain.add_argument("--input", default=TEST_FILE, help="新数据 (CSV)")
+    retrain.add_argument("--train", default=TRAIN_FILE, help="历史数据 (CSV)")
+    retrain.add_argument("--model", default=MODEL_FILE, help="当前模型 (.pkl)，更新后原地覆盖")
+    retrain.add_argument("--mode", default="continue", choices=["continue", "refresh"],
+                         help="continue 追加新树；refresh 只刷新现有树的叶子值")
+    retrain.add_argument("--full", action="store_true", help="强制全量重训")
+    retrain.add_argument("--model-type", default=MODEL_TYPE if MODEL_TYPE != "tournament" else "XGBoost",
+                         help="全量重训时的模型类型")
+    retrain.set_defaults(func=cmd_retrain)
+
+    tune = subparsers.add_parser("tune", help="XGBoost 超参数搜索 (Hyperband)")
+    tune.add_argument("--input", default=TEST_FILE)
+    tune.add_argument("--train", default=TRAIN_FILE)
+    tune.add_argument("--min-rounds", type=int, default=50)
+    tune.add_argument("--max-rounds", type=int, default=1000)
+    tune.add_argument("--eta", type=int, default=3)
+    tune.add_argument("--metric", default="RMSE", choices=["MAE", "RMSE", "MAPE"])
+    tune.add_argument("--workers", type=int, default=None, help="并行进程数")
+    tune.add_argument("--output", default=XGB_PARAMS_FILE, help="最优参数 JSON 路径")
+    tune.set_defaults(func=cmd_tune)
+
+    plot = subparsers.add_parser("plot", help="绘制预测结果与真实值的对比图")
+    plot.add_argument("predictions", help="cli.py predict 输出的 CSV")
+    plot.add_argument("--actual", default=TEST_FILE, help="真实值 CSV")
+    plot.add_argument("--output", default=None, help="图片路径，默认与预测 CSV 同名")
+    plot.add_argument("--full", action="store_true", help="完整渲染（默认使用快速模式）")
+    plot.set_defaults(func=cmd_plot)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
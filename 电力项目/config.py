@@ -8,19 +8,69 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__)) # 这会指向 main.py
 DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 RAW_DATA_DIR = os.path.join(DATA_DIR, "raw")
 PROCESSED_DATA_DIR = os.path.join(DATA_DIR, "processed")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")  # load_data 的列式缓存 (Parquet)，删除即可强制重新解析 CSV
+FEATURE_STORE_DIR = os.path.join(DATA_DIR, "feature_store")  # 特征工程结果缓存 (Arrow)
+FEATURE_STORE_MAX_BYTES = 2 * 1024 ** 3  # 特征库磁盘预算，超出后按 LRU 淘汰
+FEATURE_CHUNK_ROWS = 500_000  # 外存特征工程 (data/chunked.py) 每块读取的行数，决定内存峰值
+CHUNKED_FEATURES = False  # True: main.py 训练改走外存特征工程 (float32 特征矩阵分块写盘再分批读回)，仅单序列
+FEATURE_CHUNK_FILE = os.path.join(PROCESSED_DATA_DIR, "features_chunked.parquet")  # 外存模式的特征矩阵
 
 # 确保这些路径是正确的，请检查文件是否真的存在
 TRAIN_FILE = os.path.join(RAW_DATA_DIR, "train.csv") # 应该指向 D:\111huiyu\慧与\课上代码\电力项目\data\raw\train.csv
 TEST_FILE = os.path.join(RAW_DATA_DIR, "test.csv")
 
+# 日志与运行遥测
+LOGS_DIR = os.path.join(PROJECT_ROOT, "logs")
+TELEMETRY_FILE = os.path.join(LOGS_DIR, "telemetry.jsonl")  # 每个阶段一行 JSON: 耗时、CPU、内存峰值、行数
+
+# 结果输出
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "results")
+PLOT_FILE = os.path.join(RESULTS_DIR, "prediction_plot.png")  # main.py 的预测对比图（快速模式，无需图形界面）
+
 # 模型路径
 MODEL_DIR = os.path.join(PROJECT_ROOT, "models")
 MODEL_FILE = os.path.join(MODEL_DIR, "best_model.pkl")
+REGISTRY_DIR = os.path.join(MODEL_DIR, "registry")  # 版本化模型仓库 (原生/数组格式 + manifest)
+LEADERBOARD_FILE = os.path.join(MODEL_DIR, "leaderboard.json")  # 模型锦标赛排行榜
+XGB_PARAMS_FILE = os.path.join(MODEL_DIR, "xgb_params.json")  # 超参数搜索得到的 XGBoost 最优参数
+FEATURE_STATE_FILE = os.path.join(MODEL_DIR, "feature_state.pkl")  # 增量特征引擎状态，与模型放在一起
+NATIVE_BUILD_DIR = os.path.join(PROJECT_ROOT, "build")  # 快速推理的本地编译内核 (.so)，删除后自动重新编译
 
 # 特征和目标列名 (需要根据你的数据实际情况修改)
 # 请打开 train.csv 文件，查看第一行，确认时间列和负荷列的准确列名
 TIME_COL = "time"  # <-- 修改为你的数据中时间列的实际名称
 TARGET_COL = "power_load" # <-- 修改为你的数据中负荷列的实际名称
+TIME_FORMAT = "%Y/%m/%d %H:%M"  # 时间列格式 (如 2013/9/2 0:00)，显式指定可跳过格式推断；设为 None 则自动推断
+
+# 重采样与缺口填补 (data/resample.py)：读数缺失、重复或为 15 分钟粒度时先对齐到规则网格
+RESAMPLE_FREQ = "h"                # 目标频率；滞后/滑动特征的步长以此为单位
+RESAMPLE_AGG = "mean"              # 同一格内多条读数的聚合方式
+RESAMPLE_MAX_GAP = 6               # 可填补的最大缺口长度（步数），更长的缺口保留为 NaN
+RESAMPLE_FILL = "interpolate"      # "interpolate" 线性插值，"seasonal" 复制一天前的值，None 不填补
+
+# 模型配置
+# 单个模型类型 ("Linear", "RandomForest", "GradientBoosting", "XGBoost")，
+# 或 "tournament"：并行训练全部候选模型，将验证集上最优的模型保存为 best_model.pkl
+MODEL_TYPE = "XGBoost"
+
+# 多电表（多序列）训练配置：SERIES_COL 不为 None 时 main.py 训练分簇/全局的多序列模型 (src/models/fleet.py)
+SERIES_COL = None          # 序列编号列，如 "meter_id"
+FLEET_CLUSTERS = None      # 按日负荷形态聚类的簇数；None 表示所有序列共用一个全局模型
+FLEET_MODEL_FILE = os.path.join(MODEL_DIR, "fleet_model.pkl")
+
+# 增量重训配置
+INCREMENTAL_ROUNDS = 20   # 每次增量更新追加的树的数量
+FULL_REFIT_DAYS = 30      # 距上次全量训练超过该天数时自动全量重训
+
+# 滚动回测配置（单位：行，数据为小时粒度）
+BACKTEST_TRAIN_WINDOW = 24 * 365  # 训练窗口；None 表示扩展窗口
+BACKTEST_HORIZON = 24 * 7         # 每折预测长度
+BACKTEST_STEP = 24 * 7            # 预测起点间隔
+
+# 预测服务配置 (service.py)
+SERVICE_MAX_BATCH = 256        # 微批处理的最大行数
+SERVICE_MAX_WAIT_MS = 5        # 微批处理的最长等待时间（毫秒）
+MODEL_RELOAD_INTERVAL = 10     # 检查模型文件更新的间隔（秒）
 
 # 其他配置
 RANDOM_STATE = 42
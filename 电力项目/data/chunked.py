@@ -0,0 +1,171 @@
+# src/data/chunked.py
+# 外存 (out-of-core) 特征工程：按块流式读取时间序列，逐块写出 Parquet 特征矩阵
+import logging
+import os
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from data.processor import (LAGS, WINDOWS, _extract_datetime_features, _create_lag_features,
+                            _create_rolling_features)
+
+logger = logging.getLogger(__name__)
+
+# 日期时间特征的紧凑类型（year 超出 int8 范围，使用 int16）
+CALENDAR_DTYPES = {
+    'hour': np.int8,
+    'day_of_week': np.int8,
+    'day_of_month': np.int8,
+    'month': np.int8,
+    'year': np.int16,
+    'is_weekend': np.int8,
+    'is_holiday': np.int8,
+    'is_makeup_workday': np.int8,
+    'is_bridge_day': np.int8,
+}
+
+
+def downcast_features(df: pd.DataFrame, time_col: str) -> pd.DataFrame:
+    """日期时间特征压缩为 int8/int16，其余数值列压缩为 float32（原地修改并返回）。"""
+    for col in df.columns:
+        if col == time_col:
+            continue
+        if col in CALENDAR_DTYPES:
+            df[col] = df[col].astype(CALENDAR_DTYPES[col])
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def iter_csv_chunks(path: str, time_col: str, time_format: Optional[str] = None,
+                    chunk_rows: int = 500_000) -> Iterator[pd.DataFrame]:
+    """按块读取 CSV，每块解析时间列并把数值列压缩为 float32。"""
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        if time_format:
+            chunk[time_col] = pd.to_datetime(chunk[time_col], format=time_format)
+        else:
+            chunk[time_col] = pd.to_datetime(chunk[time_col])
+        numeric_cols = [col for col in chunk.columns
+                        if col != time_col and pd.api.types.is_numeric_dtype(chunk[col])]
+        chunk[numeric_cols] = chunk[numeric_cols].astype(np.float32)
+        yield chunk
+
+
+def preprocess_chunked(chunks: Iterable[pd.DataFrame], time_col: str, target_col: str,
+                       output_path: str) -> dict:
+    """
+    外存模式的特征工程：逐块计算特征并追加写入 Parquet 文件，内存峰值只与块大小有关。
+
+    每块前拼接上一块末尾的 max(LAGS + WINDOWS) 行原始数据作为重叠区，
+    保证块边界处的滞后/滑动特征与整体计算 (preprocess_data) 一致；
+    重叠行只用于计算，不会重复写出。序列开头特征不完整的行与 preprocess_data 一样被删除。
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): 按时间顺序排列的原始数据块（如 iter_csv_chunks 的结果）。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名（负荷）。
+        output_path (str): 输出的 Parquet 文件路径。
+
+    Returns:
+        dict: 写出统计 {"rows": 写出行数, "dropped": 删除的缺失行数, "chunks": 块数, "path": 输出路径}。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("外存模式需要 pyarrow: pip install pyarrow") from e
+
+    overlap = max(LAGS + WINDOWS)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+
+    writer = None
+    tail = None  # 上一块末尾的原始数据
+    stats = {"rows": 0, "dropped": 0, "chunks": 0, "path": output_path}
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            n_overlap = 0 if tail is None else len(tail)
+            frame = chunk if tail is None else pd.concat([tail, chunk], ignore_index=True)
+            tail = frame.iloc[-overlap:].reset_index(drop=True)
+
+            features = _extract_datetime_features(frame, time_col)
+            features = _create_lag_features(features, target_col, LAGS)
+            features = _create_rolling_features(features, target_col, WINDOWS)
+            features = features.iloc[n_overlap:]
+            n_rows = len(features)
+            features = downcast_features(features.dropna(), time_col)
+
+            table = pa.Table.from_pandas(features, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+
+            stats["rows"] += len(features)
+            stats["dropped"] += n_rows - len(features)
+            stats["chunks"] += 1
+            del frame, features, table
+        if writer is None:
+            raise ValueError("输入数据为空，没有可写出的特征。")
+        writer.close()
+        writer = None
+        os.replace(tmp_path, output_path)  # 写完后原子替换，避免读到半写的文件
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logger.info(f"外存特征工程完成: {stats['chunks']} 块，写出 {stats['rows']} 行，"
+                f"删除 {stats['dropped']} 行缺失值 -> {output_path}")
+    return stats
+
+
+def iter_feature_batches(path: str, columns: Optional[list] = None,
+                         batch_rows: int = 500_000) -> Iterator[pd.DataFrame]:
+    """按批读取 preprocess_chunked 写出的特征矩阵，供分批训练或打分使用。"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def preprocess_data_chunked(train_df: pd.DataFrame, test_df: pd.DataFrame, time_col: str, target_col: str,
+                            output_path: str, chunk_rows: int = 500_000):
+    """
+    preprocess_data 的外存替代：训练集和测试集按块经 preprocess_chunked 写出 Parquet，
+    再用 iter_feature_batches 分批读回并按测试集起点切分。
+
+    特征矩阵全程为 float32/int8，不会产生 preprocess_data 中的 float64 拼接表和整表副本。
+    仅支持单条序列（多电表模式仍使用 preprocess_data）。
+
+    Args:
+        train_df (pd.DataFrame): 原始训练集（已重采样）。
+        test_df (pd.DataFrame): 原始测试集（已重采样，紧接训练集之后）。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名（负荷）。
+        output_path (str): 中间特征矩阵的 Parquet 文件路径。
+        chunk_rows (int): 每块的行数，决定特征工程的内存峰值。
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: 处理后的训练集和测试集。
+    """
+    combined = pd.concat([train_df, test_df], ignore_index=True)
+    chunks = (combined.iloc[start:start + chunk_rows] for start in range(0, len(combined), chunk_rows))
+    preprocess_chunked(chunks, time_col, target_col, output_path)
+    del combined
+
+    test_start = test_df[time_col].min()
+    train_parts, test_parts = [], []
+    for batch in iter_feature_batches(output_path, batch_rows=chunk_rows):
+        in_test = (batch[time_col] >= test_start).to_numpy()
+        train_parts.append(batch[~in_test])
+        test_parts.append(batch[in_test])
+    processed_train_df = pd.concat(train_parts, ignore_index=True)
+    processed_test_df = pd.concat(test_parts, ignore_index=True)
+    if len(processed_test_df) < len(test_df):
+        logger.warning(f"测试集开头有 {len(test_df) - len(processed_test_df)} 行历史不足，外存模式下已删除。")
+    return processed_train_df, processed_test_df
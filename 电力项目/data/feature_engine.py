@@ -0,0 +1,225 @@
+# data/feature_engine.py
+import logging
+import math
+import os
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from data.holiday_calendar import holiday_row
+from data.processor import CALENDAR_FEATURES, LAGS, WINDOWS
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalFeatureEngine:
+    """
+    增量特征引擎：逐条接收新的负荷读数，以 O(1) 的代价输出该时刻的特征行。
+
+    - 滞后特征 (lag 1/6/24) 由一个环形缓冲区提供；
+    - 滑动均值/标准差 (window 3/12/24) 由每个窗口的累计和与平方和维护。
+      累计量基于一个平移量 (shift) 计算，避免负荷量级较大时平方和相减的精度损失。
+
+    输出的特征与 preprocess_data 的批处理结果一致（同样的列名与列顺序，
+    滑动窗口同样截止到上一时刻、不含当前读数），因此可以直接喂给已训练好的模型。
+    """
+
+    def __init__(self, target_col: str = "power_load",
+                 lags: Optional[List[int]] = None,
+                 windows: Optional[List[int]] = None,
+                 resync_every: int = 10000):
+        """
+        Args:
+            target_col (str): 目标列名（负荷），用于生成特征列名。
+            lags (list): 滞后阶数，默认与 processor.LAGS 相同。
+            windows (list): 滑动窗口大小，默认与 processor.WINDOWS 相同。
+            resync_every (int): 每处理多少条读数，从缓冲区重新计算一次累计和，
+                避免长时间运行后的浮点误差累积。
+        """
+        self.target_col = target_col
+        self.lags = list(lags if lags is not None else LAGS)
+        self.windows = list(windows if windows is not None else WINDOWS)
+        self.resync_every = resync_every
+        self.capacity = max(self.lags + self.windows)
+
+        self._buffer = np.full(self.capacity, np.nan)
+        self._pos = 0            # 下一个写入位置
+        self._count = 0          # 已接收的读数总数
+        self._sums = {w: 0.0 for w in self.windows}
+        self._sumsqs = {w: 0.0 for w in self.windows}
+        self._nan_counts = {w: 0 for w in self.windows}
+        self._shift: Optional[float] = None
+        self.last_timestamp: Optional[pd.Timestamp] = None
+
+    # ------------------------------------------------------------------
+    # 特征列
+    # ------------------------------------------------------------------
+    @property
+    def feature_columns(self) -> List[str]:
+        """特征列名（不含时间列和目标列），顺序与 preprocess_data 输出一致。"""
+        cols = list(CALENDAR_FEATURES)
+        cols += [f'{self.target_col}_lag_{lag}' for lag in self.lags]
+        for window in self.windows:
+            cols.append(f'{self.target_col}_rolling_mean_{window}')
+            cols.append(f'{self.target_col}_rolling_std_{window}')
+        return cols
+
+    @property
+    def history(self) -> np.ndarray:
+        """按时间顺序返回缓冲区中的最近读数（最多 capacity 条）。"""
+        n = min(self._count, self.capacity)
+        idx = (self._pos - n + np.arange(n)) % self.capacity
+        return self._buffer[idx]
+
+    # ------------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------------
+    def _value_at(self, lag: int) -> float:
+        """返回 lag 步之前的读数（写入当前读数之前调用）。"""
+        if self._count < lag:
+            return np.nan
+        return self._buffer[(self._pos - lag) % self.capacity]
+
+    def update(self, timestamp, value: float) -> Dict[str, float]:
+        """
+        接收一条新读数，并返回该时刻的特征行。
+
+        Args:
+            timestamp: 读数时间。读数按到达顺序处理（与 preprocess_data
+                按行位置计算 shift/rolling 的语义一致），调用方负责保证顺序。
+            value (float): 负荷读数，允许为 NaN。
+
+        Returns:
+            dict: 特征列名 -> 特征值。
+        """
+        timestamp = pd.Timestamp(timestamp)
+        value = float(value)
+
+        row = self._calendar_row(timestamp)
+
+        # 1. 滞后特征和滑动窗口特征：在写入当前读数之前读取（窗口截止到上一时刻）
+        for lag in self.lags:
+            row[f'{self.target_col}_lag_{lag}'] = self._value_at(lag)
+        for window in self.windows:
+            mean, std = self._window_stats(window)
+            row[f'{self.target_col}_rolling_mean_{window}'] = mean
+            row[f'{self.target_col}_rolling_std_{window}'] = std
+
+        # 2. 更新滑动窗口的累计量（移出最旧的读数，加入当前读数）
+        is_nan = math.isnan(value)
+        if self._shift is None and not is_nan:
+            self._shift = value
+        for window in self.windows:
+            if self._count >= window:
+                leaving = self._value_at(window)
+                if math.isnan(leaving):
+                    self._nan_counts[window] -= 1
+                else:
+                    leaving -= self._shift
+                    self._sums[window] -= leaving
+                    self._sumsqs[window] -= leaving * leaving
+            if is_nan:
+                self._nan_counts[window] += 1
+            else:
+                shifted = value - self._shift
+                self._sums[window] += shifted
+                self._sumsqs[window] += shifted * shifted
+
+        self._buffer[self._pos] = value
+        self._pos = (self._pos + 1) % self.capacity
+        self._count += 1
+        self.last_timestamp = timestamp
+
+        if self.resync_every and self._count % self.resync_every == 0:
+            self._resync()
+        return row
+
+    def _window_stats(self, window: int):
+        if self._count < window or self._nan_counts[window] > 0:
+            return np.nan, np.nan
+        total = self._sums[window]
+        mean = self._shift + total / window
+        if window < 2:
+            return mean, np.nan
+        var = (self._sumsqs[window] - total * total / window) / (window - 1)
+        return mean, math.sqrt(max(var, 0.0))
+
+    def _resync(self):
+        """从缓冲区重新计算各窗口的累计量。"""
+        recent = self.history
+        valid_recent = recent[~np.isnan(recent)]
+        if len(valid_recent):
+            self._shift = float(valid_recent.mean())
+        for window in self.windows:
+            values = recent[-window:]
+            valid = values[~np.isnan(values)] - (self._shift or 0.0)
+            self._nan_counts[window] = int(len(values) - len(valid))
+            self._sums[window] = float(valid.sum())
+            self._sumsqs[window] = float((valid * valid).sum())
+
+    @staticmethod
+    def _calendar_row(timestamp: pd.Timestamp) -> Dict[str, float]:
+        day_of_week = timestamp.dayofweek
+        return {
+            'hour': timestamp.hour,
+            'day_of_week': day_of_week,
+            'day_of_month': timestamp.day,
+            'month': timestamp.month,
+            'year': timestamp.year,
+            'is_weekend': int(day_of_week in (5, 6)),
+            **holiday_row(timestamp),
+        }
+
+    # ------------------------------------------------------------------
+    # 批量接口
+    # ------------------------------------------------------------------
+    def warm_up(self, df: pd.DataFrame, time_col: str, target_col: Optional[str] = None):
+        """
+        用历史数据初始化引擎状态。
+
+        只有最后 capacity 条读数会影响后续特征，因此只回放历史的尾部，
+        代价与历史长度无关。
+        """
+        target_col = target_col or self.target_col
+        tail = df[[time_col, target_col]].tail(self.capacity)
+        for timestamp, value in zip(tail[time_col], tail[target_col]):
+            self.update(timestamp, value)
+        logger.info(f"特征引擎已用 {len(df)} 条历史读数完成初始化，最新时间: {self.last_timestamp}")
+        return self
+
+    def transform(self, df: pd.DataFrame, time_col: str,
+                  target_col: Optional[str] = None) -> pd.DataFrame:
+        """
+        依次将 df 中的读数送入引擎，返回与 preprocess_data 同样格式的特征表
+        （包含时间列和目标列，未删除 NaN 行）。
+        """
+        target_col = target_col or self.target_col
+        rows = [self.update(t, v) for t, v in zip(df[time_col], df[target_col])]
+        features = pd.DataFrame(rows, columns=self.feature_columns, index=df.index)
+        return pd.concat([df[[time_col, target_col]], features], axis=1)
+
+    # ------------------------------------------------------------------
+    # 状态持久化
+    # ------------------------------------------------------------------
+    def save(self, path: str):
+        """保存引擎状态（通常与 best_model.pkl 放在同一目录）。"""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            joblib.dump(self, path)
+            logger.info(f"特征引擎状态已保存至: {path}")
+        except Exception as e:
+            logger.error(f"保存特征引擎状态时出错: {e}")
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "IncrementalFeatureEngine":
+        """加载已保存的引擎状态。"""
+        try:
+            engine = joblib.load(path)
+            logger.info(f"特征引擎状态已从 {path} 加载，最新时间: {engine.last_timestamp}")
+            return engine
+        except Exception as e:
+            logger.error(f"加载特征引擎状态时出错: {e}")
+            raise
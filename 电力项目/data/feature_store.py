@@ -0,0 +1,178 @@
+# data/feature_store.py
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from data import holiday_calendar, processor
+from data.processor import CALENDAR_FEATURES, LAGS, WINDOWS, preprocess_data
+
+logger = logging.getLogger(__name__)
+
+
+def feature_spec(time_col: str, target_col: str, series_col: Optional[str] = None) -> dict:
+    """
+    描述特征工程配置的字典，作为特征库键的一部分。
+
+    除了滞后/窗口/日期特征配置外，还包含 processor.py 和 holiday_calendar.py 源码的哈希
+    以及当前节假日数据源，特征逻辑或节假日数据一旦变化，旧的缓存自然失效。
+    """
+    source_hash = hashlib.sha256(inspect.getsource(processor).encode('utf-8')).hexdigest()
+    holiday_hash = hashlib.sha256(inspect.getsource(holiday_calendar).encode('utf-8')).hexdigest()
+    return {
+        'time_col': time_col,
+        'target_col': target_col,
+        'series_col': series_col,
+        'lags': list(LAGS),
+        'windows': list(WINDOWS),
+        'calendar_features': list(CALENDAR_FEATURES),
+        'processor_source': source_hash,
+        'holiday_source': holiday_hash,
+        'holiday_backend': holiday_calendar.holiday_backend(),
+    }
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """原始数据内容的指纹（列名、类型和逐行哈希），与文件路径无关。"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([(str(c), str(t)) for c, t in df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """
+    内容寻址的特征库：以 原始数据指纹 + 特征配置 的哈希为键，
+    将处理后的训练集/测试集保存为未压缩的 Arrow IPC (Feather v2) 文件，可内存映射读取。
+
+    目录结构: <root>/<key>/{train.arrow, test.arrow, spec.json}
+    总大小超过 max_bytes 时，按最近访问时间 (LRU) 淘汰旧条目。
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def make_key(self, train_df: pd.DataFrame, test_df: pd.DataFrame, spec: dict) -> str:
+        payload = json.dumps({
+            'train': frame_fingerprint(train_df),
+            'test': frame_fingerprint(test_df),
+            'spec': spec,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """读取条目；不存在或损坏时返回 None。命中会刷新条目的访问时间。"""
+        from pyarrow import feather
+
+        entry = self._entry_dir(key)
+        train_path = os.path.join(entry, "train.arrow")
+        test_path = os.path.join(entry, "test.arrow")
+        if not (os.path.exists(train_path) and os.path.exists(test_path)):
+            return None
+        try:
+            train_df = feather.read_table(train_path, memory_map=True).to_pandas()
+            test_df = feather.read_table(test_path, memory_map=True).to_pandas()
+        except Exception as e:
+            logger.warning(f"特征库条目损坏，将重新计算: {entry} ({e})")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        os.utime(entry)  # LRU: 以目录修改时间记录最近访问
+        return train_df, test_df
+
+    def put(self, key: str, train_df: pd.DataFrame, test_df: pd.DataFrame, spec: dict):
+        """写入条目（先写临时目录再重命名），然后按磁盘预算淘汰旧条目。"""
+        import pyarrow as pa
+        from pyarrow import feather
+
+        os.makedirs(self.root, exist_ok=True)
+        entry = self._entry_dir(key)
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        os.makedirs(tmp_entry)
+        try:
+            for name, df in (("train", train_df), ("test", test_df)):
+                table = pa.Table.from_pandas(df, preserve_index=True)
+                feather.write_feather(table, os.path.join(tmp_entry, f"{name}.arrow"),
+                                      compression='uncompressed')
+            with open(os.path.join(tmp_entry, "spec.json"), 'w', encoding='utf-8') as f:
+                json.dump(spec, f, ensure_ascii=False, indent=2)
+            if os.path.exists(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            os.rename(tmp_entry, entry)
+        except Exception:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+        logger.info(f"特征已写入特征库: {entry}")
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or name.endswith('.tmp'):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            entries.append((os.path.getmtime(path), size, path))
+        return entries
+
+    def evict(self):
+        """按 LRU 淘汰条目，直到总大小不超过 max_bytes（最新写入的条目总会保留）。"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        while total > self.max_bytes and len(entries) > 1:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            logger.info(f"特征库超出磁盘预算，已淘汰: {path}")
+
+
+def preprocess_data_cached(train_df: pd.DataFrame, test_df: pd.DataFrame,
+                           time_col: str, target_col: str,
+                           store: Optional[FeatureStore] = None,
+                           series_col: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    带特征库的 preprocess_data：原始数据与特征配置不变时直接复用已计算的特征。
+
+    Args:
+        train_df (pd.DataFrame): 原始训练集。
+        test_df (pd.DataFrame): 原始测试集。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名（负荷）。
+        store (FeatureStore): 特征库；None 或未安装 pyarrow 时等同于 preprocess_data。
+        series_col (str): 多电表模式下的序列编号列，见 preprocess_data。
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: 处理后的训练集和测试集。
+    """
+    if store is None:
+        return preprocess_data(train_df, test_df, time_col, target_col, series_col)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("未安装 pyarrow，特征库不可用，直接进行特征工程。")
+        return preprocess_data(train_df, test_df, time_col, target_col, series_col)
+
+    spec = feature_spec(time_col, target_col, series_col)
+    key = store.make_key(train_df, test_df, spec)
+    cached = store.get(key)
+    if cached is not None:
+        logger.info(f"特征库命中: {key}，跳过特征工程。")
+        return cached
+
+    processed_train_df, processed_test_df = preprocess_data(train_df, test_df, time_col, target_col, series_col)
+    try:
+        store.put(key, processed_train_df, processed_test_df, spec)
+    except Exception as e:
+        logger.warning(f"写入特征库失败（不影响本次结果）: {e}")
+    return processed_train_df, processed_test_df
@@ -0,0 +1,122 @@
+# src/data/holiday_calendar.py
+# 中国法定节假日日历表：节假日、调休上班日、桥接日，按日期向量化查表
+import logging
+from functools import lru_cache
+from typing import Dict, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 节假日特征列（build_holiday_table / holiday_features 的输出列）
+HOLIDAY_FEATURES = ['is_holiday', 'is_makeup_workday', 'is_bridge_day']
+# 日期表在所查年份前后多算的天数：跨年的假期（如元旦、春节）需要看到相邻年份的日期才能整段标记
+_PADDING_DAYS = 31
+
+
+def holiday_backend() -> str:
+    """当前使用的节假日数据源及其版本（特征库键的一部分，数据源变化时旧特征失效）。"""
+    try:
+        import chinese_calendar
+        return f"chinese_calendar {getattr(chinese_calendar, '__version__', '')}".strip()
+    except ImportError:
+        import holidays
+        return f"holidays {holidays.__version__}"
+
+
+def _official_days(start_year: int, end_year: int) -> Tuple[Set, Set]:
+    """
+    返回 [start_year, end_year] 内的法定放假日和调休上班日。
+
+    优先使用 chinese_calendar（按国务院每年发布的安排维护）：pip install chinesecalendar；
+    未安装时使用 holidays.China（同样包含调休放假日和周末上班日）。
+    两者对假期中周末的处理不同（holidays.China 不含国庆、春节假期中的周末），
+    由 build_holiday_table 统一把整段假期标记为节假日。
+    """
+    try:
+        import chinese_calendar
+        holiday_days = {d for d in chinese_calendar.holidays if start_year <= d.year <= end_year}
+        workdays = {d for d in chinese_calendar.workdays if start_year <= d.year <= end_year}
+    except ImportError:
+        import holidays
+        cn = holidays.China(years=range(start_year, end_year + 1))
+        holiday_days = set(cn.keys())
+        workdays = {d for d in cn.weekend_workdays if start_year <= d.year <= end_year}
+    return holiday_days, workdays
+
+
+def _to_days(dates) -> np.ndarray:
+    return np.array(sorted(dates), dtype='datetime64[D]')
+
+
+@lru_cache(maxsize=16)
+def build_holiday_table(start_year: int, end_year: int) -> pd.DataFrame:
+    """
+    预先计算 [start_year, end_year] 每一天的节假日特征（结果有缓存，请勿原地修改）。
+
+    - is_holiday: 法定节假日所在的整段假期（含调休放假日和假期中的周末）
+    - is_makeup_workday: 因调休而上班的周末
+    - is_bridge_day: 前后两天都放假的单个工作日（常见请假搭桥，负荷接近休息日）
+
+    Returns:
+        pd.DataFrame: 以日期为索引、连续覆盖整年的 int8 特征表。
+    """
+    # 前后多算一段，保证跨年假期和年初/年末的桥接日判断正确
+    padding = pd.Timedelta(days=_PADDING_DAYS)
+    dates = pd.date_range(pd.Timestamp(f"{start_year}-01-01") - padding,
+                          pd.Timestamp(f"{end_year}-12-31") + padding, freq="D")
+    days = dates.values.astype('datetime64[D]')
+    holiday_days, workdays = _official_days(start_year - 1, end_year + 1)
+
+    official = np.isin(days, _to_days(holiday_days))
+    is_makeup_workday = np.isin(days, _to_days(workdays))
+    day_off = ((dates.dayofweek >= 5) | official) & ~is_makeup_workday
+    # 连续休息日组成一段，包含法定节假日的整段都算节假日（两个数据源的结果一致）
+    run_id = np.cumsum(day_off & ~np.r_[False, day_off[:-1]])
+    runs_with_holiday = np.unique(run_id[official])
+    is_holiday = day_off & np.isin(run_id, runs_with_holiday)
+    prev_off = np.r_[False, day_off[:-1]]
+    next_off = np.r_[day_off[1:], False]
+    is_bridge_day = ~day_off & prev_off & next_off
+
+    table = pd.DataFrame({
+        'is_holiday': is_holiday,
+        'is_makeup_workday': is_makeup_workday,
+        'is_bridge_day': is_bridge_day,
+    }, index=dates).astype(np.int8).iloc[_PADDING_DAYS:-_PADDING_DAYS]
+    logger.debug(f"节假日表 {start_year}-{end_year}: {int(table['is_holiday'].sum())} 个节假日, "
+                 f"{int(table['is_makeup_workday'].sum())} 个调休上班日, "
+                 f"{int(table['is_bridge_day'].sum())} 个桥接日")
+    return table
+
+
+def holiday_features(times) -> pd.DataFrame:
+    """
+    按日期查表得到节假日特征，与 dt.dayofweek 一样是纯向量化操作。
+
+    Args:
+        times: 时间戳序列（Series / DatetimeIndex / 数组）。
+
+    Returns:
+        pd.DataFrame: HOLIDAY_FEATURES 列（int8），行顺序与 times 一致。
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    if times.hasnans:
+        raise ValueError(f"时间列包含 {int(times.isna().sum())} 个缺失值 (NaT)，无法计算节假日特征")
+    if len(times) == 0:
+        return pd.DataFrame({col: np.array([], dtype=np.int8) for col in HOLIDAY_FEATURES})
+    years = times.year
+    table = build_holiday_table(int(years.min()), int(years.max()))
+    # 日期表连续覆盖整年，日期与表首日的天数差即为行号
+    offsets = (times.values.astype('datetime64[D]') - table.index.values[0].astype('datetime64[D]')).astype(np.int64)
+    return pd.DataFrame(table.to_numpy()[offsets], columns=HOLIDAY_FEATURES)
+
+
+def holiday_row(timestamp: pd.Timestamp) -> Dict[str, int]:
+    """单个时间戳的节假日特征（增量特征引擎逐条调用）。"""
+    if pd.isna(timestamp):
+        raise ValueError("时间戳为 NaT，无法计算节假日特征")
+    table = build_holiday_table(timestamp.year, timestamp.year)
+    offset = (timestamp.normalize() - table.index[0]).days
+    return {col: int(table[col].iat[offset]) for col in HOLIDAY_FEATURES}
@@ -1,12 +1,107 @@
 # src/data/loader.py
 import pandas as pd
-from typing import Tuple
+import numpy as np
+from typing import Optional, Tuple
+import hashlib
 import logging
+import os
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
-def load_data(train_path: str, test_path: str, time_col: str = 'time') -> Tuple[pd.DataFrame, pd.DataFrame]:
+
+def _cache_path(source_path: str, cache_dir: str, time_col: str, time_format: Optional[str]) -> str:
+    """
+    根据源文件路径、大小、修改时间和解析参数生成缓存文件路径。
+    源文件或时间列/时间格式一旦变化，缓存自动失效。
+    """
+    stat = os.stat(source_path)
+    fingerprint = f"{stat.st_size}|{stat.st_mtime_ns}|{time_col}|{time_format}"
+    key = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{_cache_prefix(source_path)}{key}.parquet")
+
+
+def _cache_prefix(source_path: str) -> str:
+    """同一源文件所有缓存共用的前缀：文件名 + 完整路径的哈希（不同目录下的同名文件互不影响）。"""
+    path_key = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return f"{name}-{path_key}-"
+
+
+def _parse_csv(path: str, time_col: str, time_format: Optional[str]) -> pd.DataFrame:
+    """解析 CSV：时间列转为 datetime64，浮点列压缩为 float32（整数列如电表编号保持原样，避免丢失精度）。"""
+    df = pd.read_csv(path)
+    if time_format:
+        # 显式格式：跳过逐行格式推断
+        df[time_col] = pd.to_datetime(df[time_col], format=time_format)
+    else:
+        df[time_col] = pd.to_datetime(df[time_col])
+
+    float_cols = [col for col in df.columns
+                  if col != time_col and pd.api.types.is_float_dtype(df[col])]
+    df[float_cols] = df[float_cols].astype(np.float32)
+    return df
+
+
+def read_csv_cached(path: str, time_col: str = 'time', time_format: Optional[str] = None,
+                    cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    读取单个 CSV，并在 cache_dir 中维护其 Parquet 缓存。
+
+    缓存以 源路径 + 文件大小 + 修改时间 + 时间列 + 时间格式 为键；命中时直接读取列式文件，
+    未命中时解析 CSV 并写入缓存（同一源文件的旧缓存会被清理）。
+    未安装 pyarrow 或未指定 cache_dir 时退化为直接解析 CSV。
+
+    Args:
+        path (str): CSV 文件路径。
+        time_col (str): 时间列名。
+        time_format (str): 时间格式，如 "%Y/%m/%d %H:%M"；None 表示自动推断。
+        cache_dir (str): 缓存目录；None 表示不使用缓存。
+
+    Returns:
+        pd.DataFrame: 解析后的数据。
+    """
+    if cache_dir is None:
+        return _parse_csv(path, time_col, time_format)
+
+    try:
+        import pyarrow  # noqa: F401  # Parquet 读写依赖: pip install pyarrow
+    except ImportError:
+        logger.warning("未安装 pyarrow，跳过 Parquet 缓存，直接解析 CSV。")
+        return _parse_csv(path, time_col, time_format)
+
+    cache_path = _cache_path(path, cache_dir, time_col, time_format)
+    if os.path.exists(cache_path):
+        try:
+            df = pd.read_parquet(cache_path)
+            logger.info(f"命中缓存: {cache_path}")
+            return df
+        except Exception as e:
+            logger.warning(f"读取缓存失败，将重新解析 CSV: {e}")
+
+    df = _parse_csv(path, time_col, time_format)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 清理同一源文件的旧缓存
+        prefix = _cache_prefix(path)
+        for name in os.listdir(cache_dir):
+            # 前缀之后只能是 16 位的版本键，避免误删 train-extra.csv 等其他源文件的缓存
+            if (name.startswith(prefix) and name.endswith('.parquet')
+                    and len(name) == len(prefix) + 16 + len('.parquet')):
+                os.remove(os.path.join(cache_dir, name))
+        # 先写临时文件再原子替换，避免并发进程读到半写的缓存
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"已写入缓存: {cache_path}")
+    except Exception as e:
+        logger.warning(f"写入缓存失败（不影响本次加载）: {e}")
+    return df
+
+
+def load_data(train_path: str, test_path: str, time_col: str = 'time',
+              time_format: Optional[str] = None,
+              cache_dir: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     加载训练集和测试集数据，并解析时间列。
 
@@ -14,18 +109,17 @@ def load_data(train_path: str, test_path: str, time_col: str = 'time') -> Tuple[
         train_path (str): 训练集文件路径。
         test_path (str): 测试集文件路径。
         time_col (str): 时间列的列名，默认为 'time'。
+        time_format (str): 时间列格式（如 config.TIME_FORMAT），默认自动推断。
+        cache_dir (str): Parquet 缓存目录（如 config.CACHE_DIR），默认不使用缓存。
 
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: 训练集和测试集 DataFrame（time 已解析为 datetime）。
     """
     try:
-        # 显式指定 date_parser 来解析时间
-        parse_dates = [time_col]  # 告诉 pandas 把这一列当作日期解析
-
-        train_df = pd.read_csv(train_path, parse_dates=parse_dates)
-        test_df = pd.read_csv(test_path, parse_dates=parse_dates)
+        train_df = read_csv_cached(train_path, time_col, time_format, cache_dir)
+        test_df = read_csv_cached(test_path, time_col, time_format, cache_dir)
 
-        # ✅ 确保 time 列是 datetime 类型（以防 parse_dates 失败）
+        # ✅ 确保 time 列是 datetime 类型（以防缓存中的类型异常）
         if not pd.api.types.is_datetime64_any_dtype(train_df[time_col]):
             train_df[time_col] = pd.to_datetime(train_df[time_col])
         if not pd.api.types.is_datetime64_any_dtype(test_df[time_col]):
@@ -43,4 +137,4 @@ def load_data(train_path: str, test_path: str, time_col: str = 'time') -> Tuple[
         raise
     except Exception as e:
         logger.error(f"加载数据时发生错误: {e}")
-        raise
\ No newline at end of file
+        raise
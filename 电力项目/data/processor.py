@@ -1,23 +1,53 @@
 # src/data/processor.py
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Optional, Tuple
 import logging
 from datetime import datetime
-import holidays # 可能需要安装: pip install holidays
+
+from data.holiday_calendar import HOLIDAY_FEATURES, holiday_features
 
 logger = logging.getLogger(__name__)
 
+# 滞后与滑动窗口配置（增量特征引擎 data/feature_engine.py 共用同一份配置）
+LAGS = [1, 6, 24]
+WINDOWS = [3, 12, 24]
+# 日期时间特征列（build_calendar_features 的输出列）
+CALENDAR_FEATURES = ['hour', 'day_of_week', 'day_of_month', 'month', 'year', 'is_weekend'] + HOLIDAY_FEATURES
+
+def build_calendar_features(times) -> pd.DataFrame:
+    """
+    由时间戳序列向量化地构建日期时间特征（批处理、递归预测等共用）。
+
+    Args:
+        times: 时间戳序列（Series / DatetimeIndex / 数组）。
+
+    Returns:
+        pd.DataFrame: 日期时间特征，行顺序与 times 一致。
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(times))
+    features = pd.DataFrame({
+        'hour': times.hour,
+        'day_of_week': times.dayofweek,  # 0=Monday, 6=Sunday
+        'day_of_month': times.day,
+        'month': times.month,
+        'year': times.year,
+    })
+    features['is_weekend'] = features['day_of_week'].isin([5, 6]).astype(int) # 5=Saturday, 6=Sunday
+    # 节假日/调休/桥接日：按日期查预先计算的日历表，不逐行构造节假日对象
+    holiday = holiday_features(times)
+    for col in HOLIDAY_FEATURES:
+        features[col] = holiday[col].to_numpy()
+    return features
+
 def _extract_datetime_features(df: pd.DataFrame, time_col: str) -> pd.DataFrame:
     """从时间戳列提取日期时间特征。"""
     df = df.copy()
     df[time_col] = pd.to_datetime(df[time_col])
-    df['hour'] = df[time_col].dt.hour
-    df['day_of_week'] = df[time_col].dt.dayofweek  # 0=Monday, 6=Sunday
-    df['day_of_month'] = df[time_col].dt.day
-    df['month'] = df[time_col].dt.month
-    df['year'] = df[time_col].dt.year
-    df['is_weekend'] = df['day_of_week'].isin([5, 6]).astype(int) # 5=Saturday, 6=Sunday
-    # df['is_holiday'] = df[time_col].apply(lambda x: int(x in holidays.US())) # 示例，需根据国家调整
+    calendar = build_calendar_features(df[time_col])
+    for col in calendar.columns:
+        df[col] = calendar[col].to_numpy()
     return df
 
 def _create_lag_features(df: pd.DataFrame, target_col: str, lags: list) -> pd.DataFrame:
@@ -28,15 +58,84 @@ def _create_lag_features(df: pd.DataFrame, target_col: str, lags: list) -> pd.Da
     return df
 
 def _create_rolling_features(df: pd.DataFrame, target_col: str, windows: list) -> pd.DataFrame:
-    """创建滑动窗口统计特征。"""
+    """
+    创建滑动窗口统计特征。
+
+    窗口截止到上一时刻（先 shift(1) 再 rolling），不包含当前时刻的目标值：
+    预测时当前值未知，训练和递归预测 (recursive_forecast) 使用同一个定义。
+    """
     df = df.copy()
+    previous = df[target_col].shift(1)
+    for window in windows:
+        df[f'{target_col}_rolling_mean_{window}'] = previous.rolling(window=window).mean()
+        df[f'{target_col}_rolling_std_{window}'] = previous.rolling(window=window).std()
+    return df
+
+def _rolling_mean_std(values: np.ndarray, window: int, chunk_rows: int = 1 << 20):
+    """
+    向量化计算以每个位置结尾的滑动窗口均值和标准差 (ddof=1)，窗口内有 NaN 时结果为 NaN。
+
+    按行分块计算，避免 (n, window) 的临时数组占用过多内存。
+    """
+    n = len(values)
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n < window:
+        return mean, std
+    view = sliding_window_view(values, window)  # 第 j 行为 values[j:j+window]
+    for start in range(0, len(view), chunk_rows):
+        block = view[start:start + chunk_rows]
+        mean[start + window - 1:start + window - 1 + len(block)] = block.mean(axis=1)
+        std[start + window - 1:start + window - 1 + len(block)] = block.std(axis=1, ddof=1)
+    return mean, std
+
+def _create_grouped_features(df: pd.DataFrame, target_col: str, series_col: str,
+                             lags: list, windows: list) -> pd.DataFrame:
+    """
+    按序列 (series_col) 分组创建滞后和滑动窗口特征，一次向量化完成，不逐个序列循环。
+
+    组内顺序沿用行的原始位置（与单序列模式的 shift/rolling 语义一致），
+    每个位置只使用同一序列中更早的读数（滑动窗口同样截止到上一时刻）。
+    """
+    df = df.copy()
+    n = len(df)
+    codes = pd.factorize(df[series_col])[0]
+    order = np.argsort(codes, kind='stable')  # 按序列稳定排序，组内保持原始顺序
+    values = df[target_col].to_numpy(dtype=np.float64)[order]
+    sorted_codes = codes[order]
+
+    # 每行在所属序列中的位置 (0, 1, 2, ...)
+    is_start = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    positions = np.arange(n)
+    pos_in_group = positions - np.maximum.accumulate(np.where(is_start, positions, 0))
+
+    def scatter(sorted_values):
+        out = np.empty(n)
+        out[order] = sorted_values
+        return out
+
+    for lag in lags:
+        shifted = np.full(n, np.nan)
+        shifted[lag:] = values[:-lag]
+        shifted[pos_in_group < lag] = np.nan  # 不跨序列取值
+        df[f'{target_col}_lag_{lag}'] = scatter(shifted)
     for window in windows:
-        df[f'{target_col}_rolling_mean_{window}'] = df[target_col].rolling(window=window).mean()
-        df[f'{target_col}_rolling_std_{window}'] = df[target_col].rolling(window=window).std()
+        # 以上一位置结尾的窗口：整体后移一位
+        ending_mean, ending_std = _rolling_mean_std(values, window)
+        mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        mean[1:] = ending_mean[:-1]
+        std[1:] = ending_std[:-1]
+        invalid = pos_in_group < window
+        mean[invalid] = np.nan
+        std[invalid] = np.nan
+        df[f'{target_col}_rolling_mean_{window}'] = scatter(mean)
+        df[f'{target_col}_rolling_std_{window}'] = scatter(std)
     return df
 
 def preprocess_data(train_df: pd.DataFrame, test_df: pd.DataFrame,
-                   time_col: str, target_col: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+                   time_col: str, target_col: str,
+                   series_col: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     对训练集和测试集进行预处理（特征工程）。
 
@@ -45,6 +144,8 @@ def preprocess_data(train_df: pd.DataFrame, test_df: pd.DataFrame,
         test_df (pd.DataFrame): 原始测试集。
         time_col (str): 时间列名。
         target_col (str): 目标列名（负荷）。
+        series_col (str): 序列编号列（如电表/馈线编号）。指定时按序列分组计算
+            滞后和滑动特征（多电表模式）；默认 None 表示整张表是一条序列。
 
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: 处理后的训练集和测试集。
@@ -60,13 +161,15 @@ def preprocess_data(train_df: pd.DataFrame, test_df: pd.DataFrame,
     # 1. 提取日期时间特征
     combined_df = _extract_datetime_features(combined_df, time_col)
 
-    # 2. 创建滞后特征 (例如，前1, 6, 24小时的负荷)
-    lags = [1, 6, 24]
-    combined_df = _create_lag_features(combined_df, target_col, lags)
+    if series_col is None:
+        # 2. 创建滞后特征 (例如，前1, 6, 24小时的负荷)
+        combined_df = _create_lag_features(combined_df, target_col, LAGS)
 
-    # 3. 创建滑动窗口特征 (例如，过去3, 12, 24小时的均值和标准差)
-    windows = [3, 12, 24]
-    combined_df = _create_rolling_features(combined_df, target_col, windows)
+        # 3. 创建滑动窗口特征 (例如，过去3, 12, 24小时的均值和标准差)
+        combined_df = _create_rolling_features(combined_df, target_col, WINDOWS)
+    else:
+        # 2-3. 多电表模式：按序列分组，一次性创建滞后和滑动窗口特征
+        combined_df = _create_grouped_features(combined_df, target_col, series_col, LAGS, WINDOWS)
 
     # 4. 处理缺失值 (滞后和滑动特征会产生NaN)
     # 对于训练集，可以删除含有NaN的行
@@ -88,8 +191,14 @@ def preprocess_data(train_df: pd.DataFrame, test_df: pd.DataFrame,
     # 或者，如果模型允许，保留并让模型处理（如XGBoost可以处理缺失值）
     # 这里选择用训练集最后一个有效值填充测试集的初始缺失
     if processed_test_df.isnull().any().any():
-        last_valid_values = processed_train_df.iloc[-1] # 获取训练集最后一行
-        processed_test_df.fillna(last_valid_values, inplace=True)
+        if series_col is None:
+            last_valid_values = processed_train_df.iloc[-1] # 获取训练集最后一行
+            processed_test_df.fillna(last_valid_values, inplace=True)
+        else:
+            # 多电表模式：用同一序列在训练集中的最后一行填充
+            last_rows = processed_train_df.groupby(series_col).tail(1).set_index(series_col)
+            fill_values = last_rows.reindex(processed_test_df[series_col]).set_index(processed_test_df.index)
+            processed_test_df.fillna(fill_values, inplace=True)
         logger.warning("测试集存在缺失值，已用训练集最后一行的值填充。")
 
     logger.info(f"数据预处理完成！处理后训练集: {processed_train_df.shape}, 处理后测试集: {processed_test_df.shape}")
@@ -0,0 +1,192 @@
+# src/data/resample.py
+# 规则时间网格重采样与缺口填补：位于 load_data 和 preprocess_data 之间
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FILL_METHODS = ("interpolate", "seasonal", None)
+GAP_REPORT_COLUMNS = ['series', 'start', 'end', 'length', 'filled', 'method']
+
+
+def _nan_runs(is_nan: np.ndarray, breaks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    找出连续缺失段，返回各段的起始位置和长度。
+
+    Args:
+        is_nan (np.ndarray): 缺失标记。
+        breaks (np.ndarray): 序列起点标记（缺失段不跨序列）。
+    """
+    starts = is_nan & (np.r_[True, ~is_nan[:-1]] | breaks)
+    run_id = np.cumsum(starts) - 1
+    start_positions = np.flatnonzero(starts)
+    lengths = np.bincount(run_id[is_nan], minlength=len(start_positions))
+    return start_positions, lengths
+
+
+def resample_to_grid(df: pd.DataFrame, time_col: str, target_col: str, freq: str = "h",
+                     agg: str = "mean", max_gap: Optional[int] = 6,
+                     method: Optional[str] = "interpolate", season_length: Optional[int] = None,
+                     series_col: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    把不规则的读数重采样到规则时间网格，并填补不超过 max_gap 步的缺口。
+
+    处理步骤（全部向量化，多电表时不逐个序列循环）:
+        1. 时间向下取整到 freq，同一格内的多条读数（重复读数、15 分钟读数等）按 agg 聚合；
+        2. 每条序列在其首尾时间之间重建完整网格，缺失的时刻为 NaN；
+        3. 长度 <= max_gap 的缺口按 method 填补:
+           "interpolate" 在缺口两侧的有效值之间线性插值（序列首尾的缺口不填补），
+           "seasonal" 复制一个季节周期（默认 1 天）之前的值，没有则复制一个周期之后的值；
+        4. 更长的缺口保留为 NaN（preprocess_data 会删除受影响的训练行），并写入报告。
+
+    Args:
+        df (pd.DataFrame): load_data 返回的原始数据。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名。
+        freq (str): 目标频率，如 "h"、"15min"。
+        agg (str): 同一格内多条读数的聚合方式 ("mean", "sum", "last", "max" ...)。
+        max_gap (int): 可填补的最大缺口长度（步数）；None 表示不限制。
+        method (str): 填补方法，"interpolate"、"seasonal" 或 None（不填补）。
+        season_length (int): seasonal 方法的周期（步数），默认为 1 天对应的步数。
+        series_col (str): 多电表数据的序列编号列。
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: 重采样后的数据，以及缺口报告
+            (series, start, end, length, filled, method)。
+    """
+    if method not in FILL_METHODS:
+        raise ValueError(f"不支持的填补方法: {method}，可选 {FILL_METHODS}")
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    if season_length is None:
+        season_length = max(1, int(pd.Timedelta(days=1) / step))
+
+    # 1. 取整并聚合重复读数
+    keys = [series_col] if series_col else []
+    value_cols = [col for col in df.columns if col not in keys + [time_col]]
+    binned = df.assign(**{time_col: df[time_col].dt.floor(freq)})
+    n_duplicates = int(binned.duplicated(subset=keys + [time_col]).sum())
+    grouped = binned.groupby(keys + [time_col], sort=True)[value_cols].agg(agg)
+
+    # 2. 每条序列在 [首个时刻, 最后时刻] 之间重建完整网格
+    if series_col:
+        series_values = grouped.index.get_level_values(0)
+        times = grouped.index.get_level_values(1)
+        bounds = pd.DataFrame({'series': series_values, 'time': times}).groupby('series', sort=True)['time'].agg(['min', 'max'])
+        series_ids = bounds.index.to_numpy()
+        counts = ((bounds['max'] - bounds['min']) // step).to_numpy().astype(np.int64) + 1
+        starts = np.repeat(bounds['min'].to_numpy(), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        grid_times = starts + offsets * step.to_timedelta64()
+        grid_series = np.repeat(series_ids, counts)
+        full_index = pd.MultiIndex.from_arrays([grid_series, grid_times], names=[series_col, time_col])
+        breaks = np.r_[True, grid_series[1:] != grid_series[:-1]]
+    else:
+        times = grouped.index
+        full_index = pd.date_range(times.min(), times.max(), freq=freq, name=time_col)
+        grid_series = np.zeros(len(full_index), dtype=np.int64)
+        breaks = np.zeros(len(full_index), dtype=bool)
+        if len(full_index):
+            breaks[0] = True
+    result = grouped.reindex(full_index)
+    values = result[target_col].to_numpy(dtype=np.float64).copy()
+    n_positions = len(values)
+
+    # 3. 找出缺失段
+    is_nan = np.isnan(values)
+    run_starts, run_lengths = _nan_runs(is_nan, breaks)
+    run_ends = run_starts + run_lengths - 1
+    fillable = (run_lengths <= max_gap) if max_gap is not None else np.ones(len(run_starts), dtype=bool)
+    if method is None:
+        fillable[:] = False
+
+    filled_mask = np.zeros(n_positions, dtype=bool)
+    if fillable.any():
+        # 每个位置所属的缺失段，只填补可填补的段
+        run_of_position = np.full(n_positions, -1)
+        run_of_position[is_nan] = np.repeat(np.arange(len(run_starts)), run_lengths)
+        position_fillable = np.zeros(n_positions, dtype=bool)
+        position_fillable[is_nan] = fillable[run_of_position[is_nan]]
+        positions = np.arange(n_positions)
+
+        if method == "interpolate":
+            # 缺口两侧都必须是同一序列内的有效值
+            series_end = np.r_[breaks[1:], True]
+            bounded = ~breaks[run_starts] & ~series_end[run_ends]
+            position_fillable[is_nan] &= bounded[run_of_position[is_nan]]
+            valid = ~is_nan
+            values[position_fillable] = np.interp(positions[position_fillable], positions[valid], values[valid])
+            filled_mask = position_fillable
+        else:
+            # 复制一个周期之前（同一序列内）的值，没有则复制一个周期之后的值
+            series_start = np.maximum.accumulate(np.where(breaks, positions, 0))
+            series_end_pos = np.minimum.accumulate(
+                np.where(np.r_[breaks[1:], True], positions, n_positions - 1)[::-1])[::-1]
+            target = np.flatnonzero(position_fillable)
+            before = target - season_length
+            after = target + season_length
+            candidate = np.full(len(target), np.nan)
+            ok_before = before >= series_start[target]
+            candidate[ok_before] = values[before[ok_before]]
+            need_after = np.isnan(candidate) & (after <= series_end_pos[target])
+            candidate[need_after] = values[np.minimum(after, n_positions - 1)[need_after]]
+            values[target] = candidate
+            filled_mask[target] = ~np.isnan(candidate)
+
+    result[target_col] = values.astype(df[target_col].dtype, copy=False)
+    result = result.reset_index()
+
+    # 4. 缺口报告
+    run_filled = (np.bincount(np.repeat(np.arange(len(run_starts)), run_lengths),
+                              weights=filled_mask[is_nan], minlength=len(run_starts)) == run_lengths
+                  if len(run_starts) else np.zeros(0, dtype=bool))
+    grid_time_values = result[time_col].to_numpy()
+    report = pd.DataFrame({
+        'series': grid_series[run_starts] if series_col else None,
+        'start': grid_time_values[run_starts],
+        'end': grid_time_values[run_ends],
+        'length': run_lengths,
+        'filled': run_filled,
+        'method': np.where(run_filled, method or '', ''),
+    }, columns=GAP_REPORT_COLUMNS)
+
+    logger.info(f"重采样到 {freq} 网格: {len(df)} 条读数 -> {len(result)} 行，"
+                f"聚合 {n_duplicates} 条同格读数，发现 {len(report)} 个缺口"
+                f"（填补 {int(report['filled'].sum())} 个，共 {int(filled_mask.sum())} 个点）。")
+    if len(report) and not report['filled'].all():
+        logger.warning(f"{int((~report['filled']).sum())} 个缺口未填补 (超过 max_gap={max_gap} 或位于序列首尾)，"
+                       f"对应的特征行会被删除。")
+    return result, report
+
+
+def resample_train_test(train_df: pd.DataFrame, test_df: pd.DataFrame, time_col: str, target_col: str,
+                        freq: str = "h", agg: str = "mean", max_gap: Optional[int] = 6,
+                        method: Optional[str] = "interpolate", season_length: Optional[int] = None,
+                        series_col: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    拼接训练集和测试集后一次重采样，再按测试集的起始时刻拆分。
+
+    分别重采样时，跨越训练/测试分界的缺口既不会被报告也不会被填补，
+    测试集开头的滞后和滑动特征会错位相应的步数。
+
+    Args:
+        train_df (pd.DataFrame): 原始训练集。
+        test_df (pd.DataFrame): 原始测试集（时间上紧接训练集）。
+        其余参数同 resample_to_grid。多电表模式下按每条序列在测试集中的起始时刻拆分，
+        只出现在训练集中的序列全部归入训练集。
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: 重采样后的训练集、测试集，以及缺口报告。
+    """
+    combined = pd.concat([train_df, test_df], ignore_index=True)
+    resampled, report = resample_to_grid(combined, time_col, target_col, freq, agg, max_gap, method,
+                                         season_length, series_col)
+    if series_col:
+        test_start = test_df.groupby(series_col)[time_col].min().dt.floor(freq)
+        boundary = resampled[series_col].map(test_start)
+    else:
+        boundary = test_df[time_col].min().floor(freq)
+    is_test = (resampled[time_col] >= boundary).to_numpy()
+    return (resampled[~is_test].reset_index(drop=True), resampled[is_test].reset_index(drop=True), report)
@@ -1,13 +1,28 @@
 # main.py
 import logging
+import os
 
 import pandas as pd
 
-from config import TRAIN_FILE, TEST_FILE, MODEL_FILE, TIME_COL, TARGET_COL
-from 慧与.课上代码.电力项目.data.loader import load_data
-from 慧与.课上代码.电力项目.data.processor import preprocess_data
-from src.models.train import train_model, evaluate_model, save_model
+from config import (TRAIN_FILE, TEST_FILE, MODEL_FILE, FEATURE_STATE_FILE, LEADERBOARD_FILE, XGB_PARAMS_FILE,
+                    REGISTRY_DIR,
+                    MODEL_TYPE, TIME_COL, TARGET_COL,
+                    TIME_FORMAT, CACHE_DIR, FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES, TELEMETRY_FILE,
+                    CHUNKED_FEATURES, FEATURE_CHUNK_ROWS, FEATURE_CHUNK_FILE,
+                    PLOT_FILE,
+                    RESAMPLE_FREQ, RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL,
+                    SERIES_COL, FLEET_CLUSTERS, FLEET_MODEL_FILE, TEST_SIZE)
+from data.loader import load_data
+from data.resample import resample_train_test
+from data.feature_store import FeatureStore, preprocess_data_cached
+from data.chunked import preprocess_data_chunked
+from data.feature_engine import IncrementalFeatureEngine
+from src.models.train import train_model, evaluate_model, save_model, run_tournament, set_watermark
 from src.models.predict import make_predictions
+from src.models.tuning import load_params
+from src.models.registry import ModelRegistry
+from src.models.fleet import cluster_series, train_fleet_models, predict_fleet
+from src.utils.telemetry import Telemetry
 # 可选导入
 from src.visualization.plotter import plot_time_series, plot_predictions
 from sklearn.model_selection import train_test_split # <-- 添加这一行！
@@ -17,14 +32,111 @@ from sklearn.model_selection import train_test_split # <-- 添加这一行！
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def main():
+def train_fleet(train_path: str, test_path: str, series_col: str, n_clusters=None) -> pd.DataFrame:
+    """
+    多电表训练流程：按序列分组构造特征，按时间划分训练/验证集，
+    训练全局模型或按负荷形态聚类后每簇一个模型，保存到 FLEET_MODEL_FILE 并为测试集打分。
+
+    Args:
+        train_path (str): 训练数据 CSV（长表，包含 series_col 列）。
+        test_path (str): 测试数据 CSV。
+        series_col (str): 序列编号列。
+        n_clusters (int): 簇数；None 表示训练一个全局模型。
+
+    Returns:
+        pd.DataFrame: 测试集预测 (时间, 序列编号, predicted_load)。
+    """
+    logger.info(f"=== 多电表训练启动 (series_col={series_col}, clusters={n_clusters}) ===")
+    telemetry = Telemetry(TELEMETRY_FILE)
+
+    with telemetry.stage("load_data") as record:
+        train_df, test_df = load_data(train_path, test_path, TIME_COL, TIME_FORMAT, CACHE_DIR)
+        record["rows"] = len(train_df) + len(test_df)
+
+    with telemetry.stage("resample", rows=len(train_df) + len(test_df)):
+        train_df, test_df, _ = resample_train_test(train_df, test_df, TIME_COL, TARGET_COL, RESAMPLE_FREQ,
+                                                   RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL,
+                                                   series_col=series_col)
+
+    with telemetry.stage("preprocess_data", rows=len(train_df) + len(test_df)):
+        processed_train_df, processed_test_df = preprocess_data_cached(
+            train_df, test_df, TIME_COL, TARGET_COL, FeatureStore(FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES),
+            series_col=series_col)
+    feature_cols = [col for col in processed_train_df.columns if col not in [TIME_COL, TARGET_COL, series_col]]
+
+    # 多条序列交错排列，按时间切分（而不是按行）划分训练/验证集
+    cutoff = processed_train_df[TIME_COL].quantile(1 - TEST_SIZE)
+    train_part = processed_train_df[processed_train_df[TIME_COL] <= cutoff]
+    val_part = processed_train_df[processed_train_df[TIME_COL] > cutoff]
+
+    model_type = MODEL_TYPE if MODEL_TYPE != "tournament" else "XGBoost"
+    params = load_params(XGB_PARAMS_FILE) if model_type == "XGBoost" else None
+    with telemetry.stage("train_model", rows=len(train_part), model_type=model_type, clusters=n_clusters):
+        assignments = (cluster_series(train_part, series_col, TIME_COL, TARGET_COL, n_clusters)
+                       if n_clusters else None)
+        fleet = train_fleet_models(train_part, feature_cols, TARGET_COL, series_col, assignments,
+                                   model_type=model_type, params=params)
+
+    with telemetry.stage("evaluate_model", rows=len(val_part)):
+        evaluate_model(fleet, val_part[feature_cols + [series_col]], val_part[TARGET_COL])
+
+    with telemetry.stage("save_model"):
+        save_model(fleet, FLEET_MODEL_FILE)
+
+    with telemetry.stage("make_predictions", rows=len(processed_test_df)):
+        predictions = predict_fleet(fleet, processed_test_df)
+    result = pd.DataFrame({TIME_COL: processed_test_df[TIME_COL].to_numpy(),
+                           series_col: processed_test_df[series_col].to_numpy(),
+                           "predicted_load": predictions})
+    print("预测结果 (前5个):")
+    print(result.head())
+    telemetry.log_summary()
+    return result
+
+
+def main(train_path: str = TRAIN_FILE, test_path: str = TEST_FILE, chunked: bool = CHUNKED_FEATURES):
+    """
+    单序列训练流程：加载、重采样、特征工程、训练、评估、保存/发布模型并为测试集打分。
+
+    Args:
+        train_path (str): 训练数据 CSV，默认 config.TRAIN_FILE。
+        test_path (str): 测试数据 CSV，默认 config.TEST_FILE。
+        chunked (bool): 使用外存特征工程 (preprocess_chunked + iter_feature_batches)，
+            特征矩阵以 float32 分块写盘，不经过特征库；默认 config.CHUNKED_FEATURES。
+    """
+    if SERIES_COL:
+        return train_fleet(train_path, test_path, SERIES_COL, FLEET_CLUSTERS)
     logger.info("=== 电力负荷预测项目启动 ===")
+    # 各阶段的耗时、CPU 时间、内存峰值和行数写入 logs/telemetry.jsonl
+    telemetry = Telemetry(TELEMETRY_FILE)
 
     # 1. 加载数据
-    train_df, test_df = load_data(TRAIN_FILE, TEST_FILE)
+    with telemetry.stage("load_data") as record:
+        train_df, test_df = load_data(train_path, test_path, TIME_COL, TIME_FORMAT, CACHE_DIR)
+        record["rows"] = len(train_df) + len(test_df)
+
+    # 1.1 对齐到规则时间网格：聚合重复读数，填补短缺口 (滞后特征依赖规则的步长)
+    with telemetry.stage("resample", rows=len(train_df) + len(test_df)) as record:
+        # 训练集和测试集一起重采样，跨越两者分界的缺口同样会被填补或报告
+        train_df, test_df, gaps = resample_train_test(train_df, test_df, TIME_COL, TARGET_COL, RESAMPLE_FREQ,
+                                                      RESAMPLE_AGG, RESAMPLE_MAX_GAP, RESAMPLE_FILL)
+        record["gaps"] = len(gaps)
+        record["gaps_filled"] = int(gaps['filled'].sum())
+        if len(gaps):
+            logger.info(f"数据缺口:\n{gaps.to_string(index=False)}")
 
     # 2. 数据预处理 (特征工程)
-    processed_train_df, processed_test_df = preprocess_data(train_df, test_df, TIME_COL, TARGET_COL)
+    if chunked:
+        # 外存模式：按块计算特征写入 Parquet，再分批读回，内存峰值只与块大小和 float32 特征矩阵有关
+        with telemetry.stage("preprocess_chunked", rows=len(train_df) + len(test_df)):
+            processed_train_df, processed_test_df = preprocess_data_chunked(
+                train_df, test_df, TIME_COL, TARGET_COL, FEATURE_CHUNK_FILE, FEATURE_CHUNK_ROWS)
+    else:
+        # 原始数据和特征配置未变化时，直接从特征库读取
+        with telemetry.stage("preprocess_data", rows=len(train_df) + len(test_df)):
+            feature_store = FeatureStore(FEATURE_STORE_DIR, FEATURE_STORE_MAX_BYTES)
+            processed_train_df, processed_test_df = preprocess_data_cached(train_df, test_df, TIME_COL, TARGET_COL,
+                                                                           feature_store)
 
     # 3. 准备训练和验证数据
     # 假设目标列是 'load'，特征是除目标列和时间列外的所有列
@@ -35,23 +147,47 @@ def main():
     # 划分训练集和验证集 (注意：时间序列数据最好用时间划分，这里简化)
     X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42, shuffle=False) # shuffle=False 保持时间顺序
 
-    # 4. 训练模型
-    model = train_model(X_train, y_train, model_type="XGBoost") # 可以尝试其他模型
-
-    # 5. 验证模型
-    val_metrics = evaluate_model(model, X_val, y_val)
-
-    # 6. 保存模型
-    save_model(model, MODEL_FILE)
+    if MODEL_TYPE == "tournament":
+        # 4-6. 并行训练所有候选模型，按验证集指标选出冠军并保存
+        with telemetry.stage("train_model", rows=len(X_train), model_type=MODEL_TYPE):
+            model, leaderboard = run_tournament(X_train, y_train, X_val, y_val,
+                                                leaderboard_path=LEADERBOARD_FILE)
+        val_metrics = {k: leaderboard[0][k] for k in ("MAE", "RMSE", "MAPE")}
+    else:
+        # 4. 训练模型 (XGBoost 优先使用超参数搜索保存的参数)
+        params = load_params(XGB_PARAMS_FILE) if MODEL_TYPE == "XGBoost" else None
+        with telemetry.stage("train_model", rows=len(X_train), model_type=MODEL_TYPE):
+            model = train_model(X_train, y_train, model_type=MODEL_TYPE, params=params) # 可以尝试其他模型
+
+        # 5. 验证模型
+        with telemetry.stage("evaluate_model", rows=len(X_val)):
+            val_metrics = evaluate_model(model, X_val, y_val)
+
+    # 6. 记录训练数据水位线并保存模型 (增量重训只使用水位线之后的数据)
+    train_times = processed_train_df.loc[X_train.index, TIME_COL]
+    set_watermark(model, train_times.max(), full_refit=True)
+    with telemetry.stage("save_model"):
+        save_model(model, MODEL_FILE)
+
+        # 同时发布到版本化模型仓库 (原生格式 + manifest，服务和回测进程可毫秒级加载)
+        ModelRegistry(REGISTRY_DIR).publish(model, feature_cols, val_metrics,
+                                            train_start=train_times.min(), train_end=train_times.max())
+
+    # 保存增量特征引擎状态 (后续新读数到来时无需重算全量历史)
+    history_df = pd.concat([train_df, test_df], ignore_index=True)
+    with telemetry.stage("save_feature_state", rows=len(history_df)):
+        engine = IncrementalFeatureEngine(target_col=TARGET_COL).warm_up(history_df, TIME_COL)
+        engine.save(FEATURE_STATE_FILE)
 
     # main.py
 
     # 7. 在测试集上进行预测
     X_test = processed_test_df[feature_cols]
-    predictions_array = make_predictions(model, X_test)  # ← 接收 numpy array
+    with telemetry.stage("make_predictions", rows=len(X_test)):
+        predictions_array = make_predictions(model, X_test)  # ← 接收 numpy array
 
-    # ✅ 关键：用 test_df 的 time 列创建带时间索引的 Series
-    predictions = pd.Series(predictions_array, index=test_df[TIME_COL], name="predicted_load")
+    # ✅ 关键：用测试集特征的 time 列创建带时间索引的 Series（外存模式可能删除了历史不足的开头几行）
+    predictions = pd.Series(predictions_array, index=processed_test_df[TIME_COL].to_numpy(), name="predicted_load")
 
     # 输出验证
     print("预测结果 (前5个):")
@@ -60,8 +196,12 @@ def main():
     # 8. 可视化
     if TARGET_COL in test_df.columns:
         y_test_true = test_df.set_index(TIME_COL)[TARGET_COL]  # 真实值，datetime 索引
-        plot_predictions(y_test_true, predictions)  # 传入带时间索引的 Series
+        with telemetry.stage("plot_predictions", rows=len(y_test_true)):
+            # 快速模式：非交互式后端 + 按像素抽稀，多年逐小时数据也只需几秒，不弹出窗口
+            os.makedirs(os.path.dirname(PLOT_FILE), exist_ok=True)
+            plot_predictions(y_test_true, predictions, save_path=PLOT_FILE, fast=True)
 
+    telemetry.log_summary()
     return predictions
 
 if __name__ == "__main__":
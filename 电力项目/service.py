@@ -0,0 +1,416 @@
+# service.py
+# 常驻的负荷预测服务。在项目根目录启动: uvicorn service:app --host 0.0.0.0 --port 8001
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from config import (MODEL_FILE, FEATURE_STATE_FILE, TRAIN_FILE, TEST_FILE, TIME_COL, TARGET_COL,
+                    TIME_FORMAT, CACHE_DIR, SERVICE_MAX_BATCH, SERVICE_MAX_WAIT_MS,
+                    MODEL_RELOAD_INTERVAL, REGISTRY_DIR, RESAMPLE_FREQ, RESAMPLE_AGG, RESAMPLE_MAX_GAP,
+                    RESAMPLE_FILL)
+from data.feature_engine import IncrementalFeatureEngine
+from data.resample import resample_to_grid
+from src.models.predict import load_model, forecast_from_engine
+from src.models.fast_predict import FastPredictor
+from src.models.registry import ModelRegistry
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# ------------------ 模型持有者（支持原子热加载） ------------------
+class ModelSnapshot(NamedTuple):
+    """一次加载得到的模型及其配套信息，热加载时整体替换，不单独修改其中的字段。"""
+    model: object
+    predictor: Optional[FastPredictor]  # 不经过 DataFrame 的快速推理，不可用时为 None
+    feature_cols: List[str]
+    version: Optional[str]  # 仓库版本号，或模型文件的修改时间
+
+
+class ModelHolder:
+    """
+    持有当前模型。新模型先完整加载为一个 ModelSnapshot，再替换唯一的引用；
+    读取方每个请求只调用一次 snapshot()，进行中的请求继续使用旧模型。
+
+    模型仓库中有当前版本时从仓库加载（跟随 pin / rollback），否则加载 best_model.pkl。
+    """
+
+    def __init__(self, model_path: str, registry: Optional[ModelRegistry] = None):
+        self.model_path = model_path
+        self.registry = registry
+        self._current: Optional[ModelSnapshot] = None
+        self._lock = threading.Lock()  # 只串行化加载，读取不加锁
+
+    def reload(self, force: bool = False) -> bool:
+        """模型有更新（或 force）时重新加载，返回是否发生了替换。"""
+        with self._lock:
+            registry_version = self.registry.current_version() if self.registry else None
+            if registry_version:
+                version = registry_version
+            else:
+                version = datetime.fromtimestamp(os.path.getmtime(self.model_path)).isoformat()
+            current = self._current
+            if not force and current is not None and version == current.version:
+                return False
+            model = self.registry.load(version) if registry_version else load_model(self.model_path)
+            feature_cols = list(getattr(model, "feature_names_in_", []))
+            try:
+                predictor = FastPredictor(model, feature_cols or None)
+            except ValueError as e:
+                logger.warning(f"快速推理不可用，使用 model.predict: {e}")
+                predictor = None
+            # 只替换一个引用：读取方要么拿到完整的旧快照，要么拿到完整的新快照
+            self._current = ModelSnapshot(model, predictor, feature_cols, version)
+            logger.info(f"模型已加载 (version={version})")
+            return True
+
+    def snapshot(self) -> Optional[ModelSnapshot]:
+        """当前模型快照（尚未加载时为 None）。"""
+        return self._current
+
+
+# ------------------ 微批处理 ------------------
+class MicroBatcher:
+    """
+    将并发请求的特征行合并为一次 model.predict 调用。
+
+    后台线程取到第一个请求后，最多再等待 max_wait_ms 或凑满 max_batch 行，
+    然后一次性预测并把结果按行数拆分回各请求。
+    """
+
+    def __init__(self, holder: ModelHolder, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.holder = holder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def submit(self, X: pd.DataFrame, snapshot=None) -> np.ndarray:
+        """
+        提交特征行并阻塞等待预测结果（供请求线程调用）。
+
+        Args:
+            snapshot: holder.snapshot() 的结果；同一请求内的多次调用应传入同一个快照，
+                保证热加载期间拟合值和预测值来自同一个模型。默认取提交时的当前模型。
+        """
+        future: Future = Future()
+        self._queue.put((X, future, snapshot or self.holder.snapshot()))
+        return future.result()
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            n_rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while n_rows < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._stopped.set()
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+            self._run(batch)
+
+    def _run(self, batch):
+        # 按模型快照分组（热加载前后提交的请求可能属于不同模型），每组一次预测
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[2]), []).append(item)
+        for items in groups.values():
+            model, predictor, feature_cols, _ = items[0][2]
+            try:
+                X = pd.concat([x for x, _, _ in items], ignore_index=True)
+                if predictor is not None:
+                    predictions = predictor.predict_frame(X)
+                else:
+                    if feature_cols:
+                        X = X[feature_cols]
+                    predictions = np.asarray(model.predict(X), dtype=float)
+            except Exception as e:
+                for _, future, _ in items:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for x, future, _ in items:
+                future.set_result(predictions[start:start + len(x)])
+                start += len(x)
+
+
+# ------------------ 特征状态 ------------------
+class GapError(ValueError):
+    """新读数与最新读数之间的缺口超过 RESAMPLE_MAX_GAP，无法填补。"""
+
+
+class FeatureState:
+    """线程安全地维护增量特征引擎（单条负荷序列）。"""
+
+    def __init__(self, state_path: str):
+        self.state_path = state_path
+        self.engine: Optional[IncrementalFeatureEngine] = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            self.engine = IncrementalFeatureEngine.load(self.state_path)
+        else:
+            # 没有保存的状态时，用历史数据初始化一次
+            from data.loader import load_data
+            logger.warning(f"特征状态文件不存在: {self.state_path}，使用历史数据初始化。")
+            train_df, test_df = load_data(TRAIN_FILE, TEST_FILE, TIME_COL, TIME_FORMAT, CACHE_DIR)
+            history_df = pd.concat([train_df, test_df], ignore_index=True)
+            self.engine = IncrementalFeatureEngine(target_col=TARGET_COL).warm_up(history_df, TIME_COL)
+
+    def save(self):
+        with self._lock:
+            self.engine.save(self.state_path)
+
+    def watermark(self) -> Optional[pd.Timestamp]:
+        """最新已写入读数的时间。"""
+        with self._lock:
+            return self.engine.last_timestamp if self.engine else None
+
+    def _align(self, readings) -> Tuple[pd.DataFrame, List[pd.Timestamp], bool]:
+        """
+        把比水位线更新的读数对齐到 RESAMPLE_FREQ 网格（与批处理的 resample_to_grid 相同）：
+        聚合同格读数，按 RESAMPLE_FILL 填补与水位线之间及读数之间不超过 RESAMPLE_MAX_GAP 的缺口。
+
+        存在无法填补的缺口（如长时间停电）时，如果缺口之后的读数已覆盖一个完整的回看窗口
+        （engine.capacity 个时刻），则只保留这些读数并要求重建特征状态。
+
+        Returns:
+            对齐后的新读数 (time, value)、其中被填补的时刻，以及是否需要重建特征状态。
+
+        Raises:
+            GapError: 存在无法填补的缺口且缺口之后的读数不足一个回看窗口
+                （写入会让所有滞后/滑动特征错位）。
+        """
+        last = self.engine.last_timestamp
+        new = pd.DataFrame({TIME_COL: pd.to_datetime([r.time for r in readings]),
+                            TARGET_COL: np.array([r.value for r in readings], dtype=float)})
+        if last is not None:
+            new = new[new[TIME_COL] > last]
+        if new.empty:
+            return new, [], False
+        if last is not None:
+            # 带上引擎中的历史读数作为插值端点和季节复制的来源
+            history = self.engine.history
+            context = pd.DataFrame({TIME_COL: last - _grid_step() * np.arange(len(history))[::-1],
+                                    TARGET_COL: history})
+            new = pd.concat([context.dropna(), new], ignore_index=True)
+        aligned, gaps = resample_to_grid(new, TIME_COL, TARGET_COL, RESAMPLE_FREQ, RESAMPLE_AGG,
+                                         RESAMPLE_MAX_GAP, RESAMPLE_FILL)
+        if last is not None:
+            aligned = aligned[aligned[TIME_COL] > last]
+            gaps = gaps[gaps['end'] > last]
+        reseed = False
+        unfilled = gaps[~gaps['filled']]
+        if len(unfilled):
+            resume = aligned[aligned[TIME_COL] > unfilled['end'].max()]
+            if len(resume) < self.engine.capacity:
+                first = unfilled.iloc[0]
+                raise GapError(f"读数在 {first['start']} ~ {first['end']} 缺失 {first['length']} 个时刻，"
+                               f"超过可填补的上限 {RESAMPLE_MAX_GAP}；请一次提交缺口之后至少 "
+                               f"{self.engine.capacity} 个连续时刻的读数以重建特征状态")
+            aligned, reseed = resume, True
+        start = aligned[TIME_COL].min()
+        filled = [t for _, g in gaps[gaps['filled'] & (gaps['end'] >= start)].iterrows()
+                  for t in pd.date_range(max(g['start'], start), g['end'], freq=RESAMPLE_FREQ)]
+        return aligned, filled, reseed
+
+    def ingest(self, readings) -> Tuple[pd.DataFrame, List[pd.Timestamp]]:
+        """
+        写入比当前水位线更新的读数，返回这些时刻对应的特征行和被填补的时刻（已过期的读数被忽略）。
+
+        读数先对齐到规则网格并填补短缺口。存在无法填补的缺口时：缺口之后的读数覆盖一个完整的
+        回看窗口则丢弃旧状态，用这些读数重建特征引擎（用于预热的前 capacity 个时刻不返回特征行）；
+        否则抛出 GapError，引擎状态不变。
+        """
+        with self._lock:
+            aligned, filled, reseed = self._align(readings)
+            if reseed:
+                old = self.engine
+                engine = IncrementalFeatureEngine(old.target_col, old.lags, old.windows, old.resync_every)
+                engine.warm_up(aligned.iloc[:engine.capacity], TIME_COL, TARGET_COL)
+                logger.warning(f"读数在 {old.last_timestamp} 之后出现无法填补的缺口，"
+                               f"已从 {aligned[TIME_COL].iloc[0]} 起重建特征状态")
+                self.engine = engine
+                aligned = aligned.iloc[engine.capacity:]
+                filled = [t for t in filled if t > engine.last_timestamp]
+            rows = [self.engine.update(ts, value)
+                    for ts, value in zip(aligned[TIME_COL], aligned[TARGET_COL])]
+            features = pd.DataFrame(rows, index=pd.DatetimeIndex(aligned[TIME_COL]),
+                                    columns=self.engine.feature_columns)
+            return features, filled
+
+    def forecast(self, model, targets: pd.DatetimeIndex, feature_cols: List[str],
+                 predict_fn) -> Tuple[pd.Series, pd.Timestamp]:
+        """
+        预测 targets 各时刻的负荷，返回 (以时间为索引的预测值, 预测起点即水位线)。
+
+        Raises:
+            ValueError: targets 不晚于水位线或不在 RESAMPLE_FREQ 网格上。
+        """
+        with self._lock:
+            # 复制一份引擎状态（水位线与历史读数一致），预测期间不阻塞新的读数写入
+            engine = copy.deepcopy(self.engine)
+        watermark = engine.last_timestamp
+        if watermark is None:
+            raise ValueError("特征状态尚未接收任何读数，无法预测")
+        if (targets <= watermark).any():
+            raise ValueError(f"预测时刻必须晚于最新读数时间 {watermark}")
+        horizon = int(np.ceil((targets.max() - watermark) / _grid_step()))
+        forecast = forecast_from_engine(model, engine, horizon, feature_cols or engine.feature_columns,
+                                        freq=RESAMPLE_FREQ, predict_fn=predict_fn)
+        by_time = forecast.set_index('time')['predicted_load']
+        missing = targets.difference(by_time.index)
+        if len(missing):
+            raise ValueError(f"预测时刻必须位于 {RESAMPLE_FREQ} 网格上: {list(missing[:5])}")
+        return by_time.reindex(targets), watermark
+
+
+def _grid_step() -> pd.Timedelta:
+    """RESAMPLE_FREQ 对应的时间步长。"""
+    return pd.Timedelta(pd.tseries.frequencies.to_offset(RESAMPLE_FREQ))
+
+
+# ------------------ FastAPI 应用 ------------------
+model_holder = ModelHolder(MODEL_FILE, ModelRegistry(REGISTRY_DIR))
+feature_state = FeatureState(FEATURE_STATE_FILE)
+batcher = MicroBatcher(model_holder, SERVICE_MAX_BATCH, SERVICE_MAX_WAIT_MS)
+_stop_watcher = threading.Event()
+
+
+def _watch_model_file():
+    """定期检查模型文件，有更新时热加载。"""
+    while not _stop_watcher.wait(MODEL_RELOAD_INTERVAL):
+        try:
+            model_holder.reload()
+        except Exception as e:
+            logger.error(f"热加载模型失败，继续使用当前模型: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 负荷预测服务启动中...")
+    model_holder.reload(force=True)
+    feature_state.load()
+    batcher.start()
+    watcher = threading.Thread(target=_watch_model_file, name="model-watcher", daemon=True)
+    watcher.start()
+    logger.info("✅ 服务就绪")
+    yield
+    _stop_watcher.set()
+    batcher.stop()
+    feature_state.save()
+    logger.info("🛑 服务关闭")
+
+
+app = FastAPI(title="电力负荷预测服务", lifespan=lifespan)
+
+
+class Reading(BaseModel):
+    time: datetime
+    value: float
+
+
+class PredictRequest(BaseModel):
+    readings: List[Reading] = []     # 最近的真实读数（会写入特征状态）
+    timestamps: List[datetime] = []  # 需要预测的未来时刻
+
+
+class PredictionItem(BaseModel):
+    time: datetime
+    predicted_load: float
+
+
+class PredictResponse(BaseModel):
+    fitted: List[PredictionItem]       # 新读数时刻（含填补的时刻）的模型输出
+    filled: List[datetime] = []        # 缺失后被填补的时刻
+    predictions: List[PredictionItem]  # 请求的未来时刻的预测
+    watermark: Optional[datetime]
+    model_version: Optional[str]
+
+
+# 普通 def 接口运行在线程池中，可以阻塞等待微批处理结果而不阻塞事件循环
+@app.post("/predict", response_model=PredictResponse)
+def predict(request: PredictRequest):
+    if not request.readings and not request.timestamps:
+        raise HTTPException(status_code=400, detail="readings 和 timestamps 不能同时为空")
+    # 整个请求使用同一个模型快照：/reload 期间拟合值和预测值也来自同一个模型
+    snapshot = model_holder.snapshot()
+
+    def predict_fn(X: pd.DataFrame) -> np.ndarray:
+        return batcher.submit(X, snapshot)
+
+    fitted = []
+    try:
+        features, filled = feature_state.ingest(request.readings)
+    except GapError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if len(features):
+        values = predict_fn(features.reset_index(drop=True))
+        fitted = [PredictionItem(time=t, predicted_load=v) for t, v in zip(features.index, values)]
+
+    predictions = []
+    if request.timestamps:
+        try:
+            by_time, watermark = feature_state.forecast(snapshot.model, pd.DatetimeIndex(request.timestamps),
+                                                        snapshot.feature_cols, predict_fn)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        predictions = [PredictionItem(time=t, predicted_load=v) for t, v in by_time.items()]
+    else:
+        watermark = feature_state.watermark()
+
+    return PredictResponse(fitted=fitted, filled=filled, predictions=predictions,
+                           watermark=watermark, model_version=snapshot.version)
+
+
+@app.post("/reload")
+def reload_model():
+    try:
+        replaced = model_holder.reload(force=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"加载模型失败: {str(e)}")
+    return {"reloaded": replaced, "model_version": model_holder.snapshot().version}
+
+
+@app.get("/health")
+async def health():
+    snapshot = model_holder.snapshot()
+    return {
+        "status": "healthy",
+        "model_loaded": snapshot is not None,
+        "model_version": snapshot.version if snapshot else None,
+        "watermark": feature_state.watermark(),
+    }
@@ -0,0 +1,206 @@
+# src/evaluation/backtest.py
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.evaluation.metrics import StreamingMetrics, calculate_mape
+
+logger = logging.getLogger(__name__)
+
+# 子进程中的共享数据（由 _init_worker 设置一次，各折只传递行号区间）
+_WORKER_DATA = {}
+
+
+def make_folds(n_rows: int, train_window: Optional[int], horizon: int, step: int,
+               min_train: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """
+    生成滚动起点 (rolling-origin) 的折划分。
+
+    Args:
+        n_rows (int): 数据总行数（按时间排序）。
+        train_window (int): 训练窗口行数；None 表示扩展窗口（从第一行开始）。
+        horizon (int): 每折的预测长度（行数）。
+        step (int): 相邻两个预测起点之间的间隔（行数）。
+        min_train (int): 扩展窗口模式下第一折的最少训练行数，默认等于 horizon。
+
+    Returns:
+        list: (train_start, test_start, test_end) 三元组列表，区间左闭右开。
+    """
+    if horizon < 1 or step < 1:
+        raise ValueError(f"horizon 和 step 必须为正整数: horizon={horizon}, step={step}")
+    first_origin = train_window if train_window else (min_train or horizon)
+    folds = []
+    for test_start in range(first_origin, n_rows - horizon + 1, step):
+        train_start = test_start - train_window if train_window else 0
+        folds.append((train_start, test_start, test_start + horizon))
+    return folds
+
+
+def prepare_full_series(train_df: pd.DataFrame, test_df: pd.DataFrame, time_col: str,
+                        target_col: str, feature_store=None) -> pd.DataFrame:
+    """
+    将训练集和测试集合并为一条完整序列（按时间去重、排序），并一次性完成特征工程。
+
+    Args:
+        train_df, test_df (pd.DataFrame): load_data 返回的原始数据。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名。
+        feature_store (FeatureStore): 可选的特征库，命中时跳过特征工程。
+
+    Returns:
+        pd.DataFrame: 处理后的完整序列（已删除特征缺失的起始行）。
+    """
+    from data.feature_store import preprocess_data_cached
+
+    full_df = (pd.concat([train_df, test_df], ignore_index=True)
+               .drop_duplicates(subset=time_col, keep='first')
+               .sort_values(time_col)
+               .reset_index(drop=True))
+    processed_df, _ = preprocess_data_cached(full_df, full_df.iloc[:0], time_col, target_col, feature_store)
+    return processed_df
+
+
+def _init_worker(X: np.ndarray, y: np.ndarray, hours: np.ndarray, feature_cols: List[str],
+                 model_type: str, n_jobs: int, times: Optional[np.ndarray] = None,
+                 target_col: Optional[str] = None, freq: Optional[str] = None):
+    _WORKER_DATA.update(X=X, y=y, hours=hours, feature_cols=feature_cols, model_type=model_type,
+                        n_jobs=n_jobs, times=times, target_col=target_col, freq=freq)
+
+
+def _recursive_predict(model, test_start: int, test_end: int) -> np.ndarray:
+    """从 test_start 的上一行出发递归预测到 test_end，预测值回填到后续步骤的滞后和滑动特征。"""
+    from src.models.predict import recursive_forecast
+    from data.processor import LAGS, WINDOWS
+
+    y, times = _WORKER_DATA["y"], _WORKER_DATA["times"]
+    freq = _WORKER_DATA["freq"]
+    history_start = max(0, test_start - max(LAGS + WINDOWS))
+    history = pd.Series(y[history_start:test_start], index=pd.DatetimeIndex(times[history_start:test_start]))
+    origin = history.index[-1]
+    test_times = pd.DatetimeIndex(times[test_start:test_end])
+    horizon = int(np.ceil((test_times[-1] - origin) / pd.Timedelta(pd.tseries.frequencies.to_offset(freq))))
+    forecast = recursive_forecast(model, history, [origin], horizon, _WORKER_DATA["feature_cols"],
+                                  target_col=_WORKER_DATA["target_col"], freq=freq)
+    # 按时间对齐（测试区间内有被删除的缺失行时，对应步的预测不参与评估）
+    return forecast.set_index('time')['predicted_load'].reindex(test_times).to_numpy(dtype=float)
+
+
+def _run_fold(fold_id: int, train_start: int, test_start: int,
+              test_end: int) -> Tuple[dict, StreamingMetrics]:
+    """
+    在子进程中训练并评估一折，返回该折的指标和按小时分组的误差累加器。
+
+    设置了 times 时（recursive 模式）做 N 步递归预测，否则用测试行的真实滞后特征逐行打分。
+    """
+    from src.models.train import train_model
+
+    X, y = _WORKER_DATA["X"], _WORKER_DATA["y"]
+    feature_cols = _WORKER_DATA["feature_cols"]
+    X_train = pd.DataFrame(X[train_start:test_start], columns=feature_cols)
+    X_test = pd.DataFrame(X[test_start:test_end], columns=feature_cols)
+    y_train, y_test = y[train_start:test_start], y[test_start:test_end]
+
+    model = train_model(X_train, y_train, model_type=_WORKER_DATA["model_type"],
+                        n_jobs=_WORKER_DATA["n_jobs"])
+    hours = _WORKER_DATA["hours"][test_start:test_end]
+    if _WORKER_DATA["times"] is not None:
+        y_pred = _recursive_predict(model, test_start, test_end)
+        valid = ~np.isnan(y_pred)
+        y_test, y_pred, hours = y_test[valid], y_pred[valid], hours[valid]
+    else:
+        y_pred = np.asarray(model.predict(X_test), dtype=float)
+
+    errors = y_test - y_pred
+    accumulator = StreamingMetrics(n_groups=24, group_labels=range(24))
+    accumulator.update(y_test, y_pred, groups=hours)
+    row = {
+        "fold": fold_id,
+        "train_start": train_start,
+        "test_start": test_start,
+        "test_end": test_end,
+        "n": int(len(y_test)),
+        "MAE": float(np.abs(errors).mean()),
+        "RMSE": float(np.sqrt((errors ** 2).mean())),
+        "MAPE": float(calculate_mape(y_test, y_pred)),
+    }
+    return row, accumulator
+
+
+def walk_forward_backtest(processed_df: pd.DataFrame, feature_cols: List[str], target_col: str,
+                          time_col: str, train_window: Optional[int], horizon: int, step: int,
+                          model_type: str = "XGBoost", max_workers: Optional[int] = None,
+                          n_jobs_per_fold: int = 1, recursive: bool = False,
+                          freq: str = "h") -> Tuple[pd.DataFrame, dict]:
+    """
+    滚动起点回测：特征只在完整序列上计算一次，各折按行号切片，折与折之间在进程池中并行。
+
+    默认模式下测试行的滞后/滑动特征来自真实负荷（逐步一步预测）；recursive=True 时每折从起点
+    出发做 horizon 步的递归预测 (recursive_forecast)，预测值回填到后续步骤的特征中，
+    评估的是真正的 N 步预测误差。
+
+    Args:
+        processed_df (pd.DataFrame): preprocess_data 处理后的完整序列（按时间升序）。
+        feature_cols (list): 特征列。
+        target_col (str): 目标列名。
+        time_col (str): 时间列名。
+        train_window (int): 训练窗口行数（小时数）；None 表示扩展窗口。
+        horizon (int): 每折的预测长度（行数）。
+        step (int): 预测起点的间隔（行数）。
+        model_type (str): 每折训练的模型类型。
+        max_workers (int): 并行进程数，默认 os.cpu_count()。
+        n_jobs_per_fold (int): 每折模型的线程数，默认 1，避免与进程级并行叠加导致超额占用。
+        recursive (bool): 是否做 N 步递归预测。
+        freq (str): 时间步长（recursive 模式使用），与重采样网格一致。
+
+    Returns:
+        Tuple[pd.DataFrame, dict]: 每折的指标表和汇总指标
+            ({"mean": 各折指标均值, "pooled": 所有预测点合并计算的指标,
+              "by_hour": 按一天中的小时分组的指标表})。
+            合并指标由各折的流式累加器合并得到，不需要保留全部残差。
+    """
+    processed_df = processed_df.sort_values(time_col)
+    X = processed_df[feature_cols].to_numpy(dtype=np.float64)
+    y = processed_df[target_col].to_numpy(dtype=np.float64)
+    times = processed_df[time_col].to_numpy()
+    hours = processed_df[time_col].dt.hour.to_numpy()
+
+    folds = make_folds(len(processed_df), train_window, horizon, step)
+    if not folds:
+        raise ValueError(f"数据长度 {len(processed_df)} 不足以生成任何折 "
+                         f"(train_window={train_window}, horizon={horizon})")
+    max_workers = max_workers or os.cpu_count() or 1
+    mode = f"{horizon} 步递归预测" if recursive else "一步预测"
+    logger.info(f"开始滚动回测: {len(folds)} 折，{mode}，模型 {model_type}，{max_workers} 个进程。")
+
+    initargs = (X, y, hours, feature_cols, model_type, n_jobs_per_fold,
+                times if recursive else None, target_col, freq)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=initargs) as executor:
+        futures = [executor.submit(_run_fold, i, *fold) for i, fold in enumerate(folds)]
+        rows = []
+        accumulator = StreamingMetrics(n_groups=24, group_labels=range(24))
+        for future in futures:
+            row, fold_accumulator = future.result()
+            rows.append(row)
+            accumulator.merge(fold_accumulator)
+
+    fold_df = pd.DataFrame(rows).sort_values("fold").reset_index(drop=True)
+    fold_df.insert(1, "origin", times[fold_df["test_start"].to_numpy()])
+
+    pooled = accumulator.overall()
+    summary = {
+        "mean": {k: float(fold_df[k].mean()) for k in ("MAE", "RMSE", "MAPE")},
+        "pooled": pooled,
+        "by_hour": accumulator.result(),
+        "n_folds": len(fold_df),
+        "n_predictions": pooled["n"],
+    }
+
+    logger.info(f"回测完成 ({summary['n_folds']} 折, {summary['n_predictions']} 个预测点):")
+    for name in ("MAE", "RMSE", "MAPE"):
+        logger.info(f"  {name}: 各折均值 {summary['mean'][name]:.4f}, 合并 {summary['pooled'][name]:.4f}")
+    return fold_df, summary
@@ -1,6 +1,7 @@
 # src/evaluation/metrics.py
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
+import pandas as pd
 
 def calculate_mape(y_true, y_pred):
     """计算平均绝对百分比误差 (MAPE)。"""
@@ -9,4 +10,123 @@ def calculate_mape(y_true, y_pred):
     non_zero_mask = y_true != 0
     if not non_zero_mask.any():
         return np.inf # 或者返回一个很大的数
-    return (np.abs((y_true[non_zero_mask] - y_pred[non_zero_mask]) / y_true[non_zero_mask])).mean() * 100
\ No newline at end of file
+    return (np.abs((y_true[non_zero_mask] - y_pred[non_zero_mask]) / y_true[non_zero_mask])).mean() * 100
+
+
+class StreamingMetrics:
+    """
+    可合并的流式误差累加器：MAE、RMSE、MAPE、sMAPE 和分位数损失 (pinball loss)。
+
+    只保存各分组的误差和，不保存残差本身，因此可以逐块 update、
+    在多个进程中分别累加后 merge，最后再计算指标。分组（如一天中的小时、电表编号）
+    用 np.bincount 一次性累加，不按组循环。
+
+    用法::
+
+        acc = StreamingMetrics(n_groups=24)
+        for chunk in chunks:
+            acc.update(chunk.y_true, chunk.y_pred, groups=chunk.time.dt.hour)
+        acc.merge(other_acc)          # 例如子进程返回的累加器
+        acc.result()                  # 每组一行的指标表
+        acc.overall()                 # 所有组合并后的指标
+    """
+
+    _SUMS = ("n", "abs_sum", "sq_sum", "ape_sum", "ape_n", "smape_sum", "smape_n")
+
+    def __init__(self, n_groups: int = 1, quantiles=(0.1, 0.5, 0.9), group_labels=None):
+        self.n_groups = int(n_groups)
+        self.quantiles = tuple(float(q) for q in quantiles)
+        self.group_labels = list(group_labels) if group_labels is not None else None
+        for name in self._SUMS:
+            setattr(self, name, np.zeros(self.n_groups))
+        self.pinball_sum = np.zeros((self.n_groups, len(self.quantiles)))
+
+    def update(self, y_true, y_pred, groups=None, quantile_preds=None) -> "StreamingMetrics":
+        """
+        累加一块数据。
+
+        Args:
+            y_true, y_pred: 真实值和点预测。
+            groups: 每个样本的组编号 (0 ~ n_groups-1)；None 表示全部属于第 0 组。
+            quantile_preds: 形状为 (n, len(quantiles)) 的分位数预测；None 时用点预测计算分位数损失。
+        """
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.float64).ravel()
+        groups = (np.zeros(len(y_true), dtype=np.int64) if groups is None
+                  else np.asarray(groups, dtype=np.int64).ravel())
+        if quantile_preds is None:
+            quantile_preds = np.repeat(y_pred[:, None], len(self.quantiles), axis=1)
+        else:
+            quantile_preds = np.asarray(quantile_preds, dtype=np.float64).reshape(len(y_true), -1)
+
+        # 跳过真实值或预测值缺失的样本
+        valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+        if not valid.all():
+            y_true, y_pred, groups, quantile_preds = (y_true[valid], y_pred[valid], groups[valid],
+                                                      quantile_preds[valid])
+        if len(groups) and (groups.min() < 0 or groups.max() >= self.n_groups):
+            raise ValueError(f"组编号超出范围 [0, {self.n_groups})")
+
+        def add(weights):
+            return np.bincount(groups, weights=weights, minlength=self.n_groups)
+
+        errors = y_true - y_pred
+        abs_errors = np.abs(errors)
+        self.n += np.bincount(groups, minlength=self.n_groups)
+        self.abs_sum += add(abs_errors)
+        self.sq_sum += add(errors ** 2)
+
+        # MAPE 跳过真实值为 0 的样本，sMAPE 跳过分母为 0 的样本
+        non_zero = y_true != 0
+        self.ape_sum += add(np.where(non_zero, abs_errors / np.where(non_zero, np.abs(y_true), 1), 0.0))
+        self.ape_n += add(non_zero.astype(np.float64))
+        denominator = np.abs(y_true) + np.abs(y_pred)
+        has_denominator = denominator != 0
+        self.smape_sum += add(np.where(has_denominator, 2 * abs_errors / np.where(has_denominator, denominator, 1), 0.0))
+        self.smape_n += add(has_denominator.astype(np.float64))
+
+        for j, q in enumerate(self.quantiles):
+            diff = y_true - quantile_preds[:, j]
+            self.pinball_sum[:, j] += add(np.maximum(q * diff, (q - 1) * diff))
+        return self
+
+    def merge(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        """合并另一个累加器（分组数和分位数必须一致）。"""
+        if other.n_groups != self.n_groups or other.quantiles != self.quantiles:
+            raise ValueError("只能合并分组数和分位数相同的累加器")
+        for name in self._SUMS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.pinball_sum = self.pinball_sum + other.pinball_sum
+        return self
+
+    def __iadd__(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        return self.merge(other)
+
+    @staticmethod
+    def _metrics(n, abs_sum, sq_sum, ape_sum, ape_n, smape_sum, smape_n, pinball_sum, quantiles) -> dict:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            metrics = {
+                "n": n,
+                "MAE": abs_sum / n,
+                "RMSE": np.sqrt(sq_sum / n),
+                # 与 calculate_mape 一致：没有非零真实值时为 inf
+                "MAPE": np.where(ape_n > 0, ape_sum / ape_n * 100, np.inf),
+                "sMAPE": np.where(smape_n > 0, smape_sum / smape_n * 100, np.inf),
+            }
+            for j, q in enumerate(quantiles):
+                metrics[f"QL_{q:g}"] = pinball_sum[..., j] / n
+        return metrics
+
+    def result(self) -> pd.DataFrame:
+        """每组一行的指标表（没有样本的组指标为 NaN）。"""
+        metrics = self._metrics(self.n, self.abs_sum, self.sq_sum, self.ape_sum, self.ape_n,
+                                self.smape_sum, self.smape_n, self.pinball_sum, self.quantiles)
+        df = pd.DataFrame(metrics, index=self.group_labels)
+        df["n"] = df["n"].astype(np.int64)
+        return df
+
+    def overall(self) -> dict:
+        """所有组合并后的指标。"""
+        totals = [getattr(self, name).sum() for name in self._SUMS]
+        metrics = self._metrics(*totals, self.pinball_sum.sum(axis=0), self.quantiles)
+        return {k: (int(v) if k == "n" else float(v)) for k, v in metrics.items()}
@@ -0,0 +1,299 @@
+# src/models/fast_predict.py
+# 不经过 DataFrame 的快速推理：固定特征顺序的 float32 数组 -> 预测值
+import ctypes
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models.registry import ArrayLinearModel, ArrayTreeEnsemble, _flatten_trees
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("auto", "native", "inplace", "array", "python")
+# XGBoost 中输出等于原始分数的目标函数（叶子值求和 + base_score 即为预测值）
+_IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror",
+                        "reg:quantileerror"}
+# auto 模式下，超过该行数的 XGBoost 批次交给 inplace_predict（多线程）
+_INPLACE_MIN_ROWS = 512
+
+# 通用的树集成遍历内核：模型的节点数组在运行时以指针传入，因此只需编译一次
+_KERNEL_SOURCE = r"""
+#include <math.h>
+
+void predict_trees(const float* X, long n_rows, long n_features,
+                   const int* left, const int* right, const int* feature,
+                   const double* threshold, const unsigned char* default_left,
+                   const double* value, const int* roots, long n_trees,
+                   int strict, double* out) {
+    for (long i = 0; i < n_rows; ++i) {
+        const float* x = X + i * n_features;
+        double acc = 0.0;
+        for (long t = 0; t < n_trees; ++t) {
+            int node = roots[t];
+            while (left[node] != -1) {
+                double v = (double)x[feature[node]];
+                int go_left;
+                if (isnan(v)) {
+                    go_left = default_left ? default_left[node] : 0;
+                } else {
+                    go_left = strict ? (v < threshold[node]) : (v <= threshold[node]);
+                }
+                node = go_left ? left[node] : right[node];
+            }
+            acc += value[node];
+        }
+        out[i] = acc;
+    }
+}
+"""
+
+_kernel = None
+_kernel_failed = False  # 编译或加载失败后不再重试，避免每次创建 FastPredictor 都调用编译器
+_kernel_lock = threading.Lock()
+
+
+def _load_kernel(build_dir: str):
+    """编译（首次）并加载本地内核；没有 C 编译器时返回 None。"""
+    global _kernel, _kernel_failed
+    with _kernel_lock:
+        if _kernel is not None or _kernel_failed:
+            return _kernel
+        key = hashlib.sha1(_KERNEL_SOURCE.encode('utf-8')).hexdigest()[:12]
+        lib_path = os.path.join(build_dir, f"tree_kernel-{key}.so")
+        if not os.path.exists(lib_path):
+            os.makedirs(build_dir, exist_ok=True)
+            src_path = os.path.join(build_dir, f"tree_kernel-{key}.c")
+            tmp_path = f"{lib_path}.{os.getpid()}.tmp"
+            with open(src_path, 'w', encoding='utf-8') as f:
+                f.write(_KERNEL_SOURCE)
+            compiler = os.environ.get("CC", "cc")
+            try:
+                subprocess.run([compiler, "-O3", "-shared", "-fPIC", "-o", tmp_path, src_path],
+                               check=True, capture_output=True)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.warning(f"编译推理内核失败，将使用 numpy 实现: {e}")
+                _kernel_failed = True
+                return None
+            os.replace(tmp_path, lib_path)  # 原子替换，并发进程不会加载到半写的文件
+            logger.info(f"推理内核已编译: {lib_path}")
+        try:
+            lib = ctypes.CDLL(lib_path)
+        except OSError as e:
+            logger.warning(f"加载推理内核失败，将使用 numpy 实现: {e}")
+            _kernel_failed = True
+            return None
+        lib.predict_trees.restype = None
+        lib.predict_trees.argtypes = [ctypes.c_void_p, ctypes.c_long, ctypes.c_long,
+                                      ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+                                      ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+                                      ctypes.c_void_p, ctypes.c_long, ctypes.c_int, ctypes.c_void_p]
+        _kernel = lib
+        return _kernel
+
+
+def _flatten_xgboost(booster, n_trees: Optional[int] = None):
+    """
+    把 XGBoost 的树展开为拼接后的节点数组（格式与 registry._flatten_trees 相同，另含 default_left）。
+
+    Returns:
+        Tuple[dict, float]: 节点数组和 base_score；不支持的模型（非 gbtree / 非恒等链接）返回 (None, None)。
+    """
+    learner = json.loads(bytes(booster.save_raw("json")))["learner"]
+    objective = learner["objective"]["name"]
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree" or objective not in _IDENTITY_OBJECTIVES:
+        return None, None
+    if int(learner["learner_model_param"].get("num_target", "1")) > 1:
+        return None, None
+    trees = gbm["model"]["trees"]
+    if n_trees is not None:
+        trees = trees[:n_trees]
+    # XGBoost 3 中 base_score 为 "[5E-1]" 形式
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+    parts = {name: [] for name in ("children_left", "children_right", "feature", "threshold",
+                                   "value", "default_left", "roots")}
+    offset = 0
+    for tree in trees:
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        right = np.asarray(tree["right_children"], dtype=np.int64)
+        is_leaf = left == -1
+        # 叶子节点的 split_conditions 即为叶子值
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+        parts["children_left"].append(np.where(is_leaf, -1, left + offset))
+        parts["children_right"].append(np.where(is_leaf, -1, right + offset))
+        parts["feature"].append(np.where(is_leaf, 0, tree["split_indices"]))
+        parts["threshold"].append(conditions)
+        parts["value"].append(np.where(is_leaf, conditions, 0.0))
+        parts["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+        parts["roots"].append(np.array([offset]))
+        offset += len(left)
+    arrays = {
+        "children_left": np.concatenate(parts["children_left"]).astype(np.int32),
+        "children_right": np.concatenate(parts["children_right"]).astype(np.int32),
+        "feature": np.concatenate(parts["feature"]).astype(np.int32),
+        "threshold": np.concatenate(parts["threshold"]),
+        "value": np.concatenate(parts["value"]),
+        "default_left": np.concatenate(parts["default_left"]).astype(np.uint8),
+        "roots": np.concatenate(parts["roots"]).astype(np.int32),
+    }
+    return arrays, base_score
+
+
+class FastPredictor:
+    """
+    按固定特征顺序接收 float32 数组的快速预测器，适合实时调度中的单行打分。
+
+    后端:
+        - native: 本地编译的树遍历内核（ctypes 调用），单行延迟为微秒级；
+        - inplace: XGBoost booster.inplace_predict，适合大批量（多线程）；
+        - array: 纯 numpy 的树遍历 / 线性模型；
+        - python: 其他模型，退化为 model.predict(DataFrame)。
+    auto 模式下树模型优先使用 native（不可用时用 array），XGBoost 的大批次使用 inplace。
+    """
+
+    def __init__(self, model: object, feature_cols: Optional[List[str]] = None,
+                 backend: str = "auto", build_dir: Optional[str] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}，可选 {BACKENDS}")
+        if feature_cols is None:
+            feature_cols = list(getattr(model, "feature_names_in_", []))
+        if not feature_cols:
+            raise ValueError("无法确定特征顺序：模型没有 feature_names_in_，请显式传入 feature_cols。")
+        self.model = model
+        self.feature_cols = list(feature_cols)
+        self.n_features = len(self.feature_cols)
+
+        self._booster = None
+        self._iteration_range = (0, 0)
+        self._ensemble: Optional[ArrayTreeEnsemble] = None
+        self._linear: Optional[ArrayLinearModel] = None
+        self._prepare(model)
+
+        self._auto = backend == "auto"
+        if backend == "auto":
+            backend = "array" if (self._ensemble or self._linear) else (
+                "inplace" if self._booster is not None else "python")
+            if self._ensemble is not None and self._load_native(build_dir):
+                backend = "native"
+        elif backend == "native" and (self._ensemble is None or not self._load_native(build_dir)):
+            raise ValueError(f"{type(model).__name__} 无法使用 native 后端")
+        elif backend == "inplace" and self._booster is None:
+            raise ValueError("inplace 后端只支持 XGBoost 模型")
+        elif backend == "array" and self._ensemble is None and self._linear is None:
+            raise ValueError(f"{type(model).__name__} 无法使用 array 后端")
+        self.backend = backend
+        logger.info(f"快速推理已就绪: {type(model).__name__}, 后端 {backend}, {self.n_features} 个特征")
+
+    # ------------------ 模型展开 ------------------
+    def _prepare(self, model: object):
+        class_name = type(model).__name__
+        if class_name in ("XGBRegressor", "Booster"):
+            booster = model.get_booster() if class_name == "XGBRegressor" else model
+            best_iteration = getattr(model, "best_iteration", None) if class_name == "XGBRegressor" else None
+            n_trees = best_iteration + 1 if best_iteration is not None else None
+            self._booster = booster
+            self._iteration_range = (0, n_trees or 0)  # 与 XGBRegressor.predict 一样只用早停前的树
+            booster_features = booster.feature_names
+            if booster_features and list(booster_features) != self.feature_cols:
+                raise ValueError("feature_cols 与 XGBoost 模型的特征顺序不一致")
+            arrays, base_score = _flatten_xgboost(booster, n_trees)
+            if arrays is not None:
+                self._ensemble = ArrayTreeEnsemble(arrays, self.feature_cols, "sum",
+                                                   base_score=base_score, strict=True)
+        elif class_name in ("RandomForestRegressor", "GradientBoostingRegressor"):
+            if class_name == "RandomForestRegressor":
+                self._ensemble = ArrayTreeEnsemble(_flatten_trees(model.estimators_), self.feature_cols, "mean")
+            elif type(model.init_).__name__ == "DummyRegressor":
+                self._ensemble = ArrayTreeEnsemble(_flatten_trees(model.estimators_[:, 0]), self.feature_cols,
+                                                   "sum", base_score=float(model.init_.constant_[0][0]),
+                                                   scale=float(model.learning_rate))
+        elif class_name == "ArrayTreeEnsemble":
+            self._ensemble = model
+        elif class_name == "LinearRegression":
+            self._linear = ArrayLinearModel(np.asarray(model.coef_, dtype=np.float64),
+                                            float(model.intercept_), self.feature_cols)
+        elif class_name == "ArrayLinearModel":
+            self._linear = model
+
+    def _load_native(self, build_dir: Optional[str]) -> bool:
+        if build_dir is None:
+            from config import NATIVE_BUILD_DIR
+            build_dir = NATIVE_BUILD_DIR
+        self._kernel = _load_kernel(build_dir)
+        if self._kernel is None:
+            return False
+        # 节点数组转为连续内存，并缓存指针，调用时不再做类型检查
+        ens = self._ensemble
+        self._native_arrays = {
+            "left": np.ascontiguousarray(ens.children_left, dtype=np.int32),
+            "right": np.ascontiguousarray(ens.children_right, dtype=np.int32),
+            "feature": np.ascontiguousarray(ens.feature, dtype=np.int32),
+            "threshold": np.ascontiguousarray(ens.threshold, dtype=np.float64),
+            "value": np.ascontiguousarray(ens.value, dtype=np.float64),
+            "roots": np.ascontiguousarray(ens.roots, dtype=np.int32),
+        }
+        if ens.default_left is not None:
+            self._native_arrays["default_left"] = np.ascontiguousarray(ens.default_left, dtype=np.uint8)
+        a = self._native_arrays
+        self._native_args = (
+            a["left"].ctypes.data, a["right"].ctypes.data, a["feature"].ctypes.data,
+            a["threshold"].ctypes.data,
+            a["default_left"].ctypes.data if "default_left" in a else None,
+            a["value"].ctypes.data, a["roots"].ctypes.data, len(a["roots"]), int(ens.strict),
+        )
+        return True
+
+    # ------------------ 预测 ------------------
+    def _as_array(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"特征数不匹配: 期望 {self.n_features}，实际 {X.shape[1]}")
+        return X
+
+    def predict(self, X) -> np.ndarray:
+        """
+        批量或单行预测。
+
+        Args:
+            X: 形状为 (n_rows, n_features) 或 (n_features,) 的数组，列顺序为 feature_cols；
+                已是 C 连续的 float32 数组时不会复制。
+
+        Returns:
+            np.ndarray: 形状为 (n_rows,) 的 float64 预测值。
+        """
+        X = self._as_array(X)
+        backend = self.backend
+        if self._auto and self._booster is not None and len(X) >= _INPLACE_MIN_ROWS:
+            backend = "inplace"
+        if backend == "native":
+            out = np.empty(len(X))
+            self._kernel.predict_trees(X.ctypes.data, len(X), self.n_features, *self._native_args,
+                                       out.ctypes.data)
+            ens = self._ensemble
+            if ens.aggregate == "mean":
+                return out / len(ens.roots)
+            return ens.base_score + ens.scale * out
+        if backend == "inplace":
+            return np.asarray(self._booster.inplace_predict(X, iteration_range=self._iteration_range),
+                              dtype=np.float64)
+        if backend == "array":
+            return (self._ensemble or self._linear).predict(X)
+        return np.asarray(self.model.predict(pd.DataFrame(X, columns=self.feature_cols)), dtype=np.float64)
+
+    def predict_one(self, x) -> float:
+        """单行预测，返回标量。"""
+        return float(self.predict(x)[0])
+
+    def predict_frame(self, df: pd.DataFrame) -> np.ndarray:
+        """按 feature_cols 取出 DataFrame 的列后预测（兼容旧的调用方式）。"""
+        return self.predict(df[self.feature_cols].to_numpy(dtype=np.float32))
@@ -0,0 +1,169 @@
+# src/models/fleet.py
+# 多电表（多序列）场景：全局模型 / 按负荷形态聚类的分簇模型，以及按序列分片的并行打分
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models.train import train_model
+
+logger = logging.getLogger(__name__)
+
+# 子进程中的共享模型（由 _init_worker 设置一次，各分片只传递特征数据）
+_WORKER_DATA = {}
+
+
+def cluster_series(df: pd.DataFrame, series_col: str, time_col: str, target_col: str,
+                   n_clusters: int = 8, random_state: int = 42) -> pd.Series:
+    """
+    按日内负荷形态对序列聚类。
+
+    每条序列取 24 小时的平均负荷曲线并除以其均值（只保留形状，不看量级），
+    再用 KMeans 聚类。
+
+    Args:
+        df (pd.DataFrame): 原始或处理后的多序列数据。
+        series_col (str): 序列编号列。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名。
+        n_clusters (int): 簇数量，超过序列数时取序列数。
+        random_state (int): 随机种子。
+
+    Returns:
+        pd.Series: 序列编号 -> 簇编号。
+    """
+    from sklearn.cluster import KMeans
+
+    profiles = (df.groupby([df[series_col], df[time_col].dt.hour])[target_col].mean()
+                .unstack(fill_value=np.nan))
+    profiles = profiles.T.fillna(profiles.mean(axis=1)).T
+    profiles = profiles.div(profiles.mean(axis=1).replace(0, 1), axis=0)
+
+    n_clusters = min(n_clusters, len(profiles))
+    labels = KMeans(n_clusters=n_clusters, n_init=10, random_state=random_state).fit_predict(profiles.to_numpy())
+    assignments = pd.Series(labels, index=profiles.index, name="cluster")
+    logger.info(f"序列聚类完成: {len(profiles)} 条序列 -> {n_clusters} 个簇，"
+                f"各簇序列数 {np.bincount(labels).tolist()}")
+    return assignments
+
+
+class FleetModel:
+    """
+    多序列模型集合：一个全局模型，或每个簇一个模型。
+
+    预测时按簇分组，每个簇只调用一次 predict，结果按原始行顺序返回。
+    """
+
+    def __init__(self, models: dict, feature_cols: List[str], series_col: str,
+                 assignments: Optional[pd.Series] = None):
+        self.models = models              # {簇编号: 模型}，全局模式为 {None: 模型}
+        self.feature_cols = list(feature_cols)
+        self.series_col = series_col
+        self.assignments = assignments    # 序列编号 -> 簇编号；None 表示全局模型
+
+    def _clusters(self, series: pd.Series) -> np.ndarray:
+        if self.assignments is None:
+            return np.zeros(len(series), dtype=np.int64)
+        clusters = series.map(self.assignments)
+        if clusters.isnull().any():
+            unknown = series[clusters.isnull()].unique()[:5].tolist()
+            raise ValueError(f"以下序列没有所属的簇（未参与训练）: {unknown}")
+        return clusters.to_numpy(dtype=np.int64)
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        X = df[self.feature_cols]
+        if self.assignments is None:
+            return np.asarray(self.models[None].predict(X), dtype=float)
+        clusters = self._clusters(df[self.series_col])
+        predictions = np.empty(len(df))
+        for cluster in np.unique(clusters):
+            mask = clusters == cluster
+            predictions[mask] = self.models[cluster].predict(X[mask])
+        return predictions
+
+
+def train_fleet_models(processed_train: pd.DataFrame, feature_cols: List[str], target_col: str,
+                       series_col: str, assignments: Optional[pd.Series] = None,
+                       model_type: str = "XGBoost", params: Optional[dict] = None,
+                       n_jobs: Optional[int] = None) -> FleetModel:
+    """
+    训练多序列模型。
+
+    Args:
+        processed_train (pd.DataFrame): preprocess_data(series_col=...) 处理后的训练集。
+        feature_cols (list): 特征列（不应包含序列编号列）。
+        target_col (str): 目标列名。
+        series_col (str): 序列编号列。
+        assignments (pd.Series): cluster_series 的结果；None 时在所有序列上训练一个全局模型。
+        model_type (str): 模型类型。
+        params (dict): 覆盖默认超参数的字典。
+        n_jobs (int): 模型线程数。
+
+    Returns:
+        FleetModel: 训练好的模型集合。
+    """
+    if assignments is None:
+        logger.info(f"训练全局模型: {processed_train[series_col].nunique()} 条序列，{len(processed_train)} 行")
+        model = train_model(processed_train[feature_cols], processed_train[target_col],
+                            model_type=model_type, n_jobs=n_jobs, params=params)
+        return FleetModel({None: model}, feature_cols, series_col)
+
+    clusters = processed_train[series_col].map(assignments)
+    models = {}
+    for cluster in sorted(clusters.dropna().unique()):
+        part = processed_train[clusters == cluster]
+        logger.info(f"训练簇 {int(cluster)} 的模型: {part[series_col].nunique()} 条序列，{len(part)} 行")
+        models[int(cluster)] = train_model(part[feature_cols], part[target_col],
+                                           model_type=model_type, n_jobs=n_jobs, params=params)
+    return FleetModel(models, feature_cols, series_col, assignments)
+
+
+def _init_worker(fleet: FleetModel):
+    # 进程级并行时每个子进程的模型只用 1 个线程，避免超额占用
+    for model in fleet.models.values():
+        if hasattr(model, "get_params") and "n_jobs" in model.get_params():
+            model.set_params(n_jobs=1)
+    _WORKER_DATA["fleet"] = fleet
+
+
+def _predict_shard(shard: pd.DataFrame) -> np.ndarray:
+    return _WORKER_DATA["fleet"].predict(shard)
+
+
+def predict_fleet(fleet: FleetModel, processed_df: pd.DataFrame,
+                  max_workers: Optional[int] = None) -> np.ndarray:
+    """
+    在进程池中为大量序列打分。
+
+    按序列编号把数据切成 max_workers 个分片（同一条序列总在同一分片），
+    模型在每个子进程中只传递一次。
+
+    Args:
+        fleet (FleetModel): train_fleet_models 的结果。
+        processed_df (pd.DataFrame): 处理后的特征数据（包含序列编号列）。
+        max_workers (int): 并行进程数，默认 os.cpu_count()；为 1 时在当前进程中计算。
+
+    Returns:
+        np.ndarray: 与 processed_df 行顺序一致的预测值。
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1:
+        return fleet.predict(processed_df)
+
+    codes = pd.factorize(processed_df[fleet.series_col])[0]
+    shard_ids = codes % max_workers
+    columns = fleet.feature_cols + [fleet.series_col]
+    shards = [np.flatnonzero(shard_ids == i) for i in range(max_workers)]
+    shards = [rows for rows in shards if len(rows)]
+    logger.info(f"并行打分: {len(processed_df)} 行，{codes.max() + 1} 条序列，{len(shards)} 个分片")
+
+    predictions = np.empty(len(processed_df))
+    with ProcessPoolExecutor(max_workers=len(shards), initializer=_init_worker,
+                             initargs=(fleet,)) as executor:
+        futures = [executor.submit(_predict_shard, processed_df.iloc[rows][columns]) for rows in shards]
+        for rows, future in zip(shards, futures):
+            predictions[rows] = future.result()
+    return predictions
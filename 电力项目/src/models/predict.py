@@ -4,6 +4,10 @@ import joblib
 import pandas as pd
 import logging
 import numpy as np
+from typing import Callable, List, Optional
+
+from data.processor import LAGS, WINDOWS, build_calendar_features
+
 logger = logging.getLogger(__name__)
 
 def load_model(model_path: str):
@@ -31,10 +35,10 @@ def make_predictions(model, X_test: pd.DataFrame) -> np.ndarray:  # ← 修改
         raw_predictions = model.predict(X_test)  # shape: (768,)
         logger.info(f"模型预测完成。输出形状: {raw_predictions.shape}")
 
-        # 2. 调试信息
-        logger.info(f"X_test index type: {type(X_test.index)}")
-        logger.info(f"X_test index (前5个): {X_test.index[:5]}")
-        logger.info(f"X_test shape inside function: {X_test.shape}")
+        # 2. 调试信息（实时逐条打分请使用 src/models/fast_predict.py 的 FastPredictor）
+        logger.debug(f"X_test index type: {type(X_test.index)}")
+        logger.debug(f"X_test index (前5个): {X_test.index[:5]}")
+        logger.debug(f"X_test shape inside function: {X_test.shape}")
 
         # 3. ✅ 直接返回 numpy array，不要包装成 Series
         return raw_predictions  # ← 只返回数组
@@ -43,4 +47,103 @@ def make_predictions(model, X_test: pd.DataFrame) -> np.ndarray:  # ← 修改
         logger.error(f"在 make_predictions 函数中发生未预期的错误: {type(e).__name__}: {e}")
         logger.error(f"X_test 的形状: {X_test.shape}")
         logger.error(f"X_test 的列: {list(X_test.columns)}")
-        raise
\ No newline at end of file
+        raise
+
+def recursive_forecast(model, history: pd.Series, origins, horizon: int,
+                       feature_cols: List[str], target_col: str = "power_load",
+                       freq: str = "h",
+                       predict_fn: Optional[Callable[[pd.DataFrame], np.ndarray]] = None) -> pd.DataFrame:
+    """
+    递归多步预测：每一步的预测值会回填到后续步骤的滞后和滑动窗口特征中。
+
+    所有预测起点 (origins) 在同一步上被拼成一个批次，只调用一次 model.predict，
+    因此总的预测调用次数等于 horizon，而不是 起点数 × horizon。
+
+    滑动窗口与训练特征 (preprocess_data) 的定义一致：截止到上一时刻的最近 window 个值
+    （真实值或已回填的预测值），不含待预测时刻本身。
+
+    Args:
+        model: 训练好的模型。
+        history (pd.Series): 以时间为索引的历史负荷（按时间升序、等间隔）。
+        origins: 预测起点（必须存在于 history 的索引中），从起点的下一时刻开始预测。
+        horizon (int): 预测步数。
+        feature_cols (list): 模型训练时使用的特征列（决定输入列顺序）。
+        target_col (str): 目标列名，用于生成滞后/滑动特征列名。
+        freq (str): 时间步长，默认按小时。
+        predict_fn (callable): 自定义批量预测函数，默认使用 model.predict。
+
+    Returns:
+        pd.DataFrame: 长表，列为 origin, step, time, predicted_load。
+    """
+    if horizon < 1:
+        raise ValueError(f"horizon 必须为正整数: {horizon}")
+    predict_fn = predict_fn or model.predict
+
+    origins = pd.DatetimeIndex(pd.to_datetime(origins))
+    positions = history.index.get_indexer(origins)
+    if (positions < 0).any():
+        missing = list(origins[positions < 0][:5])
+        raise KeyError(f"以下预测起点不在历史数据中: {missing}")
+
+    values = history.to_numpy(dtype=float)
+    capacity = max(LAGS + WINDOWS)
+    n_origins = len(origins)
+
+    # 每个起点一行：前 capacity 列为起点及之前的真实值，后 horizon 列依次写入预测值
+    buffer = np.full((n_origins, capacity + horizon), np.nan)
+    idx = positions[:, None] + np.arange(-capacity + 1, 1)
+    buffer[:, :capacity] = np.where(idx >= 0, values[np.clip(idx, 0, None)], np.nan)
+
+    step_delta = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    logger.info(f"开始递归预测：{n_origins} 个起点 × {horizon} 步。")
+
+    for step in range(1, horizon + 1):
+        col = capacity + step - 1  # 本步预测值写入的位置
+        times = origins + step * step_delta
+
+        features = build_calendar_features(times)
+        for lag in LAGS:
+            features[f'{target_col}_lag_{lag}'] = buffer[:, col - lag]
+        for window in WINDOWS:
+            recent = buffer[:, col - window:col]
+            features[f'{target_col}_rolling_mean_{window}'] = recent.mean(axis=1)
+            features[f'{target_col}_rolling_std_{window}'] = recent.std(axis=1, ddof=1)
+
+        buffer[:, col] = np.asarray(predict_fn(features[feature_cols]), dtype=float)
+
+    forecasts = buffer[:, capacity:]
+    offsets = pd.to_timedelta(np.arange(1, horizon + 1) * step_delta)
+    result = pd.DataFrame({
+        'origin': np.repeat(origins.to_numpy(), horizon),
+        'step': np.tile(np.arange(1, horizon + 1), n_origins),
+        'time': (origins.to_numpy()[:, None] + offsets.to_numpy()[None, :]).ravel(),
+        'predicted_load': forecasts.ravel(),
+    })
+    logger.info(f"递归预测完成。输出形状: {result.shape}")
+    return result
+
+
+def forecast_from_engine(model, engine, horizon: int, feature_cols: List[str], freq: str = "h",
+                         predict_fn: Optional[Callable[[pd.DataFrame], np.ndarray]] = None) -> pd.DataFrame:
+    """
+    从增量特征引擎的当前状态出发做递归多步预测（无需读取历史数据文件）。
+
+    Args:
+        model: 训练好的模型。
+        engine (IncrementalFeatureEngine): 已接收最新读数的特征引擎。
+        horizon (int): 预测步数。
+        feature_cols (list): 模型训练时使用的特征列。
+        freq (str): 时间步长，默认按小时。
+        predict_fn (callable): 自定义批量预测函数，默认使用 model.predict。
+
+    Returns:
+        pd.DataFrame: 同 recursive_forecast。
+    """
+    if engine.last_timestamp is None:
+        raise ValueError("特征引擎尚未接收任何读数，无法预测。")
+    values = engine.history
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    index = engine.last_timestamp - step * np.arange(len(values) - 1, -1, -1)
+    history = pd.Series(values, index=pd.DatetimeIndex(index))
+    return recursive_forecast(model, history, [engine.last_timestamp], horizon, feature_cols,
+                              target_col=engine.target_col, freq=freq, predict_fn=predict_fn)
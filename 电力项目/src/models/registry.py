@@ -0,0 +1,348 @@
+# src/models/registry.py
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "registry.json"
+
+# 树模型展开后保存的数组
+_TREE_ARRAYS = ("children_left", "children_right", "feature", "threshold", "value", "roots")
+
+
+class ArrayLinearModel:
+    """从数组加载的线性模型，只依赖 numpy。"""
+
+    def __init__(self, coef: np.ndarray, intercept: float, feature_cols: List[str]):
+        self.coef = coef
+        self.intercept = intercept
+        self.feature_names_in_ = np.array(feature_cols, dtype=object)
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+
+class ArrayTreeEnsemble:
+    """
+    从数组加载的树集成模型（RandomForest / GradientBoosting，以及展开后的 XGBoost），只依赖 numpy。
+
+    所有树的节点拼接在同一组数组中，预测时所有样本、所有树同时向下走一层，
+    循环次数等于树的最大深度。
+    """
+
+    def __init__(self, arrays: dict, feature_cols: List[str], aggregate: str,
+                 base_score: float = 0.0, scale: float = 1.0, strict: bool = False):
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        # 缺失值的走向（XGBoost 的 default_left / sklearn 的 missing_go_to_left）；旧版本仓库中可能没有
+        self.default_left = arrays.get("default_left")
+        self.strict = strict  # True: x < 阈值走左 (XGBoost)；False: x <= 阈值走左 (sklearn)
+        self.aggregate = aggregate  # "mean" (随机森林) 或 "sum" (梯度提升)
+        self.base_score = base_score
+        self.scale = scale
+        self.feature_names_in_ = np.array(feature_cols, dtype=object)
+
+    def predict(self, X) -> np.ndarray:
+        # sklearn 的树在 float32 上做划分比较，这里保持一致
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_samples = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_samples, len(self.roots))).copy()
+        rows = np.arange(n_samples)[:, None]
+        while True:
+            left = self.children_left[nodes]
+            active = left != -1
+            if not active.any():
+                break
+            x = X[rows, self.feature[nodes]]
+            go_left = x < self.threshold[nodes] if self.strict else x <= self.threshold[nodes]
+            if self.default_left is not None:
+                go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = np.where(active, np.where(go_left, left, self.children_right[nodes]), nodes)
+        leaf_values = self.value[nodes]
+        if self.aggregate == "mean":
+            return leaf_values.mean(axis=1)
+        return self.base_score + self.scale * leaf_values.sum(axis=1)
+
+
+def _flatten_trees(trees) -> dict:
+    """把多棵 sklearn 决策树展开为拼接后的节点数组（子节点下标为全局下标）。"""
+    parts = {name: [] for name in _TREE_ARRAYS + ("default_left",)}
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        is_leaf = t.children_left == -1
+        parts["children_left"].append(np.where(is_leaf, -1, t.children_left + offset))
+        parts["children_right"].append(np.where(is_leaf, -1, t.children_right + offset))
+        parts["feature"].append(np.where(is_leaf, 0, t.feature))
+        parts["threshold"].append(t.threshold)
+        parts["value"].append(t.value[:, 0, 0])
+        # sklearn >= 1.3 记录每个节点缺失值的走向；更早的版本缺失值总是走右
+        parts["default_left"].append(getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=np.uint8)))
+        parts["roots"].append(np.array([offset]))
+        offset += t.node_count
+    return {
+        "children_left": np.concatenate(parts["children_left"]).astype(np.int32),
+        "children_right": np.concatenate(parts["children_right"]).astype(np.int32),
+        "feature": np.concatenate(parts["feature"]).astype(np.int32),
+        "threshold": np.concatenate(parts["threshold"]).astype(np.float64),
+        "value": np.concatenate(parts["value"]).astype(np.float64),
+        "roots": np.concatenate(parts["roots"]).astype(np.int32),
+        "default_left": np.concatenate(parts["default_left"]).astype(np.uint8),
+    }
+
+
+def _library_versions() -> dict:
+    versions = {"numpy": np.__version__, "pandas": pd.__version__}
+    for name in ("xgboost", "sklearn"):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            pass
+    return versions
+
+
+class ModelRegistry:
+    """
+    版本化的模型仓库。
+
+    目录结构::
+
+        <root>/registry.json          当前版本、是否固定 (pinned)、发布历史
+        <root>/v0001/manifest.json    特征列顺序、训练数据范围、指标、格式等
+        <root>/v0001/model.ubj        XGBoost 原生二进制格式
+        <root>/v0002/*.npy            sklearn 模型的数组格式（可内存映射加载）
+
+    未固定时，新发布的版本自动成为当前版本；pin / rollback 会固定当前版本，
+    直到调用 unpin。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    # ------------------ 索引 ------------------
+    def _read_index(self) -> dict:
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return {"current": None, "pinned": False, "history": []}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_index(self, index: dict):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)  # 原子替换，读取方不会看到半写的索引
+
+    def list_versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if name.startswith('v') and os.path.exists(os.path.join(self.root, name, MANIFEST_FILE)))
+
+    def current_version(self) -> Optional[str]:
+        return self._read_index()["current"]
+
+    def manifest(self, version: Optional[str] = None) -> dict:
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"模型仓库中没有可用版本: {self.root}")
+        with open(os.path.join(self.root, version, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # ------------------ 发布 ------------------
+    def publish(self, model: object, feature_cols: List[str], metrics: Optional[dict] = None,
+                train_start=None, train_end=None, model_type: Optional[str] = None) -> str:
+        """
+        发布一个新版本。
+
+        Args:
+            model (object): 训练好的模型（XGBRegressor / LinearRegression /
+                RandomForestRegressor / GradientBoostingRegressor）。
+            feature_cols (list): 特征列顺序。
+            metrics (dict): 验证集指标。
+            train_start, train_end: 训练数据的时间范围。
+            model_type (str): 模型类型名称，默认取类名。
+
+        Returns:
+            str: 新版本号，如 "v0003"。
+        """
+        versions = self.list_versions()
+        version = f"v{int(versions[-1][1:]) + 1:04d}" if versions else "v0001"
+        tmp_dir = os.path.join(self.root, f".{version}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        manifest = {
+            "version": version,
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "model_type": model_type or type(model).__name__,
+            "feature_cols": list(feature_cols),
+            "train_start": str(train_start) if train_start is not None else None,
+            "train_end": str(train_end) if train_end is not None else None,
+            "metrics": {k: float(v) for k, v in (metrics or {}).items()},
+            "library_versions": _library_versions(),
+        }
+        for attr in ("data_watermark_", "full_refit_watermark_"):
+            if getattr(model, attr, None) is not None:
+                manifest[attr.rstrip('_')] = str(getattr(model, attr))
+
+        try:
+            manifest.update(self._save_model_files(model, tmp_dir))
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.rename(tmp_dir, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        index = self._read_index()
+        index["history"].append(version)
+        if not index["pinned"]:
+            index["current"] = version
+        self._write_index(index)
+        logger.info(f"模型已发布到仓库: {version} ({manifest['format']})，当前版本: {index['current']}")
+        return version
+
+    @staticmethod
+    def _save_model_files(model: object, directory: str) -> dict:
+        """按模型类型选择存储格式，返回写入 manifest 的格式信息。"""
+        class_name = type(model).__name__
+        if class_name == "XGBRegressor":
+            model.get_booster().save_model(os.path.join(directory, "model.ubj"))
+            info = {"format": "xgboost-ubj"}
+            # 同时保存展开后的树数组：只做预测的进程可以不导入 xgboost（见 load_predictor）
+            from src.models.fast_predict import _flatten_xgboost
+            best_iteration = getattr(model, "best_iteration", None)
+            arrays, base_score = _flatten_xgboost(model.get_booster(),
+                                                  best_iteration + 1 if best_iteration is not None else None)
+            if arrays is not None:
+                for name, array in arrays.items():
+                    np.save(os.path.join(directory, f"{name}.npy"), array)
+                info["tree_arrays"] = {"aggregate": "sum", "base_score": base_score, "strict": True}
+            return info
+        if class_name == "LinearRegression":
+            np.save(os.path.join(directory, "coef.npy"), np.asarray(model.coef_, dtype=np.float64))
+            return {"format": "linear-npy", "intercept": float(model.intercept_)}
+        if class_name == "RandomForestRegressor":
+            arrays = _flatten_trees(model.estimators_)
+            info = {"format": "tree-ensemble-npy", "aggregate": "mean"}
+        elif class_name == "GradientBoostingRegressor":
+            if type(model.init_).__name__ != "DummyRegressor":
+                raise ValueError("仅支持默认 init 的 GradientBoostingRegressor")
+            arrays = _flatten_trees(model.estimators_[:, 0])
+            info = {"format": "tree-ensemble-npy", "aggregate": "sum",
+                    "base_score": float(model.init_.constant_[0][0]),
+                    "scale": float(model.learning_rate)}
+        else:
+            raise ValueError(f"模型仓库不支持的模型类型: {class_name}")
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        return info
+
+    # ------------------ 加载 ------------------
+    def load(self, version: Optional[str] = None):
+        """
+        加载指定版本（默认当前版本）。数组格式以内存映射方式打开，几乎不产生加载开销。
+
+        Returns:
+            object: 具有 predict(X) 方法的模型，feature_names_in_ 为 manifest 中的特征列顺序。
+        """
+        manifest = self.manifest(version)
+        version = manifest["version"]
+        directory = os.path.join(self.root, version)
+        fmt = manifest["format"]
+        feature_cols = manifest["feature_cols"]
+
+        if fmt == "xgboost-ubj":
+            import xgboost as xgb
+            model = xgb.XGBRegressor()
+            model.load_model(os.path.join(directory, "model.ubj"))
+        elif fmt == "linear-npy":
+            coef = np.load(os.path.join(directory, "coef.npy"), mmap_mode='r')
+            model = ArrayLinearModel(coef, manifest["intercept"], feature_cols)
+        elif fmt == "tree-ensemble-npy":
+            model = self._load_tree_arrays(directory, manifest, feature_cols)
+        else:
+            raise ValueError(f"未知的模型格式: {fmt}")
+
+        self._set_metadata(model, manifest)
+        logger.info(f"已从模型仓库加载 {version} ({manifest['model_type']}, {fmt})")
+        return model
+
+    @staticmethod
+    def _load_tree_arrays(directory: str, info: dict, feature_cols: List[str]) -> ArrayTreeEnsemble:
+        """以内存映射方式加载展开后的树数组。"""
+        names = list(_TREE_ARRAYS)
+        if os.path.exists(os.path.join(directory, "default_left.npy")):
+            names.append("default_left")
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in names}
+        return ArrayTreeEnsemble(arrays, feature_cols, info["aggregate"], info.get("base_score", 0.0),
+                                 info.get("scale", 1.0), strict=info.get("strict", False))
+
+    @staticmethod
+    def _set_metadata(model: object, manifest: dict):
+        for key in ("data_watermark", "full_refit_watermark"):
+            if manifest.get(key):
+                setattr(model, f"{key}_", pd.Timestamp(manifest[key]))
+        model.registry_version_ = manifest["version"]
+
+    def load_predictor(self, version: Optional[str] = None, backend: str = "auto"):
+        """
+        加载指定版本并包装为 FastPredictor（特征顺序取自 manifest）。
+
+        XGBoost 版本带有展开后的树数组时直接加载数组，不导入 xgboost（导入本身需要数秒），
+        适合只做打分的短进程。
+        """
+        from src.models.fast_predict import FastPredictor
+        manifest = self.manifest(version)
+        if "tree_arrays" in manifest and backend in ("auto", "native", "array"):
+            directory = os.path.join(self.root, manifest["version"])
+            model = self._load_tree_arrays(directory, manifest["tree_arrays"], manifest["feature_cols"])
+            self._set_metadata(model, manifest)
+            logger.info(f"已从模型仓库加载 {manifest['version']} 的树数组 ({manifest['model_type']})")
+        else:
+            model = self.load(manifest["version"])
+        return FastPredictor(model, manifest["feature_cols"], backend=backend)
+
+    # ------------------ 固定与回滚 ------------------
+    def pin(self, version: str):
+        """固定当前版本；之后发布的新版本不会自动上线。"""
+        if version not in self.list_versions():
+            raise ValueError(f"版本不存在: {version}")
+        index = self._read_index()
+        index.update(current=version, pinned=True)
+        self._write_index(index)
+        logger.info(f"已固定模型版本: {version}")
+
+    def unpin(self):
+        """取消固定，当前版本恢复为最新发布的版本。"""
+        index = self._read_index()
+        versions = self.list_versions()
+        index.update(current=versions[-1] if versions else None, pinned=False)
+        self._write_index(index)
+        logger.info(f"已取消固定，当前版本: {index['current']}")
+
+    def rollback(self) -> str:
+        """回滚到当前版本之前发布的版本，并固定。"""
+        index = self._read_index()
+        history = [v for v in index["history"] if v in self.list_versions()]
+        current = index["current"]
+        if current not in history or history.index(current) == 0:
+            raise ValueError(f"没有可回滚的版本 (当前: {current})")
+        previous = history[history.index(current) - 1]
+        self.pin(previous)
+        return previous
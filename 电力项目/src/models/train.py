@@ -8,12 +8,23 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error
 import xgboost as xgb
 import logging
 import os
+import json
+import time
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+from src.evaluation.metrics import calculate_mape
 
 logger = logging.getLogger(__name__)
 
+MODEL_TYPES = ["Linear", "RandomForest", "GradientBoosting", "XGBoost"]
+# 能利用多线程的模型（其余模型在锦标赛中只分配 1 个核）
+_MULTI_THREADED_MODELS = {"RandomForest", "XGBoost"}
+
 def train_model(X_train: pd.DataFrame, y_train: pd.Series,
-               model_type: str = "XGBoost") -> object:
+               model_type: str = "XGBoost", n_jobs: Optional[int] = None,
+               params: Optional[dict] = None, eval_set: Optional[list] = None) -> object:
     """
     训练指定类型的模型。
 
@@ -21,24 +32,33 @@ def train_model(X_train: pd.DataFrame, y_train: pd.Series,
         X_train (pd.DataFrame): 训练特征。
         y_train (pd.Series): 训练标签。
         model_type (str): 模型类型 ("Linear", "RandomForest", "GradientBoosting", "XGBoost")。
+        n_jobs (int): RandomForest / XGBoost 使用的线程数，默认由库自行决定。
+        params (dict): 覆盖默认超参数的字典（如超参数搜索得到的最优参数）。
+        eval_set (list): 仅 XGBoost 使用，[(X_val, y_val)]，配合 params 中的
+            early_stopping_rounds 实现早停。
 
     Returns:
         object: 训练好的模型。
     """
     logger.info(f"开始训练 {model_type} 模型...")
+    params = params or {}
 
     if model_type == "Linear":
-        model = LinearRegression()
+        model = LinearRegression(**params)
     elif model_type == "RandomForest":
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model = RandomForestRegressor(**{"n_estimators": 100, "random_state": 42, "n_jobs": n_jobs, **params})
     elif model_type == "GradientBoosting":
-        model = GradientBoostingRegressor(n_estimators=100, random_state=42)
+        model = GradientBoostingRegressor(**{"n_estimators": 100, "random_state": 42, **params})
     elif model_type == "XGBoost":
-        model = xgb.XGBRegressor(n_estimators=100, random_state=42, objective='reg:squarederror')
+        model = xgb.XGBRegressor(**{"n_estimators": 100, "random_state": 42, "objective": 'reg:squarederror',
+                                    "n_jobs": n_jobs, **params})
     else:
         raise ValueError(f"不支持的模型类型: {model_type}")
 
-    model.fit(X_train, y_train)
+    if model_type == "XGBoost" and eval_set is not None:
+        model.fit(X_train, y_train, eval_set=eval_set, verbose=False)
+    else:
+        model.fit(X_train, y_train)
     logger.info(f"{model_type} 模型训练完成。")
     return model
 
@@ -61,7 +81,7 @@ def evaluate_model(model: object, X_val: pd.DataFrame, y_val: pd.Series) -> dict
     mse = mean_squared_error(y_val, y_pred)
     rmse = np.sqrt(mse)
     mae = mean_absolute_error(y_val, y_pred)  # <-- 添加这一行！计算 MAE
-    mape = (abs(y_val - y_pred) / y_val).mean() * 100  # 注意：避免 y_val 为0
+    mape = calculate_mape(y_val, y_pred)  # 跳过 y_val 为 0 的样本
 
     logger.info(f"验证集评估结果:")
     logger.info(f"  MAE: {mae:.4f}")  # 现在 'mae' 已定义
@@ -79,4 +99,241 @@ def save_model(model: object, model_path: str):
         logger.info(f"模型已保存至: {model_path}")
     except Exception as e:
         logger.error(f"保存模型时出错: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _thread_budgets(model_types: List[str], n_cores: int) -> dict:
+    """
+    为同时训练的候选模型分配线程预算，避免 RandomForest / XGBoost 的 n_jobs 超额占用 CPU。
+
+    单线程模型各占 1 个核，剩余的核在多线程模型之间平分（每个至少 1 个）。
+    """
+    multi = [m for m in model_types if m in _MULTI_THREADED_MODELS]
+    single = [m for m in model_types if m not in _MULTI_THREADED_MODELS]
+    spare = max(n_cores - len(single), len(multi))
+    budgets = {m: 1 for m in single}
+    for i, m in enumerate(multi):
+        # 余数分给排在前面的模型
+        budgets[m] = max(1, spare // len(multi) + (1 if i < spare % len(multi) else 0))
+    return budgets
+
+
+def _tournament_worker(model_type: str, n_jobs: int, X_train: pd.DataFrame, y_train: pd.Series,
+                       X_val: pd.DataFrame, y_val: pd.Series) -> Tuple[str, object, dict, float]:
+    """锦标赛子进程：在线程预算内训练并评估一个候选模型。"""
+    # 同时限制 BLAS/OpenMP 线程池（LinearRegression 等会隐式使用）
+    try:
+        from threadpoolctl import threadpool_limits
+        limiter = threadpool_limits(limits=n_jobs)
+    except ImportError:
+        limiter = None
+
+    start = time.perf_counter()
+    model = train_model(X_train, y_train, model_type=model_type, n_jobs=n_jobs)
+    train_seconds = time.perf_counter() - start
+    metrics = evaluate_model(model, X_val, y_val)
+
+    if limiter is not None:
+        limiter.restore_original_limits()
+    return model_type, model, metrics, train_seconds
+
+
+def run_tournament(X_train: pd.DataFrame, y_train: pd.Series,
+                   X_val: pd.DataFrame, y_val: pd.Series,
+                   model_types: Optional[List[str]] = None,
+                   metric: str = "RMSE",
+                   model_path: Optional[str] = None,
+                   leaderboard_path: Optional[str] = None,
+                   n_cores: Optional[int] = None) -> Tuple[object, List[dict]]:
+    """
+    多模型锦标赛：在进程池中同时训练所有候选模型，用同一验证集评估，选出最优模型。
+
+    Args:
+        X_train, y_train: 训练数据。
+        X_val, y_val: 验证数据（所有候选模型共用）。
+        model_types (list): 候选模型类型，默认全部 MODEL_TYPES。
+        metric (str): 选优指标（越小越好），默认 "RMSE"。
+        model_path (str): 若指定，将冠军模型保存到该路径（如 best_model.pkl）。
+        leaderboard_path (str): 若指定，将排行榜保存为 JSON。
+        n_cores (int): 可用的 CPU 核数，默认 os.cpu_count()。
+
+    Returns:
+        Tuple[object, list]: 冠军模型和按指标排序的排行榜。
+    """
+    model_types = list(model_types or MODEL_TYPES)
+    n_cores = n_cores or os.cpu_count() or 1
+    budgets = _thread_budgets(model_types, n_cores)
+    logger.info(f"开始模型锦标赛: {model_types}，线程预算: {budgets}")
+
+    results = {}
+    leaderboard = []
+    with ProcessPoolExecutor(max_workers=len(model_types)) as executor:
+        futures = {
+            executor.submit(_tournament_worker, m, budgets[m], X_train, y_train, X_val, y_val): m
+            for m in model_types
+        }
+        for future, model_type in futures.items():
+            try:
+                _, model, metrics, train_seconds = future.result()
+            except Exception as e:
+                logger.error(f"{model_type} 训练失败: {e}")
+                leaderboard.append({"model_type": model_type, "n_jobs": budgets[model_type], "error": str(e)})
+                continue
+            results[model_type] = model
+            leaderboard.append({
+                "model_type": model_type,
+                "n_jobs": budgets[model_type],
+                "train_seconds": round(train_seconds, 3),
+                **{k: float(v) for k, v in metrics.items()},
+            })
+
+    if not results:
+        raise RuntimeError("所有候选模型均训练失败。")
+
+    leaderboard.sort(key=lambda row: row.get(metric, float('inf')))
+    winner = leaderboard[0]["model_type"]
+    best_model = results[winner]
+
+    logger.info("锦标赛排行榜:")
+    for rank, row in enumerate(leaderboard, 1):
+        if "error" in row:
+            logger.info(f"  {rank}. {row['model_type']}: 失败 ({row['error']})")
+        else:
+            logger.info(f"  {rank}. {row['model_type']}: {metric}={row[metric]:.4f}, "
+                        f"耗时 {row['train_seconds']:.1f}s, n_jobs={row['n_jobs']}")
+    logger.info(f"冠军模型: {winner}")
+
+    if model_path:
+        save_model(best_model, model_path)
+    if leaderboard_path:
+        os.makedirs(os.path.dirname(leaderboard_path), exist_ok=True)
+        with open(leaderboard_path, 'w', encoding='utf-8') as f:
+            json.dump({"metric": metric, "winner": winner, "leaderboard": leaderboard},
+                      f, ensure_ascii=False, indent=2)
+        logger.info(f"排行榜已保存至: {leaderboard_path}")
+
+    return best_model, leaderboard
+
+
+def set_watermark(model: object, watermark, full_refit: bool = False) -> object:
+    """
+    在模型对象上记录训练数据的水位线（最后一条训练数据的时间），随模型一起保存。
+
+    Args:
+        model (object): 模型。
+        watermark: 训练数据的最大时间戳。
+        full_refit (bool): 本次是否为全量训练（用于判断何时需要周期性全量重训）。
+    """
+    model.data_watermark_ = pd.Timestamp(watermark)
+    if full_refit or getattr(model, "full_refit_watermark_", None) is None:
+        model.full_refit_watermark_ = pd.Timestamp(watermark)
+    return model
+
+
+def get_watermark(model: object) -> Optional[pd.Timestamp]:
+    """读取模型的训练数据水位线；旧模型文件没有水位线时返回 None。"""
+    return getattr(model, "data_watermark_", None)
+
+
+def update_model(model: object, X_new: pd.DataFrame, y_new: pd.Series,
+                 n_new_rounds: int = 20, mode: str = "continue") -> object:
+    """
+    用新数据热启动更新已有的 XGBoost 模型，而不是从头训练。
+
+    Args:
+        model (object): 已训练的 XGBRegressor。
+        X_new (pd.DataFrame): 新窗口的特征。
+        y_new (pd.Series): 新窗口的标签。
+        n_new_rounds (int): "continue" 模式下追加的树的数量。
+        mode (str): "continue" 在现有 booster 上继续 boosting；
+                    "refresh" 不增加树，只用新数据刷新现有树的叶子值。
+
+    Returns:
+        object: 更新后的新模型（原模型不会被修改），水位线保持原值，由调用方更新。
+    """
+    if not isinstance(model, xgb.XGBRegressor):
+        raise ValueError(f"增量更新仅支持 XGBoost 模型，当前模型: {type(model).__name__}")
+
+    booster = model.get_booster()
+    # 原模型若带早停参数（如超参数搜索中训练的模型），继续训练时没有 eval_set 会报错，这里清除
+    params = {**model.get_params(), "early_stopping_rounds": None}
+    if mode == "continue":
+        new_model = xgb.XGBRegressor(**{**params, "n_estimators": n_new_rounds})
+        new_model.fit(X_new, y_new, xgb_model=booster)
+    elif mode == "refresh":
+        refresh_params = {"process_type": "update", "updater": "refresh", "refresh_leaf": True,
+                          "objective": params.get("objective") or 'reg:squarederror'}
+        new_booster = xgb.train(refresh_params, xgb.DMatrix(X_new, label=y_new),
+                                num_boost_round=booster.num_boosted_rounds(), xgb_model=booster.copy())
+        new_model = xgb.XGBRegressor(**params)
+        new_model.load_model(bytearray(new_booster.save_raw()))
+    else:
+        raise ValueError(f"不支持的增量更新模式: {mode}")
+
+    for attr in ("data_watermark_", "full_refit_watermark_"):
+        if hasattr(model, attr):
+            setattr(new_model, attr, getattr(model, attr))
+    logger.info(f"模型增量更新完成 (mode={mode})，新数据 {len(X_new)} 行，"
+                f"树的数量: {booster.num_boosted_rounds()} -> {new_model.get_booster().num_boosted_rounds()}")
+    return new_model
+
+
+def incremental_retrain(model: object, processed_df: pd.DataFrame, feature_cols: List[str],
+                        time_col: str, target_col: str, full_refit: bool = False,
+                        full_refit_days: Optional[int] = 30, n_new_rounds: int = 20,
+                        mode: str = "continue", model_type: str = "XGBoost",
+                        params: Optional[dict] = None,
+                        model_path: Optional[str] = None) -> object:
+    """
+    日常增量重训：只用水位线之后的新数据更新模型；需要时执行全量重训。
+
+    以下情况执行全量重训：显式指定 full_refit；模型没有水位线（旧模型文件）；
+    距上次全量训练已超过 full_refit_days 天；模型不是 XGBoost。
+
+    Args:
+        model (object): 当前模型（通常由 load_model 加载）。
+        processed_df (pd.DataFrame): 处理后的完整特征表（包含时间列和目标列）。
+        feature_cols (list): 特征列。
+        time_col (str): 时间列名。
+        target_col (str): 目标列名。
+        full_refit (bool): 强制全量重训。
+        full_refit_days (int): 周期性全量重训的间隔天数；None 表示从不自动全量重训。
+        n_new_rounds (int): 增量更新追加的树的数量。
+        mode (str): 增量更新模式，见 update_model。
+        model_type (str): 全量重训时的模型类型。
+        params (dict): 全量重训时的超参数。
+        model_path (str): 若指定，将更新后的模型保存到该路径。
+
+    Returns:
+        object: 更新后的模型。
+    """
+    watermark = get_watermark(model)
+    last_full = getattr(model, "full_refit_watermark_", None)
+    data_end = processed_df[time_col].max()
+
+    if not full_refit:
+        if watermark is None or not isinstance(model, xgb.XGBRegressor):
+            logger.info("模型没有水位线或不支持增量更新，执行全量重训。")
+            full_refit = True
+        elif full_refit_days is not None and last_full is not None \
+                and data_end - last_full >= pd.Timedelta(days=full_refit_days):
+            logger.info(f"距上次全量训练 ({last_full}) 已超过 {full_refit_days} 天，执行全量重训。")
+            full_refit = True
+
+    if full_refit:
+        new_model = train_model(processed_df[feature_cols], processed_df[target_col],
+                                model_type=model_type, params=params)
+        set_watermark(new_model, data_end, full_refit=True)
+    else:
+        new_rows = processed_df[processed_df[time_col] > watermark]
+        if new_rows.empty:
+            logger.info(f"没有水位线 {watermark} 之后的新数据，模型保持不变。")
+            return model
+        new_model = update_model(model, new_rows[feature_cols], new_rows[target_col],
+                                 n_new_rounds=n_new_rounds, mode=mode)
+        set_watermark(new_model, new_rows[time_col].max())
+
+    logger.info(f"模型水位线: {watermark} -> {get_watermark(new_model)}")
+    if model_path:
+        save_model(new_model, model_path)
+    return new_model
@@ -0,0 +1,202 @@
+# src/models/tuning.py
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.models.train import evaluate_model, train_model
+
+logger = logging.getLogger(__name__)
+
+# XGBoost 超参数搜索空间: (类型, 下界, 上界)
+SEARCH_SPACE = {
+    "max_depth": ("int", 3, 10),
+    "learning_rate": ("log", 0.01, 0.3),
+    "subsample": ("float", 0.6, 1.0),
+    "colsample_bytree": ("float", 0.6, 1.0),
+    "min_child_weight": ("log", 1.0, 20.0),
+    "reg_lambda": ("log", 0.1, 10.0),
+}
+
+# 子进程中的共享数据（由 _init_worker 设置一次，各试验只传递参数）
+_WORKER_DATA = {}
+
+
+def sample_configs(n: int, space: Optional[dict] = None, random_state: int = 42) -> List[dict]:
+    """从搜索空间中随机采样 n 组超参数。"""
+    space = space or SEARCH_SPACE
+    rng = np.random.default_rng(random_state)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, (kind, low, high) in space.items():
+            if kind == "int":
+                config[name] = int(rng.integers(low, high + 1))
+            elif kind == "log":
+                config[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+            else:
+                config[name] = float(rng.uniform(low, high))
+        configs.append(config)
+    return configs
+
+
+def split_holdout(X_val: pd.DataFrame, y_val: pd.Series) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]:
+    """把时间顺序的验证集按时间对半分为早停集和选优集。"""
+    half = len(X_val) // 2
+    return X_val.iloc[:half], y_val.iloc[:half], X_val.iloc[half:], y_val.iloc[half:]
+
+
+def _init_worker(X_train, y_train, X_val, y_val, X_select, y_select, n_jobs: int):
+    _WORKER_DATA.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val,
+                        X_select=X_select, y_select=y_select, n_jobs=n_jobs)
+
+
+def _run_trial(trial_id: int, config: dict, n_rounds: int, early_stopping_rounds: int) -> dict:
+    """在子进程中用给定的轮数预算训练一组超参数：在早停集上早停，在独立的选优集上评估。"""
+    X_val, y_val = _WORKER_DATA["X_val"], _WORKER_DATA["y_val"]
+    params = {**config, "n_estimators": n_rounds, "early_stopping_rounds": early_stopping_rounds}
+    model = train_model(_WORKER_DATA["X_train"], _WORKER_DATA["y_train"], model_type="XGBoost",
+                        n_jobs=_WORKER_DATA["n_jobs"], params=params, eval_set=[(X_val, y_val)])
+    metrics = evaluate_model(model, _WORKER_DATA["X_select"], _WORKER_DATA["y_select"])
+    best_iteration = getattr(model, "best_iteration", None)
+    return {
+        "trial": trial_id,
+        "n_rounds": n_rounds,
+        "best_iteration": int(best_iteration) if best_iteration is not None else n_rounds - 1,
+        **config,
+        **{k: float(v) for k, v in metrics.items()},
+    }
+
+
+def successive_halving(X_train: pd.DataFrame, y_train: pd.Series,
+                       X_val: pd.DataFrame, y_val: pd.Series,
+                       configs: List[dict], min_rounds: int = 50, max_rounds: int = 1000,
+                       eta: int = 3, early_stopping_rounds: int = 20, metric: str = "RMSE",
+                       executor: Optional[ProcessPoolExecutor] = None,
+                       bracket: int = 0, X_select: Optional[pd.DataFrame] = None,
+                       y_select: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    逐次减半 (successive halving)：所有候选先用小的 boosting 轮数预算训练，
+    每一轮只保留最好的 1/eta，并把幸存者的预算乘以 eta，直到 max_rounds。
+
+    每次训练都在时间顺序划分的验证集上早停，因此预算只是上限；
+    候选之间按独立的选优集 (X_select, y_select) 比较，未指定时把验证集按时间对半拆分。
+
+    Returns:
+        pd.DataFrame: 所有试验的记录（包含每一档预算的结果）。
+    """
+    if X_select is None:
+        X_val, y_val, X_select, y_select = split_holdout(X_val, y_val)
+    survivors = list(enumerate(configs))
+    n_rounds = min_rounds
+    records = []
+    rung = 0
+    while survivors:
+        logger.info(f"[bracket {bracket}] 第 {rung} 档: {len(survivors)} 组参数, 预算 {n_rounds} 轮")
+        if executor is None:
+            _init_worker(X_train, y_train, X_val, y_val, X_select, y_select, None)
+            results = [_run_trial(i, c, n_rounds, early_stopping_rounds) for i, c in survivors]
+        else:
+            futures = [executor.submit(_run_trial, i, c, n_rounds, early_stopping_rounds)
+                       for i, c in survivors]
+            results = [f.result() for f in futures]
+        for result in results:
+            result.update(bracket=bracket, rung=rung)
+        records.extend(results)
+
+        if n_rounds >= max_rounds or len(survivors) == 1:
+            break
+        results.sort(key=lambda r: r[metric])
+        keep = {r["trial"] for r in results[:max(1, len(results) // eta)]}
+        survivors = [(i, c) for i, c in survivors if i in keep]
+        n_rounds = min(n_rounds * eta, max_rounds)
+        rung += 1
+    return pd.DataFrame(records)
+
+
+def hyperband_search(X_train: pd.DataFrame, y_train: pd.Series,
+                     X_val: pd.DataFrame, y_val: pd.Series,
+                     min_rounds: int = 50, max_rounds: int = 1000, eta: int = 3,
+                     early_stopping_rounds: int = 20, metric: str = "RMSE",
+                     max_workers: Optional[int] = None, space: Optional[dict] = None,
+                     random_state: int = 42,
+                     params_path: Optional[str] = None, X_select: Optional[pd.DataFrame] = None,
+                     y_select: Optional[pd.Series] = None) -> Tuple[dict, pd.DataFrame]:
+    """
+    Hyperband 风格的 XGBoost 超参数搜索：运行若干个逐次减半 bracket，
+    从"多配置、小预算"到"少配置、大预算"，试验在进程池中并行。
+
+    Args:
+        X_train, y_train: 训练数据。
+        X_val, y_val: 时间顺序划分的验证集（用于早停）。
+        X_select, y_select: 用于选优的独立验证集（应晚于 X_val）；未指定时把 X_val 按时间对半拆分，
+            前一半早停、后一半选优，避免选出的参数过拟合早停所用的数据。
+        min_rounds (int): 最小 boosting 轮数预算。
+        max_rounds (int): 最大 boosting 轮数预算。
+        eta (int): 每档保留 1/eta 的候选，预算放大 eta 倍。
+        early_stopping_rounds (int): 早停轮数。
+        metric (str): 选优指标（越小越好）。
+        max_workers (int): 并行进程数，默认 os.cpu_count()。
+        space (dict): 搜索空间，默认 SEARCH_SPACE。
+        random_state (int): 采样随机种子。
+        params_path (str): 若指定，将最优参数保存为 JSON（供 train_model 的 params 使用）。
+
+    Returns:
+        Tuple[dict, pd.DataFrame]: 最优参数（n_estimators 取早停后的最佳轮数）和全部试验记录。
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    n_cores = os.cpu_count() or 1
+    n_jobs = max(1, n_cores // max_workers)  # 每个试验的线程预算，避免超额占用
+    s_max = int(math.floor(math.log(max_rounds / min_rounds, eta) + 1e-9))
+    if X_select is None:
+        X_val, y_val, X_select, y_select = split_holdout(X_val, y_val)
+    logger.info(f"超参数搜索: 训练 {len(X_train)} 行，早停 {len(X_val)} 行，选优 {len(X_select)} 行")
+
+    all_trials = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(X_train, y_train, X_val, y_val, X_select, y_select, n_jobs)) as executor:
+        for s in range(s_max, -1, -1):
+            n_configs = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+            start_rounds = max(min_rounds, int(max_rounds / eta ** s))
+            configs = sample_configs(n_configs, space, random_state + s)
+            trials = successive_halving(X_train, y_train, X_val, y_val, configs,
+                                        min_rounds=start_rounds, max_rounds=max_rounds, eta=eta,
+                                        early_stopping_rounds=early_stopping_rounds, metric=metric,
+                                        executor=executor, bracket=s, X_select=X_select, y_select=y_select)
+            all_trials.append(trials)
+
+    trials = pd.concat(all_trials, ignore_index=True).sort_values(metric).reset_index(drop=True)
+    best = trials.iloc[0]
+    space = space or SEARCH_SPACE
+    best_params = {name: (int(best[name]) if space[name][0] == "int" else float(best[name]))
+                   for name in space}
+    best_params["n_estimators"] = int(best["best_iteration"]) + 1
+    logger.info(f"超参数搜索完成: {len(trials)} 次试验，最优 {metric}={best[metric]:.4f}")
+    logger.info(f"最优参数: {best_params}")
+
+    if params_path:
+        save_params(best_params, params_path)
+    return best_params, trials
+
+
+def save_params(params: dict, params_path: str):
+    """保存超参数（JSON）。"""
+    os.makedirs(os.path.dirname(params_path), exist_ok=True)
+    with open(params_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, ensure_ascii=False, indent=2)
+    logger.info(f"超参数已保存至: {params_path}")
+
+
+def load_params(params_path: str) -> Optional[dict]:
+    """读取保存的超参数；文件不存在时返回 None。"""
+    if not os.path.exists(params_path):
+        return None
+    with open(params_path, 'r', encoding='utf-8') as f:
+        params = json.load(f)
+    logger.info(f"已从 {params_path} 读取超参数: {params}")
+    return params
@@ -0,0 +1,149 @@
+# src/utils/telemetry.py
+# 结构化运行遥测：记录每个阶段的耗时、CPU 时间、内存峰值和行数，写为 JSON Lines
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional, Union
+
+import pandas as pd
+
+try:
+    import resource  # 仅 Unix 可用
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程启动以来的内存 (RSS) 峰值，单位 MB；无法获取时返回 None。"""
+    if resource is not None:
+        # Linux 上 ru_maxrss 的单位为 KB
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        # Windows 提供峰值工作集；其他平台退化为当前 RSS
+        return round(getattr(info, "peak_wset", info.rss) / 1024 ** 2, 1)
+    except ImportError:
+        return None
+
+
+class Telemetry:
+    """
+    阶段级遥测记录器。
+
+    用法::
+
+        telemetry = Telemetry("logs/telemetry.jsonl")
+        with telemetry.stage("load_data") as record:
+            train_df, test_df = load_data(...)
+            record["rows"] = len(train_df) + len(test_df)
+
+        @telemetry.timed("train_model", rows=lambda X, y, **kw: len(X))
+        def fit(X, y): ...
+
+    每个阶段结束时追加一行 JSON 到 path（path 为 None 时只保存在内存中），
+    summary() 返回本进程内按阶段汇总的结果。
+    """
+
+    def __init__(self, path: Optional[str] = None, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or f"{datetime.now():%Y%m%d_%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.records = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None, **tags):
+        """
+        记录一个阶段。yield 出的字典可以在阶段内补充 rows 或其他字段。
+
+        阶段抛出异常时同样会记录（status="error"），异常继续向外抛出。
+        """
+        record = {"stage": name, "rows": rows, **tags}
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        status, error = "ok", None
+        try:
+            yield record
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            rows = record.get("rows")
+            record.update({
+                "ts": datetime.now().isoformat(timespec='milliseconds'),
+                "run_id": self.run_id,
+                "wall_s": round(wall, 6),
+                "cpu_s": round(time.process_time() - cpu_start, 6),
+                "rows": int(rows) if rows is not None else None,
+                "rows_per_s": round(rows / wall, 1) if rows and wall > 0 else None,
+                "peak_rss_mb": peak_rss_mb(),
+                "status": status,
+            })
+            if error:
+                record["error"] = error
+            self._emit(record)
+
+    def timed(self, name: Optional[str] = None, rows: Union[None, int, Callable] = None, **tags):
+        """
+        装饰器版本的 stage。
+
+        Args:
+            name (str): 阶段名，默认取函数名。
+            rows: 行数，或根据函数参数计算行数的函数（参数与被装饰函数相同）。
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                n_rows = rows(*args, **kwargs) if callable(rows) else rows
+                with self.stage(name or func.__name__, rows=n_rows, **tags):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _emit(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                except OSError as e:
+                    logger.warning(f"写入遥测记录失败（不影响运行）: {e}")
+
+    def summary(self) -> pd.DataFrame:
+        """按阶段汇总本进程的记录：调用次数、总耗时、平均耗时、总行数、吞吐量、内存峰值。"""
+        if not self.records:
+            return pd.DataFrame(columns=["stage", "calls", "wall_s", "mean_wall_s", "cpu_s",
+                                         "rows", "rows_per_s", "peak_rss_mb", "errors"])
+        df = pd.DataFrame(self.records)
+        summary = df.groupby("stage", sort=False).agg(
+            calls=("wall_s", "size"),
+            wall_s=("wall_s", "sum"),
+            mean_wall_s=("wall_s", "mean"),
+            cpu_s=("cpu_s", "sum"),
+            rows=("rows", "sum"),
+            peak_rss_mb=("peak_rss_mb", "max"),
+            errors=("status", lambda s: int((s == "error").sum())),
+        ).reset_index()
+        summary["rows_per_s"] = (summary["rows"] / summary["wall_s"]).where(summary["rows"] > 0).round(1)
+        return summary
+
+    def log_summary(self):
+        """把汇总表写入日志。"""
+        summary = self.summary()
+        logger.info(f"📊 运行遥测 (run_id={self.run_id}):\n{summary.to_string(index=False)}")
+        return summary
+
+
+def load_telemetry(path: str) -> pd.DataFrame:
+    """读取历史遥测记录（JSON Lines），用于对比不同运行之间各阶段的耗时和吞吐量。"""
+    return pd.read_json(path, lines=True)
@@ -1,23 +1,138 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 import pandas as pd
-from matplotlib.dates import MonthLocator, DateFormatter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import logging
+import os
 
-# 设置logging
-logging.basicConfig(level=logging.INFO)
+# 日志配置由入口 (main.py / cli.py) 负责，这里只获取 logger
 logger = logging.getLogger(__name__)
 
-import matplotlib.font_manager as fm
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体作为默认字体以支持中文
-plt.rcParams['axes.unicode_minus'] = False
-# 其他已有代码保持不变...
+_style_applied = False
 
-def plot_predictions(y_true, y_pred, save_path=None):
+
+def setup_plot_style():
+    """
+    导入 matplotlib 并设置中文字体（只在第一次绘图时执行）。
+
+    matplotlib 在这里延迟导入，只使用抽稀等工具函数、或不绘图的进程不会付出导入开销。
+
+    Returns:
+        module: matplotlib.pyplot。
+    """
+    global _style_applied
+    import matplotlib.pyplot as plt
+    if not _style_applied:
+        plt.rcParams['font.sans-serif'] = ['SimHei']  # 使用黑体作为默认字体以支持中文
+        plt.rcParams['axes.unicode_minus'] = False
+        _style_applied = True
+    return plt
+
+# 快速模式的渲染参数：图宽 16 英寸 × 100 dpi = 1600 像素
+FAST_DPI = 100
+
+
+def minmax_decimate(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    最小/最大值抽稀：把序列等分为 n_out // 2 个桶，每个桶保留最小值和最大值两个点（按时间顺序）。
+
+    完全向量化；峰谷不会丢失，适合按像素宽度抽稀负荷曲线。
+    """
+    n = len(y)
+    n_buckets = n_out // 2
+    if n <= n_out or n_buckets < 1:
+        return x, y
+    bucket_size = -(-n // n_buckets)
+    n_buckets = -(-n // bucket_size)
+    # 末尾用 NaN 补齐为整桶，NaN 不会被选为最小/最大值（全为 NaN 的桶取第一个点）
+    buckets = np.full(n_buckets * bucket_size, np.nan)
+    buckets[:n] = y
+    buckets = buckets.reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    argmin = np.where(np.isnan(buckets), np.inf, buckets).argmin(axis=1) + offsets
+    argmax = np.where(np.isnan(buckets), -np.inf, buckets).argmax(axis=1) + offsets
+    idx = np.unique(np.concatenate([argmin, argmax]))
+    idx = idx[idx < n]
+    return x[idx], y[idx]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    最大三角形三桶 (Largest-Triangle-Three-Buckets) 抽稀：保留视觉形状的 n_out 个点。
+
+    桶之间存在依赖（每个桶的选点取决于上一个桶选中的点），因此按桶循环，
+    桶内的三角形面积计算是向量化的。x 需为数值（时间请先转换为 int64）。
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # 中间 n_out - 2 个桶的边界
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = xf[end:next_end].mean()
+        next_values = y[end:next_end]
+        next_values = next_values[~np.isnan(next_values)]
+        next_y = next_values.mean() if len(next_values) else y[prev]
+        area = np.abs((xf[prev] - next_x) * (y[start:end] - y[prev])
+                      - (xf[prev] - xf[start:end]) * (next_y - y[prev]))
+        prev = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        selected[i + 1] = prev
+    return x[selected], y[selected]
+
+
+def downsample(series: pd.Series, n_points: int, method: str = "minmax") -> pd.Series:
+    """把时间序列抽稀到 n_points 个点左右（method: "minmax" 或 "lttb"）。"""
+    if len(series) <= n_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else series.index.to_numpy()
+    y = series.to_numpy(dtype=np.float64)
+    if method == "minmax":
+        x_out, y_out = minmax_decimate(x, y, n_points)
+    elif method == "lttb":
+        x_out, y_out = lttb(x, y, n_points)
+    else:
+        raise ValueError(f"不支持的抽稀方法: {method}")
+    index = pd.DatetimeIndex(x_out) if isinstance(series.index, pd.DatetimeIndex) else x_out
+    return pd.Series(y_out, index=index, name=series.name)
+
+
+def _month_ticks(index: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """数据中实际存在的“每月第一个日期”（输入需已排序），向量化计算。"""
+    if len(index) == 0:
+        return index
+    months = index.year * 12 + index.month
+    is_first = np.r_[True, months[1:] != months[:-1]]
+    return index[is_first]
+
+
+def plot_predictions(y_true, y_pred, save_path=None, fast: bool = False,
+                     max_points: Optional[int] = None, method: str = "minmax"):
     """
     绘制真实值与预测值的对比图，x轴刻度为数据中实际存在的“每月第一个日期”。
+
+    Args:
+        y_true (pd.Series): 真实值，datetime 索引。
+        y_pred (pd.Series): 预测值，datetime 索引。
+        save_path (str): 保存路径；None 时弹出窗口显示（快速模式下必须指定）。
+        fast (bool): 快速模式：非交互式后端、按像素宽度抽稀、不画标记点、100 dpi。
+            适合多年逐小时数据或批量出图。
+        max_points (int): 快速模式下每条曲线最多保留的点数，默认等于图宽像素数。
+        method (str): 快速模式的抽稀方法，"minmax"（最小/最大值）或 "lttb"。
     """
-    plt.figure(figsize=(16, 6))
+    plt = setup_plot_style()
+    if fast:
+        if not save_path:
+            raise ValueError("快速模式使用非交互式后端，必须指定 save_path")
+        if plt.get_backend().lower() != "agg":
+            plt.switch_backend("Agg")
+
+    figsize = (16, 6)
+    plt.figure(figsize=figsize)
 
     # 确保索引是 datetime 类型
     if not isinstance(y_true.index, pd.DatetimeIndex):
@@ -25,9 +140,19 @@ def plot_predictions(y_true, y_pred, save_path=None):
     if not isinstance(y_pred.index, pd.DatetimeIndex):
         y_pred.index = pd.to_datetime(y_pred.index)
 
+    # 合并 y_true 和 y_pred 的索引，确保覆盖所有时间点
+    all_dates = y_true.index.union(y_pred.index)
+
     # 绘制数据
-    plt.plot(y_true.index, y_true, label='真实值', marker='o', linewidth=1.5, markersize=4)
-    plt.plot(y_pred.index, y_pred, label='预测值', marker='x', linestyle='--', linewidth=1.5, markersize=4)
+    if fast:
+        n_points = max_points or figsize[0] * FAST_DPI
+        y_true_plot = downsample(y_true.sort_index(), n_points, method)
+        y_pred_plot = downsample(y_pred.sort_index(), n_points, method)
+        plt.plot(y_true_plot.index, y_true_plot.to_numpy(), label='真实值', linewidth=0.8)
+        plt.plot(y_pred_plot.index, y_pred_plot.to_numpy(), label='预测值', linestyle='--', linewidth=0.8)
+    else:
+        plt.plot(y_true.index, y_true, label='真实值', marker='o', linewidth=1.5, markersize=4)
+        plt.plot(y_pred.index, y_pred, label='预测值', marker='x', linestyle='--', linewidth=1.5, markersize=4)
     plt.title('电力负荷预测结果对比（按实际月份展示）')
     plt.xlabel('时间（月）')
     plt.ylabel('负荷 (kW)')
@@ -35,40 +160,61 @@ def plot_predictions(y_true, y_pred, save_path=None):
     plt.grid(True, alpha=0.3)
 
     # --- ✅ 核心修改：只显示数据中实际存在的“每月第一个日期” ---
-    # 合并 y_true 和 y_pred 的索引，确保覆盖所有时间点
-    all_dates = pd.DatetimeIndex(sorted(set(y_true.index) | set(y_pred.index)))
-
-    # 提取“每个月的第一个日期”（基于实际数据）
-    first_of_month_dates = all_dates.to_period('M').drop_duplicates().to_timestamp()
-
-    # 转换回 datetime 并确保在原始索引中存在（或找最近存在的）
-    tick_locations = []
-    for date in first_of_month_dates:
-        # 找到最接近的、实际存在于数据中的日期
-        available_dates = all_dates[all_dates.month == date.month]
-        if len(available_dates) > 0:
-            # 使用该月最早出现的日期
-            tick_locations.append(available_dates.min())
-
-    # 去重并排序
-    tick_locations = sorted(set(tick_locations))
+    tick_locations = _month_ticks(all_dates)
 
     # 设置 x 轴刻度和标签
-    plt.xticks(tick_locations, [d.strftime("%Y-%m") for d in tick_locations], rotation=45)
+    plt.xticks(tick_locations, tick_locations.strftime("%Y-%m"), rotation=45)
 
     plt.tight_layout()
 
     if save_path:
         try:
-            plt.savefig(save_path, bbox_inches='tight', dpi=300, facecolor='white')
+            plt.savefig(save_path, bbox_inches='tight', dpi=FAST_DPI if fast else 300, facecolor='white')
             plt.close()
             logger.info(f"✅ 图表已保存至: {save_path}")
         except Exception as e:
             logger.error(f"❌ 保存图表失败: {e}")
     else:
         plt.show()
+
+
+def _plot_worker(args) -> str:
+    name, y_true, y_pred, save_path, max_points, method = args
+    plot_predictions(y_true, y_pred, save_path=save_path, fast=True, max_points=max_points, method=method)
+    return save_path
+
+
+def plot_many_predictions(series: Dict[str, Tuple[pd.Series, pd.Series]], output_dir: str,
+                          max_workers: Optional[int] = None, max_points: Optional[int] = None,
+                          method: str = "minmax") -> List[str]:
+    """
+    为多个电表并行绘制预测对比图（快速模式，每张图在独立的子进程中渲染）。
+
+    Args:
+        series (dict): 电表编号 -> (y_true, y_pred)。
+        output_dir (str): 输出目录，文件名为 "<电表编号>.png"。
+        max_workers (int): 并行进程数，默认 os.cpu_count()。
+        max_points (int): 每条曲线最多保留的点数。
+        method (str): 抽稀方法。
+
+    Returns:
+        list: 生成的图片路径。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(name, y_true, y_pred, os.path.join(output_dir, f"{name}.png"), max_points, method)
+             for name, (y_true, y_pred) in series.items()]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) <= 1:
+        return [_plot_worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        paths = list(executor.map(_plot_worker, tasks))
+    logger.info(f"✅ 已并行生成 {len(paths)} 张预测对比图: {output_dir}")
+    return paths
+
+
 def plot_time_series(data: pd.Series, title: str = "时间序列图", save_path=None):
     """绘制时间序列图。"""
+    plt = setup_plot_style()
     plt.figure(figsize=(12, 6))
     data.plot()
     plt.title(title)